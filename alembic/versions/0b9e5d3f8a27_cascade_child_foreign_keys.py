@@ -0,0 +1,43 @@
+"""Cascade deletes to role, menu and permission children
+
+Revision ID: 0b9e5d3f8a27
+Revises: f3a86c2b7d41
+Create Date: 2026-10-18 13:05:52.871436
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b9e5d3f8a27'
+down_revision = 'f3a86c2b7d41'
+branch_labels = None
+depends_on = None
+
+# (table, column, referenced table); constraint names are the Postgres defaults from the init migration
+FOREIGN_KEYS = [
+    ('role_menus', 'menu_id', 'menus'),
+    ('role_menus', 'role_id', 'roles'),
+    ('submenus', 'menu_id', 'menus'),
+    ('role_permissions', 'role_id', 'roles'),
+    ('role_permissions', 'permission_id', 'permissions'),
+    ('role_permission_details', 'role_id', 'roles'),
+    ('role_permission_details', 'permission_detail_id', 'permissions_detail'),
+    ('permissions_detail', 'permission_id', 'permissions'),
+]
+
+
+def _replace_foreign_keys(ondelete) -> None:
+    for table, column, referred_table in FOREIGN_KEYS:
+        name = f'{table}_{column}_fkey'
+        op.drop_constraint(name, table, type_='foreignkey')
+        op.create_foreign_key(name, table, referred_table, [column], ['id'], ondelete=ondelete)
+
+
+def upgrade() -> None:
+    _replace_foreign_keys('CASCADE')
+
+
+def downgrade() -> None:
+    _replace_foreign_keys(None)
@@ -0,0 +1,101 @@
+"""Partition user_history by month
+
+Revision ID: 5d2a7c91e4b8
+Revises: b2e3b8aa8e33
+Create Date: 2026-10-18 09:12:44.318205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '5d2a7c91e4b8'
+down_revision = 'b2e3b8aa8e33'
+branch_labels = None
+depends_on = None
+
+PARTITIONS_AHEAD = 3
+
+
+def upgrade() -> None:
+    op.execute('ALTER TABLE user_history RENAME TO user_history_legacy')
+    op.execute('ALTER TABLE user_history_legacy RENAME CONSTRAINT user_history_pkey TO user_history_legacy_pkey')
+    op.execute('ALTER TABLE user_history_legacy RENAME CONSTRAINT user_history_id_key TO user_history_legacy_id_key')
+
+    op.create_table('user_history',
+    sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('permission', sa.String(length=50), nullable=True),
+    sa.Column('permission_detail', sa.String(length=50), nullable=True),
+    sa.Column('email', sa.String(), nullable=True),
+    sa.Column('status_code', sa.INTEGER(), nullable=True),
+    sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=True),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id', 'created_at'),
+    postgresql_partition_by='RANGE (created_at)'
+    )
+    op.create_index('ix_user_history_user_id_created_at', 'user_history', ['user_id', 'created_at'])
+    op.create_index('ix_user_history_permission_created_at', 'user_history', ['permission', 'created_at'])
+
+    # Catches rows outside every monthly range so inserts never fail; it stays empty
+    # as long as the maintenance job keeps partitions created ahead of time
+    op.execute('CREATE TABLE user_history_default PARTITION OF user_history DEFAULT')
+
+    op.execute("""
+    CREATE OR REPLACE FUNCTION user_history_create_partition(month_start date) RETURNS text AS $$
+    DECLARE
+        partition_start date := date_trunc('month', month_start)::date;
+        partition_name text := 'user_history_p' || to_char(partition_start, 'YYYYMM');
+    BEGIN
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF user_history FOR VALUES FROM (%L) TO (%L)',
+                partition_name, partition_start, (partition_start + interval '1 month')::date
+            );
+        END IF;
+        RETURN partition_name;
+    END;
+    $$ LANGUAGE plpgsql
+    """)
+
+    op.execute(f"""
+    SELECT user_history_create_partition(month_start::date)
+    FROM generate_series(
+        date_trunc('month', coalesce((SELECT min(created_at) FROM user_history_legacy), now())),
+        date_trunc('month', now()) + interval '{PARTITIONS_AHEAD} months',
+        interval '1 month'
+    ) AS month_start
+    """)
+
+    op.execute("""
+    INSERT INTO user_history (id, permission, permission_detail, email, status_code, user_id, created_at)
+    SELECT id, permission, permission_detail, email, status_code, user_id, created_at FROM user_history_legacy
+    """)
+    op.drop_table('user_history_legacy')
+
+
+def downgrade() -> None:
+    op.execute('ALTER TABLE user_history RENAME TO user_history_partitioned')
+    op.execute('ALTER TABLE user_history_partitioned RENAME CONSTRAINT user_history_pkey TO user_history_partitioned_pkey')
+
+    op.create_table('user_history',
+    sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('permission', sa.String(length=50), nullable=True),
+    sa.Column('permission_detail', sa.String(length=50), nullable=True),
+    sa.Column('email', sa.String(), nullable=True),
+    sa.Column('status_code', sa.INTEGER(), nullable=True),
+    sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=True),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('id')
+    )
+
+    op.execute("""
+    INSERT INTO user_history (id, permission, permission_detail, email, status_code, user_id, created_at)
+    SELECT id, permission, permission_detail, email, status_code, user_id, created_at FROM user_history_partitioned
+    ON CONFLICT (id) DO NOTHING
+    """)
+    op.execute('DROP TABLE user_history_partitioned CASCADE')
+    op.execute('DROP FUNCTION IF EXISTS user_history_create_partition(date)')
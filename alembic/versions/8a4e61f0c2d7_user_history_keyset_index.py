@@ -0,0 +1,24 @@
+"""Add user_history keyset index
+
+Revision ID: 8a4e61f0c2d7
+Revises: 5d2a7c91e4b8
+Create Date: 2026-10-18 10:02:17.540913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a4e61f0c2d7'
+down_revision = '5d2a7c91e4b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_user_history_created_at_id', 'user_history', ['created_at', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_history_created_at_id', table_name='user_history')
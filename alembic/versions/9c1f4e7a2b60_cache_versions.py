@@ -0,0 +1,29 @@
+"""Shared version stamps for the in-process caches
+
+Revision ID: 9c1f4e7a2b60
+Revises: 0b9e5d3f8a27
+Create Date: 2026-10-18 15:12:40.218734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c1f4e7a2b60'
+down_revision = '0b9e5d3f8a27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'cache_versions',
+        sa.Column('key', sa.String(length=100), nullable=False),
+        sa.Column('version', sa.BIGINT(), server_default=sa.text('0'), nullable=False),
+        sa.PrimaryKeyConstraint('key'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('cache_versions')
@@ -0,0 +1,46 @@
+"""Only move roles.user_count when a user's role_id actually changes
+
+Revision ID: a4c7e2f90b15
+Revises: d8e2b4f61a93
+Create Date: 2026-10-18 16:02:27.513960
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c7e2f90b15'
+down_revision = 'd8e2b4f61a93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # UPDATE OF role_id fires whenever role_id is in the SET list, even with the same value, and each
+    # firing locks the role row; the WHEN clause skips the no-op updates
+    op.execute('DROP TRIGGER users_role_user_count ON users')
+    op.execute("""
+    CREATE TRIGGER users_role_user_count
+    AFTER INSERT OR DELETE ON users
+    FOR EACH ROW
+    EXECUTE FUNCTION roles_user_count_sync()
+    """)
+    op.execute("""
+    CREATE TRIGGER users_role_user_count_update
+    AFTER UPDATE OF role_id ON users
+    FOR EACH ROW
+    WHEN (OLD.role_id IS DISTINCT FROM NEW.role_id)
+    EXECUTE FUNCTION roles_user_count_sync()
+    """)
+
+
+def downgrade() -> None:
+    op.execute('DROP TRIGGER users_role_user_count_update ON users')
+    op.execute('DROP TRIGGER users_role_user_count ON users')
+    op.execute("""
+    CREATE TRIGGER users_role_user_count
+    AFTER INSERT OR DELETE OR UPDATE OF role_id ON users
+    FOR EACH ROW
+    EXECUTE FUNCTION roles_user_count_sync()
+    """)
@@ -0,0 +1,43 @@
+"""Add (created_at, id) indexes for keyset pagination
+
+Revision ID: b7d3f1c85e20
+Revises: a4c7e2f90b15
+Create Date: 2026-10-18 16:48:12.904615
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d3f1c85e20'
+down_revision = 'a4c7e2f90b15'
+branch_labels = None
+depends_on = None
+
+# Every list endpoint that takes ?cursor= orders by (created_at, id); a matching index lets a page start
+# at the cursor instead of sorting the whole table
+INDEXES = [
+    ('ix_users_created_at_id', 'users'),
+    ('ix_permissions_created_at_id', 'permissions'),
+    ('ix_categories_created_at_id', 'categories'),
+    ('ix_statuses_created_at_id', 'statuses'),
+    ('ix_subject_menu_created_at_id', 'subject_menu'),
+    ('ix_menus_created_at_id', 'menus'),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        for name, table in INDEXES:
+            op.create_index(name, table, ['created_at', 'id'], postgresql_concurrently=True)
+        # Covered by the leading column of ix_users_created_at_id
+        op.drop_index('ix_users_created_at', table_name='users', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_users_created_at', 'users', ['created_at'], postgresql_concurrently=True)
+        for name, table in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,44 @@
+"""Add foreign key and filter indexes
+
+Revision ID: c41f9a7d2e65
+Revises: 8a4e61f0c2d7
+Create Date: 2026-10-18 11:24:05.318207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41f9a7d2e65'
+down_revision = '8a4e61f0c2d7'
+branch_labels = None
+depends_on = None
+
+# role_menus.role_id already leads the (role_id, menu_id) primary key, so only menu_id needs its own index
+INDEXES = [
+    ('ix_users_role_id', 'users', ['role_id']),
+    ('ix_users_is_activate', 'users', ['is_activate']),
+    ('ix_users_created_at', 'users', ['created_at']),
+    ('ix_role_menus_menu_id', 'role_menus', ['menu_id']),
+    ('ix_role_permission_details_role_id', 'role_permission_details', ['role_id']),
+    ('ix_role_permission_details_permission_detail_id', 'role_permission_details', ['permission_detail_id']),
+    ('ix_permissions_detail_permission_id', 'permissions_detail', ['permission_id']),
+    ('ix_submenus_menu_id', 'submenus', ['menu_id']),
+    ('ix_user_meta_role_id', 'user_meta', ['role_id']),
+    ('ix_user_meta_detail_user_id', 'user_meta_detail', ['user_id']),
+    ('ix_user_meta_detail_meta_id', 'user_meta_detail', ['meta_id']),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,74 @@
+"""Create user_history partitions even when the default partition holds their rows
+
+Revision ID: d8e2b4f61a93
+Revises: 9c1f4e7a2b60
+Create Date: 2026-10-18 15:40:03.551872
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8e2b4f61a93'
+down_revision = '9c1f4e7a2b60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CREATE TABLE ... PARTITION OF fails once the default partition holds a row of the new range, e.g.
+    # when the maintenance job did not run before the month started. The partition is instead built as
+    # a plain table, those rows are moved into it, and it is attached; the CHECK constraint lets ATTACH
+    # skip scanning the new table, and indexes and foreign keys are cloned from user_history on attach
+    op.execute("""
+    CREATE OR REPLACE FUNCTION user_history_create_partition(month_start date) RETURNS text AS $$
+    DECLARE
+        partition_start date := date_trunc('month', month_start)::date;
+        partition_end date := (date_trunc('month', month_start) + interval '1 month')::date;
+        partition_name text := 'user_history_p' || to_char(partition_start, 'YYYYMM');
+    BEGIN
+        IF to_regclass(partition_name) IS NOT NULL THEN
+            RETURN partition_name;
+        END IF;
+
+        EXECUTE format('CREATE TABLE %I (LIKE user_history INCLUDING DEFAULTS)', partition_name);
+        EXECUTE format(
+            'ALTER TABLE %I ADD CONSTRAINT %I CHECK (created_at >= %L AND created_at < %L)',
+            partition_name, partition_name || '_range', partition_start, partition_end
+        );
+        IF to_regclass('user_history_default') IS NOT NULL THEN
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM user_history_default WHERE created_at >= %L AND created_at < %L RETURNING *) '
+                'INSERT INTO %I SELECT * FROM moved',
+                partition_start, partition_end, partition_name
+            );
+        END IF;
+        EXECUTE format(
+            'ALTER TABLE user_history ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+            partition_name, partition_start, partition_end
+        );
+        EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', partition_name, partition_name || '_range');
+        RETURN partition_name;
+    END;
+    $$ LANGUAGE plpgsql
+    """)
+
+
+def downgrade() -> None:
+    op.execute("""
+    CREATE OR REPLACE FUNCTION user_history_create_partition(month_start date) RETURNS text AS $$
+    DECLARE
+        partition_start date := date_trunc('month', month_start)::date;
+        partition_name text := 'user_history_p' || to_char(partition_start, 'YYYYMM');
+    BEGIN
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF user_history FOR VALUES FROM (%L) TO (%L)',
+                partition_name, partition_start, (partition_start + interval '1 month')::date
+            );
+        END IF;
+        RETURN partition_name;
+    END;
+    $$ LANGUAGE plpgsql
+    """)
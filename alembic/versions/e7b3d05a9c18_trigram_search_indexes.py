@@ -0,0 +1,38 @@
+"""Add pg_trgm search indexes
+
+Revision ID: e7b3d05a9c18
+Revises: c41f9a7d2e65
+Create Date: 2026-10-18 11:52:40.127694
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b3d05a9c18'
+down_revision = 'c41f9a7d2e65'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_users_name_trgm', 'users', 'name'),
+    ('ix_users_email_trgm', 'users', 'email'),
+    ('ix_menus_name_trgm', 'menus', 'name'),
+    ('ix_submenus_name_trgm', 'submenus', 'name'),
+    ('ix_categories_name_trgm', 'categories', 'name'),
+]
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    with op.get_context().autocommit_block():
+        for name, table, column in INDEXES:
+            op.create_index(name, table, [column], postgresql_using='gin',
+                            postgresql_ops={column: 'gin_trgm_ops'}, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, column in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,53 @@
+"""Maintain roles.user_count with a trigger
+
+Revision ID: f3a86c2b7d41
+Revises: e7b3d05a9c18
+Create Date: 2026-10-18 12:31:09.645102
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a86c2b7d41'
+down_revision = 'e7b3d05a9c18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('roles', sa.Column('user_count', sa.INTEGER(), server_default=sa.text('0'), nullable=False))
+
+    # Runs in the same transaction as the users write, so the counter commits or rolls back with it
+    op.execute("""
+    CREATE OR REPLACE FUNCTION roles_user_count_sync() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE roles SET user_count = user_count - 1 WHERE id = OLD.role_id;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            UPDATE roles SET user_count = user_count + 1 WHERE id = NEW.role_id;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+    CREATE TRIGGER users_role_user_count
+    AFTER INSERT OR DELETE OR UPDATE OF role_id ON users
+    FOR EACH ROW
+    EXECUTE FUNCTION roles_user_count_sync()
+    """)
+
+    op.execute("""
+    UPDATE roles SET user_count = counts.user_count
+    FROM (SELECT role_id, count(*) AS user_count FROM users GROUP BY role_id) AS counts
+    WHERE roles.id = counts.role_id
+    """)
+
+
+def downgrade() -> None:
+    op.execute('DROP TRIGGER users_role_user_count ON users')
+    op.execute('DROP FUNCTION roles_user_count_sync()')
+    op.drop_column('roles', 'user_count')
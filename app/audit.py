@@ -0,0 +1,176 @@
+import asyncio
+import collections
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import TimedRotatingFileHandler
+from typing import Optional
+
+from . import metrics, models
+from .config import settings
+from .database import engine
+from app.logging_config import setup_logging
+
+logger = setup_logging()
+
+OVERFLOW_POLICIES = ('drop_oldest', 'drop_newest', 'spill')
+
+
+def _setup_spill_logger():
+    log_folder = 'logs'
+    os.makedirs(log_folder, exist_ok=True)
+
+    spill_handler = TimedRotatingFileHandler(os.path.join(log_folder, 'audit_spill.log'), when='midnight', interval=1, backupCount=7, encoding='utf-8', delay=True)
+    spill_handler.setFormatter(logging.Formatter('%(message)s'))
+
+    spill_logger = logging.getLogger('app.audit.spill')
+    spill_logger.setLevel(logging.INFO)
+    spill_logger.propagate = False
+    if not spill_logger.handlers:
+        spill_logger.addHandler(spill_handler)
+
+    return spill_logger
+
+
+class AuditPipeline:
+    def __init__(self, batch_size: int, flush_interval_ms: int, max_queue: int, overflow_policy: str):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown audit overflow policy '{overflow_policy}'")
+
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_queue = max_queue
+        self.overflow_policy = overflow_policy
+
+        self._buffer = collections.deque()
+        # Overflow waiting to be written to the spill file by the flush thread, so enqueue() never does file I/O
+        self._overflow = collections.deque()
+        # enqueue() is called from the event loop and from threadpool workers alike
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._spill_logger = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.stats = {'enqueued': 0, 'flushed': 0, 'dropped': 0, 'spilled': 0, 'failed': 0, 'batches': 0}
+
+    def enqueue(self, event: dict):
+        spill_now = False
+        with self._lock:
+            overflow = len(self._buffer) >= self.max_queue
+            if overflow and self.overflow_policy == 'drop_newest':
+                self.stats['dropped'] += 1
+                return
+            if overflow and self.overflow_policy == 'spill':
+                # Handed to the flush thread; only when it is a whole queue behind on the spill file
+                # too does the caller write its own event, and then outside the lock
+                spill_now = len(self._overflow) >= self.max_queue
+                if not spill_now:
+                    self._overflow.append(event)
+            else:
+                if overflow:
+                    self._buffer.popleft()
+                    self.stats['dropped'] += 1
+                self._buffer.append(event)
+                self.stats['enqueued'] += 1
+            full = overflow or len(self._buffer) >= self.batch_size
+
+        if spill_now:
+            self._spill([event])
+        if full and self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _spill(self, events):
+        with self._spill_lock:
+            if self._spill_logger is None:
+                self._spill_logger = _setup_spill_logger()
+            for event in events:
+                self._spill_logger.info(json.dumps(event, default=str))
+            self.stats['spilled'] += len(events)
+
+    def _spill_overflow(self):
+        with self._lock:
+            overflow = list(self._overflow)
+            self._overflow.clear()
+        if overflow:
+            self._spill(overflow)
+
+    def flush(self):
+        with self._flush_lock:
+            while True:
+                self._spill_overflow()
+                with self._lock:
+                    batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                if not batch:
+                    return
+
+                try:
+                    # executemany on an INSERT is sent by psycopg2 as multi-row VALUES pages
+                    with engine.begin() as connection:
+                        connection.execute(models.UserHisory.__table__.insert(), batch)
+                    self.stats['flushed'] += len(batch)
+                    self.stats['batches'] += 1
+                except Exception as e:
+                    self.stats['failed'] += len(batch)
+                    logger.error(f"Error flushing user history. Error: {str(e)}")
+                    self._spill(batch)
+                    return
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await loop.run_in_executor(None, self.flush)
+            except Exception as e:
+                # e.g. the spill file cannot be opened; keep looping so the queue still drains once it can
+                logger.error(f"Error in audit flush loop. Error: {str(e)}")
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = self._loop.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._loop = None
+        await asyncio.get_running_loop().run_in_executor(None, self.flush)
+
+    def get_stats(self):
+        return dict(self.stats, queued=len(self._buffer), spill_queued=len(self._overflow), max_queue=self.max_queue, overflow_policy=self.overflow_policy)
+
+
+audit_pipeline = AuditPipeline(
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval_ms=settings.AUDIT_FLUSH_INTERVAL_MS,
+    max_queue=settings.AUDIT_MAX_QUEUE,
+    overflow_policy=settings.AUDIT_OVERFLOW_POLICY,
+)
+metrics.register('audit', audit_pipeline.get_stats)
+
+
+def record_user_history(user_id, email: str, permission: str = '', permission_detail: str = '', status_code: int = None):
+    audit_pipeline.enqueue({
+        'id': uuid.uuid4(),
+        'user_id': user_id,
+        'email': email,
+        'permission': permission,
+        'permission_detail': permission_detail,
+        'status_code': status_code,
+        'created_at': datetime.now(timezone.utc),
+    })
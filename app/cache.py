@@ -0,0 +1,285 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict
+
+import orjson
+from redis.exceptions import RedisError
+
+from app import metrics
+from app.config import settings
+from app.logging_config import setup_logging
+logger = setup_logging()
+
+_MISSING = object()
+
+
+class LRUCache:
+    # Bounded in-process tier: least recently used entries are evicted at CACHE_L1_MAX_SIZE and every
+    # entry expires after its TTL, which also bounds how long another worker's invalidation goes unseen
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return _MISSING
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return _MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, ttl: float = None):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self, prefix: str = ''):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def get_stats(self) -> dict:
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+_l1 = LRUCache(settings.CACHE_L1_MAX_SIZE, settings.CACHE_L1_TTL)
+_caches: Dict[str, 'TwoTierCache'] = {}
+
+
+def _default_redis():
+    from app.utils import RedisManager
+    return RedisManager().get_async_redis()
+
+
+class TwoTierCache:
+    # One namespace of cached objects: the shared in-process LRU in front of Redis. Keys look like
+    # <CACHE_KEY_PREFIX>:<namespace>:v<version>:<key>; bumping version when the cached shape changes
+    # orphans the old entries, and callers fold data versions (e.g. a role's permission version) into key.
+    # Values are stored in Redis as JSON, and None is a cacheable value.
+    # A cold key is loaded once per worker however many requests ask for it at the same time. Redis
+    # failures are logged and counted and the cache falls back to the loader, never to an error; after a
+    # failure reads and writes skip Redis for CACHE_L2_RETRY_AFTER seconds so an outage does not cost every
+    # request a timeout. Deletes always go to Redis: a skipped one would leave a stale value for CACHE_L2_TTL
+    def __init__(
+        self,
+        namespace: str,
+        version: int = 1,
+        l1_ttl: float = None,
+        l2_ttl: int = None,
+        redis_client=None,
+        dumps: Callable[[Any], bytes] = orjson.dumps,
+        loads: Callable[[bytes], Any] = orjson.loads,
+    ):
+        self.namespace = namespace
+        self.prefix = f'{settings.CACHE_KEY_PREFIX}:{namespace}:v{version}:'
+        self.l1_ttl = settings.CACHE_L1_TTL if l1_ttl is None else l1_ttl
+        self.l2_ttl = settings.CACHE_L2_TTL if l2_ttl is None else l2_ttl
+        self._redis = redis_client
+        self.dumps = dumps
+        self.loads = loads
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self.l2_errors = 0
+        self.loads_started = 0
+        self.load_errors = 0
+        self.coalesced = 0
+        self.l2_skipped = 0
+        self._l2_retry_at = 0.0
+        _caches[namespace] = self
+
+    @property
+    def redis(self):
+        if self._redis is None and settings.CACHE_L2_ENABLED:
+            self._redis = _default_redis()
+        return self._redis
+
+    def _l2(self):
+        # The Redis client, or None while L2 is disabled or backing off after a failure
+        client = self.redis
+        if client is None:
+            return None
+        if time.monotonic() < self._l2_retry_at:
+            self.l2_skipped += 1
+            return None
+        return client
+
+    def key(self, key) -> str:
+        return self.prefix + str(key)
+
+    async def get(self, key, default=None):
+        value = await self._lookup(self.key(key))
+        return default if value is _MISSING else value
+
+    async def get_or_load(self, key, loader: Callable[[], Awaitable[Any]]):
+        full_key = self.key(key)
+        value = _l1.get(full_key)
+        if value is not _MISSING:
+            return value
+
+        inflight = self._inflight.get(full_key)
+        if inflight is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # The request doing the load went away; this one carries on with its own load
+                if not inflight.cancelled():
+                    raise
+                return await self.get_or_load(key, loader)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[full_key] = future
+        try:
+            value = await self._read_l2(full_key)
+            if value is _MISSING:
+                self.loads_started += 1
+                value = await loader()
+                await self._write(full_key, value)
+            else:
+                _l1.set(full_key, value, self.l1_ttl)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            self.load_errors += 1
+            future.set_exception(e)
+            # Waiters re-raise it; marking it retrieved keeps asyncio quiet when there are none
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(full_key, None)
+
+    async def set(self, key, value):
+        await self._write(self.key(key), value)
+
+    async def invalidate(self, key):
+        full_key = self.key(key)
+        _l1.delete(full_key)
+        redis = self.redis
+        if redis is not None:
+            try:
+                await redis.delete(full_key)
+            except RedisError as e:
+                self._l2_failed('delete', e)
+
+    async def clear(self):
+        _l1.clear(self.prefix)
+        redis = self.redis
+        if redis is not None:
+            try:
+                async for keys in self._scan_batches(redis):
+                    await redis.delete(*keys)
+            except RedisError as e:
+                self._l2_failed('clear', e)
+
+    async def _scan_batches(self, redis, batch_size: int = 500):
+        batch = []
+        async for key in redis.scan_iter(match=self.prefix + '*', count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    async def _lookup(self, full_key: str):
+        value = _l1.get(full_key)
+        if value is _MISSING:
+            value = await self._read_l2(full_key)
+            if value is not _MISSING:
+                _l1.set(full_key, value, self.l1_ttl)
+        return value
+
+    async def _read_l2(self, full_key: str):
+        redis = self._l2()
+        if redis is None:
+            return _MISSING
+        try:
+            raw = await redis.get(full_key)
+        except RedisError as e:
+            self._l2_failed('get', e)
+            return _MISSING
+        if raw is None:
+            self.l2_misses += 1
+            return _MISSING
+        try:
+            value = self.loads(raw)
+        except Exception as e:
+            # An entry written by an incompatible build or truncated in transit is dropped and reloaded
+            self.l2_errors += 1
+            logger.warning(f'Cache {self.namespace}: dropping undecodable entry {full_key}: {e}')
+            try:
+                await redis.delete(full_key)
+            except RedisError as e:
+                self._l2_failed('delete', e)
+            return _MISSING
+        self.l2_hits += 1
+        return value
+
+    async def _write(self, full_key: str, value: Any):
+        _l1.set(full_key, value, self.l1_ttl)
+        redis = self._l2()
+        if redis is None:
+            return
+        try:
+            await redis.set(full_key, self.dumps(value), ex=self.l2_ttl)
+        except RedisError as e:
+            self._l2_failed('set', e)
+
+    def _l2_failed(self, operation: str, error: Exception):
+        self.l2_errors += 1
+        self._l2_retry_at = time.monotonic() + settings.CACHE_L2_RETRY_AFTER
+        logger.warning(f'Cache {self.namespace}: redis {operation} failed: {error}')
+
+    def get_stats(self) -> dict:
+        return {
+            'l2_hits': self.l2_hits,
+            'l2_misses': self.l2_misses,
+            'l2_errors': self.l2_errors,
+            'l2_skipped': self.l2_skipped,
+            'loads': self.loads_started,
+            'load_errors': self.load_errors,
+            'coalesced': self.coalesced,
+            'inflight': len(self._inflight),
+        }
+
+
+def get_cache_stats() -> dict:
+    return {'l1': _l1.get_stats(), 'namespaces': {name: cache.get_stats() for name, cache in _caches.items()}}
+
+
+metrics.register('cache', get_cache_stats)
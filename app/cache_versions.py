@@ -0,0 +1,36 @@
+from typing import Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import execute
+
+
+def versions_statement(keys: Sequence[str]):
+    return select(models.CacheVersion.key, models.CacheVersion.version).where(models.CacheVersion.key.in_(keys))
+
+
+def _ordered(rows, keys: Sequence[str]) -> Tuple[int, ...]:
+    # A key that was never bumped has no row yet and counts as version 0
+    versions = {row.key: row.version for row in rows}
+    return tuple(versions.get(key, 0) for key in keys)
+
+
+def read_versions(db: Session, keys: Sequence[str]) -> Tuple[int, ...]:
+    return _ordered(db.execute(versions_statement(keys)).all(), keys)
+
+
+async def aread_versions(db, keys: Sequence[str]) -> Tuple[int, ...]:
+    return _ordered((await execute(db, versions_statement(keys))).all(), keys)
+
+
+def bump_versions(db: Session, *keys: str):
+    # Runs in the caller's transaction, before its commit, so the new version becomes visible together
+    # with the change it announces and a failed bump rolls the change back with it
+    statement = insert(models.CacheVersion).values([{'key': key, 'version': 1} for key in keys])
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[models.CacheVersion.key],
+        set_={'version': models.CacheVersion.version + 1},
+    ))
@@ -0,0 +1,172 @@
+import gzip
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Preferred first when the client weighs them equally
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'application/javascript', 'text/')
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    # Picks the best coding we support from Accept-Encoding, honouring q-values (q=0 refuses a coding)
+    if not settings.COMPRESSION_ENABLED or not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.partition(';')
+        weight = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.lower() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.strip().lower()] = weight
+
+    best, best_weight = None, 0.0
+    for coding in ENCODINGS:
+        weight = weights.get(coding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=settings.BROTLI_QUALITY)
+    # mtime=0 keeps the output deterministic, so identical bodies compress to identical bytes
+    return gzip.compress(body, compresslevel=settings.GZIP_COMPRESSION_LEVEL, mtime=0)
+
+
+def is_compressible(content_type: str) -> bool:
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class _StreamEncoder:
+    # Incremental encoder for streamed bodies. Output is flushed once COMPRESSION_STREAM_FLUSH_SIZE bytes
+    # of input have gone in since the last flush, not per chunk: a sync flush per NDJSON row would cost
+    # a block header each and most of the compression
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        self._unflushed = 0
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=settings.BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(settings.GZIP_COMPRESSION_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == 'br':
+            body = self._compressor.process(data)
+        else:
+            body = self._compressor.compress(data)
+        self._unflushed += len(data)
+        if self._unflushed < settings.COMPRESSION_STREAM_FLUSH_SIZE:
+            return body
+        self._unflushed = 0
+        if self.encoding == 'br':
+            return body + self._compressor.flush()
+        return body + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+class CompressionMiddleware:
+    # gzip/brotli for JSON and text responses. Bodies under COMPRESSION_MINIMUM_SIZE go out as they are,
+    # responses that already carry a Content-Encoding (e.g. the pre-compressed navigation bundle) are
+    # left alone, and every response that could have been compressed gets Vary: Accept-Encoding
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http' or not settings.COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get('accept-encoding'))
+        await _CompressionResponder(self.app, encoding)(scope, receive, send)
+
+
+class _CompressionResponder:
+    def __init__(self, app: ASGIApp, encoding: Optional[str]):
+        self.app = app
+        self.encoding = encoding
+        self.send = None
+        self.start_message = None
+        self.encoder = None
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message):
+        if message['type'] == 'http.response.start':
+            # Held back until the first body chunk shows how big the response is
+            self.start_message = message
+            return
+        if message['type'] != 'http.response.body':
+            await self.send(message)
+            return
+
+        if self.passthrough:
+            await self.send(message)
+            return
+        if self.encoder is not None:
+            await self.send_chunk(message)
+            return
+
+        headers = MutableHeaders(raw=self.start_message['headers'])
+        body = message.get('body', b'')
+        more_body = message.get('more_body', False)
+
+        if (
+            self.start_message['status'] in (204, 304)
+            or 'content-encoding' in headers
+            or not is_compressible(headers.get('content-type', ''))
+        ):
+            self.passthrough = True
+            await self.send(self.start_message)
+            await self.send(message)
+            return
+
+        headers.add_vary_header('Accept-Encoding')
+        if self.encoding is None or (not more_body and len(body) < settings.COMPRESSION_MINIMUM_SIZE):
+            self.passthrough = True
+            await self.send(self.start_message)
+            await self.send(message)
+            return
+
+        headers['Content-Encoding'] = self.encoding
+        if not more_body:
+            body = compress(body, self.encoding)
+            headers['Content-Length'] = str(len(body))
+            await self.send(self.start_message)
+            await self.send({'type': 'http.response.body', 'body': body})
+            return
+
+        del headers['Content-Length']
+        self.encoder = _StreamEncoder(self.encoding)
+        await self.send(self.start_message)
+        await self.send_chunk(message)
+
+    async def send_chunk(self, message: Message):
+        body = self.encoder.chunk(message.get('body', b''))
+        more_body = message.get('more_body', False)
+        if not more_body:
+            body += self.encoder.finish()
+        elif not body:
+            return
+        await self.send({'type': 'http.response.body', 'body': body, 'more_body': more_body})
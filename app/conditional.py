@@ -0,0 +1,100 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import List, Optional
+
+from fastapi import BackgroundTasks, Depends, HTTPException, Request, Response, status
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from . import models, oauth2
+from .config import settings
+from .database import get_db
+from .principal_cache import Principal
+
+
+class ConditionalGet:
+    # Route dependency that answers 304 when none of the given tables changed since the client's copy.
+    # The fingerprint is each table's row count plus max(updated_at) from one query, so a 304 never
+    # loads rows; the permission check runs first, so only callers allowed to read get a 304.
+    # A link table has no updated_at and a swapped link keeps its count, so routes that read link tables
+    # also pass the cache_versions stamps their writers bump
+    def __init__(self, tables: List, permissions: List[str], permissions_detail: List[str], version_keys: List[str] = ()):
+        self.tables = tables
+        self.permissions = permissions
+        self.permissions_detail = permissions_detail
+        self.version_keys = list(version_keys)
+
+    def fingerprint_statement(self):
+        columns = []
+        for model in self.tables:
+            columns.append(select(func.count()).select_from(model).scalar_subquery())
+            if hasattr(model, 'updated_at'):
+                columns.append(select(func.max(model.updated_at)).scalar_subquery())
+        if self.version_keys:
+            # Stamps only ever go up, so their sum moves on every bump
+            columns.append(
+                select(func.coalesce(func.sum(models.CacheVersion.version), 0))
+                .where(models.CacheVersion.key.in_(self.version_keys))
+                .scalar_subquery()
+            )
+        return select(*columns)
+
+    def __call__(
+        self,
+        request: Request,
+        response: Response,
+        background_tasks: BackgroundTasks,
+        db: Session = Depends(get_db),
+        user: Principal = Depends(oauth2.require_user),
+    ):
+        oauth2.check_permissions_detail(self.permissions, self.permissions_detail, user, background_tasks=background_tasks, db=db)
+
+        fingerprint = db.execute(self.fingerprint_statement()).one()
+        last_modified = max((value for value in fingerprint if isinstance(value, datetime)), default=None)
+        # The query string selects which rows are returned, so it is part of the validator
+        digest = hashlib.sha256(repr((request.url.path, request.url.query, tuple(fingerprint))).encode('utf-8')).hexdigest()[:32]
+
+        headers = {
+            'ETag': f'W/"{digest}"',
+            'Cache-Control': f'private, max-age={settings.CONDITIONAL_GET_MAX_AGE}, must-revalidate',
+        }
+        if last_modified is not None:
+            headers['Last-Modified'] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+
+        if not_modified(request, headers['ETag'], last_modified):
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        response.headers.update(headers)
+
+
+def _opaque_tag(tag: str) -> str:
+    return tag[2:] if tag.startswith('W/') else tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    if not if_none_match:
+        return False
+    candidates = {_opaque_tag(candidate.strip()) for candidate in if_none_match.split(',')}
+    return '*' in candidates or _opaque_tag(etag) in candidates
+
+
+def not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    # If-None-Match wins over If-Modified-Since when both are sent. Only the ETag sees deletes (through
+    # the row count), so clients that keep the ETag, as browsers do, never get a stale 304 after one
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match:
+        return etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get('if-modified-since')
+    if not if_modified_since or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # HTTP dates have one-second resolution
+    return last_modified.replace(microsecond=0) <= since
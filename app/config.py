@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseSettings, EmailStr
 
 
@@ -8,6 +10,15 @@ class Settings(BaseSettings):
     POSTGRES_DB: str
     # POSTGRES_HOST: str
     POSTGRES_HOSTNAME: str
+    DATABASE_ASYNC_MODE: bool = False
+    DB_POOL_SIZE: int = 200
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = -1
+    DB_POOL_PRE_PING: bool = False
+    DATABASE_REPLICA_URL: Optional[str] = None
+    REPLICA_MAX_LAG_SECONDS: float = 5
+    REPLICA_LAG_CHECK_INTERVAL_SECONDS: float = 5
 
     JWT_PUBLIC_KEY: str
     JWT_PRIVATE_KEY: str
@@ -33,6 +44,53 @@ class Settings(BaseSettings):
     SRS_TOKEN: str
     SRS_API: str
 
+    PERMISSION_CACHE_TTL: int = 300
+    PRINCIPAL_CACHE_TTL: int = 30
+    PRINCIPAL_CACHE_MAX_SIZE: int = 10000
+    NAVIGATION_CACHE_TTL: int = 300
+    CONDITIONAL_GET_MAX_AGE: int = 0
+
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_EXECUTOR: str = 'thread'
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64
+
+    AUDIT_BATCH_SIZE: int = 500
+    AUDIT_FLUSH_INTERVAL_MS: int = 1000
+    AUDIT_MAX_QUEUE: int = 50000
+    AUDIT_OVERFLOW_POLICY: str = 'spill'
+
+    MAINTENANCE_INTERVAL_SECONDS: int = 3600
+    USER_HISTORY_PARTITIONS_AHEAD: int = 3
+    USER_HISTORY_RETENTION_MONTHS: int = 12
+
+    SQL_INSTRUMENTATION: bool = True
+    SQL_REPEAT_THRESHOLD: int = 10
+    SQL_STRICT_MODE: bool = False
+
+    FAST_JSON_RESPONSES: bool = False
+
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    GZIP_COMPRESSION_LEVEL: int = 6
+    COMPRESSION_STREAM_FLUSH_SIZE: int = 32768
+    BROTLI_QUALITY: int = 4
+
+    REDIS_HOST: str = 'localhost'
+    REDIS_PORT: int = 6379
+    REDIS_DB: int = 0
+    REDIS_PASSWORD: Optional[str] = None
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_POOL_TIMEOUT: float = 1
+    REDIS_SOCKET_TIMEOUT: float = 1
+
+    CACHE_KEY_PREFIX: str = 'api'
+    CACHE_L1_MAX_SIZE: int = 10000
+    CACHE_L1_TTL: int = 30
+    CACHE_L2_TTL: int = 300
+    CACHE_L2_ENABLED: bool = True
+    CACHE_L2_RETRY_AFTER: int = 5
+
     class Config:
         env_file = './.env'
 
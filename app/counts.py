@@ -0,0 +1,37 @@
+import json
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from .database import execute
+
+COUNT_MODES = '^(exact|estimate|none)$'
+
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, 'postgresql')
+def _compile_explain(element, compiler, **kw):
+    return 'EXPLAIN (FORMAT JSON) ' + compiler.process(element.statement, **kw)
+
+
+async def estimate_count(db, statement) -> int:
+    # The planner's row estimate for the statement; nothing is executed
+    plan = (await execute(db, Explain(statement))).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+async def estimate_table_count(db, table) -> int:
+    # reltuples is -1 until the table has been vacuumed or analyzed at least once
+    statement = text('SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)').bindparams(
+        bindparam('table', table.name))
+    return max((await execute(db, statement)).scalar() or 0, 0)
+
@@ -1,22 +1,102 @@
+from fastapi import Depends, Request
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
 from .config import settings
+from .db_pool import InstrumentedAsyncAdaptedQueuePool, InstrumentedQueuePool, instrument_engine
+from .db_routing import READ_ONLY_METHODS, ReplicaMonitor, RoutingSession, mark_read_only, register_replica_metrics
 
 SQLALCHEMY_DATABASE_URL = f"postgresql://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}@{settings.POSTGRES_HOSTNAME}:{settings.DATABASE_PORT}/{settings.POSTGRES_DB}"
+SQLALCHEMY_ASYNC_DATABASE_URL = f"postgresql+asyncpg://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}@{settings.POSTGRES_HOSTNAME}:{settings.DATABASE_PORT}/{settings.POSTGRES_DB}"
+
+POOL_OPTIONS = dict(
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+)
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
-    pool_size=200,
-    encoding='utf-8'
+    poolclass=InstrumentedQueuePool,
+    encoding='utf-8',
+    **POOL_OPTIONS
 )
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+instrument_engine(engine, 'sync')
+
+# Without DATABASE_REPLICA_URL every session binds to the primary
+replica_monitor = None
+if settings.DATABASE_REPLICA_URL:
+    replica_engine = create_engine(
+        settings.DATABASE_REPLICA_URL,
+        poolclass=InstrumentedQueuePool,
+        encoding='utf-8',
+        **POOL_OPTIONS
+    )
+    instrument_engine(replica_engine, 'replica')
+    replica_monitor = ReplicaMonitor(replica_engine, settings.REPLICA_MAX_LAG_SECONDS, settings.REPLICA_LAG_CHECK_INTERVAL_SECONDS)
+    register_replica_metrics(replica_monitor)
+
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, primary=engine, replica_monitor=replica_monitor)
+
+# The asyncpg engine is only created when DATABASE_ASYNC_MODE is on, so asyncpg stays optional
+async_engine = None
+AsyncSessionLocal = None
+if settings.DATABASE_ASYNC_MODE:
+    async_engine = create_async_engine(SQLALCHEMY_ASYNC_DATABASE_URL, poolclass=InstrumentedAsyncAdaptedQueuePool, **POOL_OPTIONS)
+    instrument_engine(async_engine.sync_engine, 'async')
+    async_replica_monitor = None
+    if settings.DATABASE_REPLICA_URL:
+        async_replica_engine = create_async_engine(
+            make_url(settings.DATABASE_REPLICA_URL).set(drivername='postgresql+asyncpg'),
+            poolclass=InstrumentedAsyncAdaptedQueuePool,
+            **POOL_OPTIONS
+        )
+        instrument_engine(async_replica_engine.sync_engine, 'async_replica')
+        async_replica_monitor = ReplicaMonitor(async_replica_engine.sync_engine, settings.REPLICA_MAX_LAG_SECONDS, settings.REPLICA_LAG_CHECK_INTERVAL_SECONDS)
+    AsyncSessionLocal = sessionmaker(
+        class_=AsyncSession,
+        sync_session_class=RoutingSession,
+        autoflush=False,
+        expire_on_commit=False,
+        primary=async_engine.sync_engine,
+        replica_monitor=async_replica_monitor,
+    )
 
 Base = declarative_base()
 
-def get_db():
+def get_db(request: Request):
     db = SessionLocal()
+    mark_read_only(db, request.method in READ_ONLY_METHODS)
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def get_read_only_db(db: Session = Depends(get_db)):
+    # Opts a non-GET handler (e.g. a POST search) into replica reads
+    mark_read_only(db)
+    return db
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_read_db(db: Session = Depends(get_db)):
+    # Hot read paths take this dependency: an AsyncSession in async mode, otherwise the request's Session
+    if settings.DATABASE_ASYNC_MODE:
+        async with AsyncSessionLocal() as async_db:
+            mark_read_only(async_db.sync_session)
+            yield async_db
+    else:
+        yield db
+
+async def execute(db, statement):
+    # Runs a statement on either session type without blocking the event loop
+    if isinstance(db, AsyncSession):
+        return await db.execute(statement)
+    return await run_in_threadpool(db.execute, statement)
@@ -0,0 +1,139 @@
+import threading
+import time
+from typing import Dict
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from . import metrics
+
+CHECKOUT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+LIFETIME_BUCKETS = (1, 10, 60, 300, 900, 1800, 3600, 14400, 86400)
+
+
+class PoolStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self._lock = threading.Lock()
+        self.counters = {
+            'connects': 0,
+            'checkouts': 0,
+            'checkins': 0,
+            'checkout_timeouts': 0,
+            'invalidations': 0,
+            'soft_invalidations': 0,
+            'closes': 0,
+        }
+        self.checkout_latency = metrics.Histogram(CHECKOUT_BUCKETS)
+        self.connection_lifetime = metrics.Histogram(LIFETIME_BUCKETS)
+        self.peak_overflow = 0
+
+    def incr(self, counter: str):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def observe_checkout(self, seconds: float):
+        with self._lock:
+            self.checkout_latency.observe(seconds)
+
+    def observe_lifetime(self, seconds: float):
+        with self._lock:
+            self.connection_lifetime.observe(seconds)
+
+    def snapshot(self) -> dict:
+        pool = self.pool
+        with self._lock:
+            overflow = max(pool.overflow(), 0) if pool is not None else 0
+            self.peak_overflow = max(self.peak_overflow, overflow)
+            return dict(
+                self.counters,
+                size=pool.size() if pool is not None else 0,
+                in_use=pool.checkedout() if pool is not None else 0,
+                idle=pool.checkedin() if pool is not None else 0,
+                overflow=overflow,
+                peak_overflow=self.peak_overflow,
+                max_overflow=pool._max_overflow if pool is not None else 0,
+                checkout_latency_seconds=self.checkout_latency.snapshot(),
+                connection_lifetime_seconds=self.connection_lifetime.snapshot(),
+            )
+
+
+_pool_stats: Dict[str, PoolStats] = {}
+
+
+class _TimedCheckout:
+    # There is no "checkout requested" pool event, so the wait is timed around QueuePool._do_get
+    _stats: PoolStats = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            if self._stats is not None:
+                self._stats.incr('checkout_timeouts')
+            raise
+        finally:
+            if self._stats is not None:
+                self._stats.observe_checkout(time.perf_counter() - start)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool._stats = self._stats
+        if self._stats is not None:
+            self._stats.pool = pool
+        return pool
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class InstrumentedAsyncAdaptedQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def instrument_engine(engine, name: str) -> PoolStats:
+    stats = PoolStats(name)
+    pool = engine.pool
+    pool._stats = stats
+    stats.pool = pool
+    _pool_stats[name] = stats
+
+    @event.listens_for(pool, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        connection_record.info['connected_at'] = time.monotonic()
+        stats.incr('connects')
+
+    @event.listens_for(pool, 'checkout')
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.incr('checkouts')
+
+    @event.listens_for(pool, 'checkin')
+    def on_checkin(dbapi_connection, connection_record):
+        stats.incr('checkins')
+
+    @event.listens_for(pool, 'invalidate')
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        stats.incr('invalidations')
+
+    @event.listens_for(pool, 'soft_invalidate')
+    def on_soft_invalidate(dbapi_connection, connection_record, exception):
+        stats.incr('soft_invalidations')
+
+    @event.listens_for(pool, 'close')
+    def on_close(dbapi_connection, connection_record):
+        stats.incr('closes')
+        connected_at = connection_record.info.get('connected_at')
+        if connected_at is not None:
+            stats.observe_lifetime(time.monotonic() - connected_at)
+
+    return stats
+
+
+def get_pool_stats() -> Dict[str, dict]:
+    return {name: stats.snapshot() for name, stats in _pool_stats.items()}
+
+
+metrics.register('db_pool', get_pool_stats)
@@ -0,0 +1,102 @@
+import threading
+import time
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+from . import metrics
+from app.logging_config import setup_logging
+logger = setup_logging()
+
+READ_ONLY_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Lag is 0 on a primary (same database under two URLs) and on a standby that has replayed everything it received
+REPLICA_LAG_SQL = text(
+    "SELECT CASE "
+    "WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class ReplicaMonitor:
+    def __init__(self, engine, max_lag_seconds: float, check_interval_seconds: float):
+        self.engine = engine
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval_seconds = check_interval_seconds
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self.lag_seconds = None
+        self.healthy = False
+        self.stats = {'replica_reads': 0, 'primary_fallbacks': 0, 'lag_checks': 0, 'lag_check_errors': 0}
+
+    def _check(self):
+        self.stats['lag_checks'] += 1
+        try:
+            with self.engine.connect() as connection:
+                self.lag_seconds = float(connection.execute(REPLICA_LAG_SQL).scalar())
+            self.healthy = self.lag_seconds <= self.max_lag_seconds
+            if not self.healthy:
+                logger.warning(f'Replica lag {self.lag_seconds:.1f}s exceeds {self.max_lag_seconds}s, reading from primary')
+        except Exception as e:
+            self.stats['lag_check_errors'] += 1
+            self.lag_seconds = None
+            self.healthy = False
+            logger.error(f'Replica lag check failed: {e}')
+
+    def is_usable(self) -> bool:
+        # One caller refreshes the cached state per interval; the others use the last result
+        now = time.monotonic()
+        if self._checked_at is None or now - self._checked_at >= self.check_interval_seconds:
+            if self._lock.acquire(blocking=False):
+                try:
+                    self._checked_at = now
+                    self._check()
+                finally:
+                    self._lock.release()
+        if self.healthy:
+            self.stats['replica_reads'] += 1
+        else:
+            self.stats['primary_fallbacks'] += 1
+        return self.healthy
+
+    def get_stats(self) -> dict:
+        return dict(self.stats, lag_seconds=self.lag_seconds, healthy=self.healthy, max_lag_seconds=self.max_lag_seconds)
+
+
+class RoutingSession(Session):
+    # Reads go to the replica only while info['read_only'] is set; after a flush or DML
+    # statement the session stays on the primary, so reads after a write see that write
+
+    def __init__(self, primary=None, replica_monitor: ReplicaMonitor = None, bind=None, **kw):
+        super().__init__(bind=bind or primary, **kw)
+        self.primary = bind or primary
+        self.replica_monitor = replica_monitor
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if isinstance(clause, UpdateBase):
+            self.info['force_primary'] = True
+        if (
+            self.replica_monitor is not None
+            and self.info.get('read_only')
+            and not self.info.get('force_primary')
+            and not self._flushing
+        ):
+            if self.replica_monitor.is_usable():
+                return self.replica_monitor.engine
+            # Once a request falls back it stays on the primary, so it never mixes snapshots
+            self.info['force_primary'] = True
+        return self.primary
+
+
+@event.listens_for(RoutingSession, 'before_flush')
+def _pin_to_primary(session, flush_context, instances):
+    session.info['force_primary'] = True
+
+
+def mark_read_only(session: Session, read_only: bool = True):
+    session.info['read_only'] = read_only
+
+
+def register_replica_metrics(monitor: ReplicaMonitor):
+    metrics.register('db_replica', monitor.get_stats)
@@ -0,0 +1,47 @@
+from typing import Iterable, Optional, Set
+
+from fastapi import HTTPException, Query, Response, status
+
+from .serialization import direct_response, trusted_response
+
+
+class FieldSet:
+    # Route dependency for ?fields=id,name,... Returns the requested top-level fields of the schema,
+    # or None when the parameter is missing or blank, which means every field
+    def __init__(self, schema):
+        self.allowed = list(schema.__fields__)
+
+    def __call__(self, fields: str = Query(None, description='Comma-separated fields to return')) -> Optional[Set[str]]:
+        if fields is None:
+            return None
+        requested = {field.strip() for field in fields.split(',') if field.strip()}
+        if not requested:
+            return None
+        unknown = requested - set(self.allowed)
+        if unknown:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail=f"Unknown fields: {', '.join(sorted(unknown))}. Allowed: {', '.join(self.allowed)}")
+        return requested
+
+
+def wants(fields: Optional[Set[str]], field: str) -> bool:
+    return fields is None or field in fields
+
+
+def pick(data: dict, fields: Optional[Set[str]]) -> dict:
+    if fields is None:
+        return data
+    return {key: value for key, value in data.items() if key in fields}
+
+
+def fields_response(content, fields: Optional[Set[str]], response: Response = None):
+    # A partial object cannot pass the full response_model, so sparse payloads are always sent directly
+    if fields is None:
+        return trusted_response(content, response)
+    return direct_response(content, response)
+
+
+def keep_columns(columns: Iterable, fields: Optional[Set[str]], keep: Iterable[str] = ()) -> list:
+    # Requested columns plus the ones the query itself needs, such as the keyset
+    keep = set(keep)
+    return [column for column in columns if wants(fields, column.key) or column.key in keep]
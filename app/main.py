@@ -8,13 +8,19 @@ from app import models
 from app.config import Settings
 from app.database import SessionLocal, get_db
 from app.logging_config import setup_logging
-from app.routers import user, auth, role, permission, category, status, permission_detail, menu, sub_menu, subject_menu
+from app.routers import user, auth, role, permission, category, status, permission_detail, menu, sub_menu, subject_menu, internal, history
 import pytz
-from fastapi import BackgroundTasks, FastAPI, HTTPException, WebSocket, Depends, WebSocketDisconnect, Query
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Request, WebSocket, Depends, WebSocketDisconnect, Query
 from fastapi_jwt_auth import AuthJWT
 from fastapi_jwt_auth.exceptions import AuthJWTException
 from fastapi.responses import HTMLResponse
-from app.utils import RedisManager, active_websockets
+from app.utils import RedisManager, active_websockets, shutdown_password_executor
+from app.audit import audit_pipeline
+from app.maintenance import start_maintenance, stop_maintenance
+from app import sql_stats
+from app.compression import CompressionMiddleware
+from app.serialization import default_response_class
+import time
 from sqlalchemy.orm import Session
 from app.config import settings
 from fastapi import Depends
@@ -25,6 +31,7 @@ logger = setup_logging()
 app = FastAPI(
     title="Stream API DOCS",
     version="1.0.0",
+    default_response_class=default_response_class,
 )
 
 
@@ -47,6 +54,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(CompressionMiddleware)
+
+
+@app.middleware("http")
+async def sql_instrumentation(request: Request, call_next):
+    if not settings.SQL_INSTRUMENTATION:
+        return await call_next(request)
+
+    start = time.perf_counter()
+    token = sql_stats.start_request()
+    try:
+        response = await call_next(request)
+    finally:
+        stats = sql_stats.finish_request(token)
+    response.headers['Server-Timing'] = sql_stats.server_timing(stats, time.perf_counter() - start)
+    sql_stats.report_repeated_shapes(stats, request.method, request.url.path)
+    return response
+
 app.include_router(auth.router, tags=['Auth'], prefix='/api/auth')
 app.include_router(user.router, tags=['Users'], prefix='/api/users')
 app.include_router(subject_menu.router, tags=['Subject Menu'], prefix='/api/subject-menu')
@@ -56,4 +81,36 @@ app.include_router(role.router, tags=['Roles'], prefix='/api/roles')
 app.include_router(permission.router, tags=['Permissions'], prefix='/api/permissions')
 app.include_router(permission_detail.router, tags=['Permissions Detail'], prefix='/api/permissions-detail')
 app.include_router(category.router, tags=['Categories'], prefix='/api/categories')
-app.include_router(status.router, tags=['Status'], prefix='/api/status')
\ No newline at end of file
+app.include_router(status.router, tags=['Status'], prefix='/api/status')
+app.include_router(history.router, tags=['History'], prefix='/api/history')
+app.include_router(internal.router, tags=['Internal'], prefix='/api/internal')
+
+
+@app.on_event("startup")
+async def start_audit_pipeline():
+    audit_pipeline.start()
+
+
+@app.on_event("startup")
+async def start_maintenance_jobs():
+    start_maintenance()
+
+
+@app.on_event("shutdown")
+async def stop_audit_pipeline():
+    await audit_pipeline.stop()
+
+
+@app.on_event("shutdown")
+async def stop_maintenance_jobs():
+    await stop_maintenance()
+
+
+@app.on_event("shutdown")
+def shutdown_executors():
+    shutdown_password_executor()
+
+
+@app.on_event("shutdown")
+async def close_redis():
+    await RedisManager().close()
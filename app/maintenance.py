@@ -0,0 +1,138 @@
+import asyncio
+import re
+from datetime import date
+from typing import Callable, List
+
+from sqlalchemy import text
+
+from .config import settings
+from .database import engine
+from app.logging_config import setup_logging
+
+logger = setup_logging()
+
+# Advisory lock keys, so only one worker process runs a given job at a time
+USER_HISTORY_LOCK_KEY = 7314520001
+ROLE_USER_COUNT_LOCK_KEY = 7314520002
+
+USER_HISTORY_PARTITION = re.compile(r'^user_history_p(\d{4})(\d{2})$')
+
+
+def _add_months(day: date, months: int) -> date:
+    month_index = day.year * 12 + day.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def _try_lock(connection, key: int) -> bool:
+    return connection.execute(text('SELECT pg_try_advisory_xact_lock(:key)'), {'key': key}).scalar()
+
+
+def ensure_user_history_partitions(connection, months_ahead: int) -> List[str]:
+    # Each month gets its own savepoint, so one month that cannot be created does not block the others
+    this_month = date.today().replace(day=1)
+    partitions = []
+    for offset in range(months_ahead + 1):
+        month_start = _add_months(this_month, offset)
+        try:
+            with connection.begin_nested():
+                partitions.append(connection.execute(text('SELECT user_history_create_partition(:month_start)'), {'month_start': month_start}).scalar())
+        except Exception as e:
+            logger.error(f"Error creating user history partition for {month_start:%Y-%m}. Error: {str(e)}")
+    return partitions
+
+
+def drop_expired_user_history_partitions(connection, retention_months: int) -> List[str]:
+    if retention_months <= 0:
+        return []
+
+    cutoff = _add_months(date.today().replace(day=1), -retention_months)
+    partitions = connection.execute(text("""
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = 'user_history'
+    """)).scalars().all()
+
+    # Rows that landed in the default partition are held to the same retention as the monthly ones
+    expired_default_rows = connection.execute(
+        text('DELETE FROM user_history_default WHERE created_at < :cutoff'), {'cutoff': cutoff}).rowcount
+    if expired_default_rows:
+        logger.info(f'Deleted {expired_default_rows} expired rows from user_history_default')
+
+    dropped = []
+    for name in partitions:
+        match = USER_HISTORY_PARTITION.match(name)
+        if match and date(int(match.group(1)), int(match.group(2)), 1) < cutoff:
+            # Dropping a whole partition is a metadata change, unlike DELETE which rewrites and bloats the table
+            connection.execute(text(f'ALTER TABLE user_history DETACH PARTITION "{name}"'))
+            connection.execute(text(f'DROP TABLE "{name}"'))
+            dropped.append(name)
+    return dropped
+
+
+def run_user_history_maintenance():
+    with engine.begin() as connection:
+        if not _try_lock(connection, USER_HISTORY_LOCK_KEY):
+            return
+
+        ensure_user_history_partitions(connection, settings.USER_HISTORY_PARTITIONS_AHEAD)
+        dropped = drop_expired_user_history_partitions(connection, settings.USER_HISTORY_RETENTION_MONTHS)
+        if dropped:
+            logger.info(f"Dropped expired user history partitions: {', '.join(dropped)}")
+
+
+def reconcile_role_user_counts(connection) -> List[str]:
+    # Locking the role rows first makes concurrent trigger updates wait, so the counts below are not stale
+    connection.execute(text('SELECT id FROM roles FOR UPDATE'))
+    return connection.execute(text("""
+        UPDATE roles SET user_count = counts.user_count
+        FROM (
+            SELECT roles.id, count(users.id) AS user_count
+            FROM roles LEFT JOIN users ON users.role_id = roles.id
+            GROUP BY roles.id
+        ) AS counts
+        WHERE roles.id = counts.id AND roles.user_count <> counts.user_count
+        RETURNING roles.code
+    """)).scalars().all()
+
+
+def run_role_user_count_reconciliation():
+    with engine.begin() as connection:
+        if not _try_lock(connection, ROLE_USER_COUNT_LOCK_KEY):
+            return
+
+        drifted = reconcile_role_user_counts(connection)
+        if drifted:
+            logger.warning(f"Corrected drifted user counts for roles: {', '.join(str(code) for code in drifted)}")
+
+
+jobs: List[Callable[[], None]] = [run_user_history_maintenance, run_role_user_count_reconciliation]
+_task: asyncio.Task = None
+
+
+async def _run():
+    loop = asyncio.get_running_loop()
+    while True:
+        for job in jobs:
+            try:
+                await loop.run_in_executor(None, job)
+            except Exception as e:
+                logger.error(f"Error running maintenance job {job.__name__}. Error: {str(e)}")
+        await asyncio.sleep(settings.MAINTENANCE_INTERVAL_SECONDS)
+
+
+def start_maintenance():
+    global _task
+    _task = asyncio.get_running_loop().create_task(_run())
+
+
+async def stop_maintenance():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
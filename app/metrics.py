@@ -0,0 +1,34 @@
+import bisect
+from typing import Callable, Dict
+
+_collectors: Dict[str, Callable[[], dict]] = {}
+
+
+def register(name: str, collector: Callable[[], dict]):
+    _collectors[name] = collector
+
+
+def collect() -> Dict[str, dict]:
+    return {name: collector() for name, collector in _collectors.items()}
+
+
+class Histogram:
+    # Non-cumulative bucket counts: an observation lands in the first bucket whose bound it does not exceed
+    def __init__(self, buckets):
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def snapshot(self) -> dict:
+        buckets = {f'le_{bound}': count for bound, count in zip(self.buckets, self.counts)}
+        buckets['le_inf'] = self.counts[-1]
+        return {'count': self.count, 'sum': self.sum, 'max': self.max, 'buckets': buckets}
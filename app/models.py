@@ -1,9 +1,9 @@
 import uuid
 from .database import Base
-from sqlalchemy import TIMESTAMP, Column, ForeignKey, String, Boolean, text, INTEGER
+from sqlalchemy import BIGINT, TIMESTAMP, Column, ForeignKey, String, Boolean, text, INTEGER
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import Index, UniqueConstraint
 
 class Permission(Base):
     __tablename__ = 'permissions'
@@ -12,25 +12,26 @@ class Permission(Base):
     code = Column(String(length=50), nullable=True)
     description = Column(String(length=500), nullable=True)
     created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
-    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"), onupdate=text("now()"))
 
-    roles = relationship('RolePermission', back_populates='permission', cascade='all, delete-orphan', single_parent=True)
-    permissions_detail = relationship('PermissionDetail', back_populates='permissions', cascade='all, delete-orphan', single_parent=True)
+    roles = relationship('RolePermission', back_populates='permission', cascade='all, delete-orphan', single_parent=True, passive_deletes=True)
+    permissions_detail = relationship('PermissionDetail', back_populates='permissions', cascade='all, delete-orphan', single_parent=True, passive_deletes=True)
 
     __table_args__ = (
         UniqueConstraint('name', 'code'),
+        Index('ix_permissions_created_at_id', 'created_at', 'id'),
     )
 
 class PermissionDetail(Base):
     __tablename__ = 'permissions_detail'
     id = Column(UUID(as_uuid=True), primary_key=True, nullable=False, default=uuid.uuid4)
-    permission_id = Column(UUID(as_uuid=True), ForeignKey('permissions.id'))
+    permission_id = Column(UUID(as_uuid=True), ForeignKey('permissions.id', ondelete='CASCADE'), index=True)
     name = Column(String(length=50), nullable=False)
     code = Column(String(length=50), nullable=True)
     created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
-    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"), onupdate=text("now()"))
     permissions = relationship('Permission', back_populates='permissions_detail')
-    role_permission_details = relationship('RolePermissionDetail', back_populates='permission_detail')
+    role_permission_details = relationship('RolePermissionDetail', back_populates='permission_detail', passive_deletes=True)
 
     __table_args__ = (
         UniqueConstraint('permission_id', 'code'),
@@ -38,8 +39,8 @@ class PermissionDetail(Base):
 
 class RolePermission(Base):
     __tablename__ = 'role_permissions'
-    role_id = Column(UUID(as_uuid=True), ForeignKey('roles.id'), primary_key=True)
-    permission_id = Column(UUID(as_uuid=True), ForeignKey('permissions.id'), primary_key=True)
+    role_id = Column(UUID(as_uuid=True), ForeignKey('roles.id', ondelete='CASCADE'), primary_key=True)
+    permission_id = Column(UUID(as_uuid=True), ForeignKey('permissions.id', ondelete='CASCADE'), primary_key=True)
 
     permission = relationship('Permission', back_populates='roles')
     role = relationship('Role', back_populates='permissions', passive_deletes=True)
@@ -47,8 +48,8 @@ class RolePermission(Base):
 class RolePermissionDetail(Base):
     __tablename__ = 'role_permission_details'
     id = Column(UUID(as_uuid=True), primary_key=True, nullable=False, default=uuid.uuid4)
-    role_id = Column(UUID(as_uuid=True), ForeignKey('roles.id'))
-    permission_detail_id = Column(UUID(as_uuid=True), ForeignKey('permissions_detail.id'))
+    role_id = Column(UUID(as_uuid=True), ForeignKey('roles.id', ondelete='CASCADE'), index=True)
+    permission_detail_id = Column(UUID(as_uuid=True), ForeignKey('permissions_detail.id', ondelete='CASCADE'), index=True)
     
     role = relationship('Role', back_populates='permission_details')
     permission_detail = relationship('PermissionDetail', back_populates='role_permission_details')
@@ -58,9 +59,9 @@ class UserMeta(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, nullable=False, default=uuid.uuid4)
     meta_code = Column(String(length=100) , nullable=False)
     meta_name = Column(String(length=100), nullable=False)
-    role_id = Column(UUID(as_uuid=True), ForeignKey('roles.id'), nullable=False)
+    role_id = Column(UUID(as_uuid=True), ForeignKey('roles.id'), nullable=False, index=True)
     created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
-    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"), onupdate=text("now()"))
 
     details = relationship('UserMetaDetail', back_populates='meta', cascade='all, delete-orphan', single_parent=True)
     role_meta = relationship('Role', back_populates='role_user_meta')
@@ -68,11 +69,11 @@ class UserMeta(Base):
 class UserMetaDetail(Base):
     __tablename__ = 'user_meta_detail'
     id = Column(UUID(as_uuid=True), primary_key=True, nullable=False, default=uuid.uuid4)
-    meta_id = Column(UUID(as_uuid=True), ForeignKey('user_meta.id'), nullable=False)
-    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False)
+    meta_id = Column(UUID(as_uuid=True), ForeignKey('user_meta.id'), nullable=False, index=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False, index=True)
     meta_value = Column(String(length=250), nullable=True)
     created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
-    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"), onupdate=text("now()"))
 
     meta = relationship('UserMeta', back_populates='details')
     user = relationship('User', back_populates='user_meta_details')
@@ -83,10 +84,15 @@ class Category(Base):
     name = Column(String(length=250), nullable=True)
     code = Column(String(length=250), nullable=True)
     created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
-    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"), onupdate=text("now()"))
 
     # schedules = relationship('Schedule', back_populates='category', cascade='all, delete-orphan', single_parent=True)
 
+    __table_args__ = (
+        Index('ix_categories_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        Index('ix_categories_created_at_id', 'created_at', 'id'),
+    )
+
 class Status(Base):
     __tablename__ = 'statuses'
     id = Column(UUID(as_uuid=True), primary_key=True, nullable=False, default=uuid.uuid4)
@@ -95,10 +101,14 @@ class Status(Base):
     color = Column(String(length=100), nullable=True)
     code = Column(String(length=50), nullable=True)
     created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
-    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"), onupdate=text("now()"))
 
     # schedules = relationship('Schedule', back_populates='status', cascade='all, delete-orphan', single_parent=True)
 
+    __table_args__ = (
+        Index('ix_statuses_created_at_id', 'created_at', 'id'),
+    )
+
 class User(Base):
     __tablename__ = 'users'
     id = Column(UUID(as_uuid=True), primary_key=True, nullable=False, default=uuid.uuid4)
@@ -106,27 +116,41 @@ class User(Base):
     email = Column(String(length=250), unique=True, nullable=False)
     avatar = Column(String(length=550), nullable=True)
     password = Column(String, nullable=False)
-    is_activate = Column(Boolean, default=True)
-    role_id = Column(UUID(as_uuid=True), ForeignKey('roles.id'), nullable=False)
+    is_activate = Column(Boolean, default=True, index=True)
+    role_id = Column(UUID(as_uuid=True), ForeignKey('roles.id'), nullable=False, index=True)
     role = relationship('Role', back_populates='users')
     created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
-    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"), onupdate=text("now()"))
 
     user_meta_details = relationship('UserMetaDetail', back_populates='user')
     # rooms = relationship('Room', back_populates='user')
     user = relationship('UserHisory', back_populates='user')
 
+    __table_args__ = (
+        Index('ix_users_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        Index('ix_users_email_trgm', 'email', postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'}),
+        Index('ix_users_created_at_id', 'created_at', 'id'),
+    )
+
 class UserHisory(Base):
     __tablename__ = 'user_history'
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, nullable=False)
     permission = Column(String(length=50), nullable=True)
     permission_detail = Column(String(length=50), nullable=True)
     email = Column(String, nullable=True)
     status_code = Column(INTEGER, nullable=True)
     user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=True)
     user = relationship('User', back_populates='user')
-    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
+    created_at = Column(TIMESTAMP(timezone=True), primary_key=True, nullable=False, server_default=text("now()"))
+
+    # Monthly range partitions are created and dropped by app.maintenance
+    __table_args__ = (
+        Index('ix_user_history_user_id_created_at', 'user_id', 'created_at'),
+        Index('ix_user_history_permission_created_at', 'permission', 'created_at'),
+        Index('ix_user_history_created_at_id', 'created_at', 'id'),
+        {'postgresql_partition_by': 'RANGE (created_at)'},
+    )
 
 class Role(Base):
     __tablename__ = 'roles'
@@ -135,14 +159,16 @@ class Role(Base):
     code = Column(String(length=50), unique=True, nullable=True)
     icon = Column(String(length=50), nullable=True)
     color = Column(String(length=50), nullable=True)
+    # Kept in step with users by the users_role_user_count trigger and reconciled by app.maintenance
+    user_count = Column(INTEGER, nullable=False, server_default=text("0"))
     created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
-    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"), onupdate=text("now()"))
 
-    permissions = relationship('RolePermission', back_populates='role', cascade='all, delete-orphan', single_parent=True)
-    permission_details = relationship('RolePermissionDetail', back_populates='role', cascade='all, delete-orphan', single_parent=True)
+    permissions = relationship('RolePermission', back_populates='role', cascade='all, delete-orphan', single_parent=True, passive_deletes=True)
+    permission_details = relationship('RolePermissionDetail', back_populates='role', cascade='all, delete-orphan', single_parent=True, passive_deletes=True)
     users = relationship('User', back_populates='role', cascade='all, delete-orphan', single_parent=True)
     
-    role_menus = relationship('RoleMenu', back_populates='role', cascade='all, delete-orphan', single_parent=True)
+    role_menus = relationship('RoleMenu', back_populates='role', cascade='all, delete-orphan', single_parent=True, passive_deletes=True)
     role_user_meta = relationship('UserMeta', back_populates='role_meta')
 
 class SubjectMenu(Base):
@@ -154,10 +180,14 @@ class SubjectMenu(Base):
     icon = Column(String(length=250), nullable=True)
     decscript = Column(String(length=500), nullable=True)
     created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
-    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"), onupdate=text("now()"))
 
     menu = relationship('Menu', back_populates='menu_subject', cascade='all, delete-orphan', single_parent=True)
 
+    __table_args__ = (
+        Index('ix_subject_menu_created_at_id', 'created_at', 'id'),
+    )
+
 class Menu(Base):
     __tablename__ = 'menus'
     id = Column(UUID(as_uuid=True), primary_key=True, nullable=False, default=uuid.uuid4)
@@ -167,27 +197,41 @@ class Menu(Base):
     position = Column(INTEGER, nullable=True)
     icon = Column(String(length=250), nullable=True)
     created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
-    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"), onupdate=text("now()"))
 
-    sub_menu = relationship('SubMenu', back_populates='menu', cascade='all, delete-orphan', single_parent=True)
-    menu = relationship('RoleMenu', back_populates='menu', cascade='all, delete-orphan', single_parent=True)
+    sub_menu = relationship('SubMenu', back_populates='menu', cascade='all, delete-orphan', single_parent=True, passive_deletes=True)
+    menu = relationship('RoleMenu', back_populates='menu', cascade='all, delete-orphan', single_parent=True, passive_deletes=True)
     menu_subject = relationship('SubjectMenu', back_populates='menu', cascade='all, delete-orphan', single_parent=True)
 
+    __table_args__ = (
+        Index('ix_menus_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        Index('ix_menus_created_at_id', 'created_at', 'id'),
+    )
+
 class SubMenu(Base):
     __tablename__ = 'submenus'
     id = Column(UUID(as_uuid=True), primary_key=True, nullable=False, default=uuid.uuid4)
-    menu_id = Column(UUID(as_uuid=True), ForeignKey('menus.id'), primary_key=True)
+    menu_id = Column(UUID(as_uuid=True), ForeignKey('menus.id', ondelete='CASCADE'), primary_key=True, index=True)
     name = Column(String(length=250), nullable=False)
     code = Column(String(length=250), nullable=False)
     icon = Column(String(length=250), nullable=True)
     created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
-    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"), onupdate=text("now()"))
 
     menu = relationship('Menu', back_populates='sub_menu', cascade='all, delete-orphan', single_parent=True)
 
+    __table_args__ = (
+        Index('ix_submenus_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
+
 class RoleMenu(Base):
     __tablename__ = 'role_menus'
-    role_id = Column(UUID(as_uuid=True), ForeignKey('roles.id'), primary_key=True)
-    menu_id = Column(UUID(as_uuid=True), ForeignKey('menus.id'), primary_key=True)
+    role_id = Column(UUID(as_uuid=True), ForeignKey('roles.id', ondelete='CASCADE'), primary_key=True)
+    menu_id = Column(UUID(as_uuid=True), ForeignKey('menus.id', ondelete='CASCADE'), primary_key=True, index=True)
     role = relationship('Role', back_populates='role_menus')
-    menu = relationship('Menu', back_populates='menu')
\ No newline at end of file
+    menu = relationship('Menu', back_populates='menu')
+class CacheVersion(Base):
+    # Shared version stamps for the in-process caches; every worker compares its cached copies against them
+    __tablename__ = 'cache_versions'
+    key = Column(String(length=100), primary_key=True, nullable=False)
+    version = Column(BIGINT, nullable=False, server_default=text("0"))
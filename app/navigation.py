@@ -0,0 +1,96 @@
+import hashlib
+import threading
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+from uuid import UUID
+
+from fastapi import Response, status
+from sqlalchemy.orm import Session
+
+from .compression import compress, negotiate
+from .conditional import etag_matches
+from .config import settings
+from .cache_versions import aread_versions, bump_versions
+from .permission_cache import version_keys
+
+
+class NavigationBundle(NamedTuple):
+    body: bytes
+    etag: str
+    version: Tuple
+    compiled_at: float
+    # Compressed copies of body by content coding, filled on first use
+    encoded: Dict[str, bytes]
+
+
+_lock = threading.Lock()
+_bundles: Dict[UUID, NavigationBundle] = {}
+# Last shared version each role's bundle was seen at by this worker
+_observed: Dict[UUID, Tuple] = {}
+
+MENU_VERSION_KEY = 'menus'
+
+
+async def current_version(db, role_id: UUID) -> Tuple:
+    # The role's permission stamps and the menu stamp from cache_versions, read in one query, so a
+    # permission or menu change made through any worker retires every worker's bundle
+    version = await aread_versions(db, version_keys(role_id) + [MENU_VERSION_KEY])
+    _observed[role_id] = version
+    return version
+
+
+def cached_bundle(role_id: UUID, version: Tuple) -> Optional[NavigationBundle]:
+    bundle = _bundles.get(role_id)
+    if (
+        bundle is not None
+        and bundle.version == version
+        and time.monotonic() - bundle.compiled_at < settings.NAVIGATION_CACHE_TTL
+    ):
+        return bundle
+    return None
+
+
+def store_bundle(role_id: UUID, body: bytes, version: Tuple) -> NavigationBundle:
+    # The ETag hashes the bytes, so every worker agrees on it and a restart cannot reuse a stale one
+    bundle = NavigationBundle(
+        body=body,
+        etag='"' + hashlib.sha256(body).hexdigest()[:32] + '"',
+        version=version,
+        compiled_at=time.monotonic(),
+        encoded={},
+    )
+    with _lock:
+        # Drop the result if a newer version was seen while we were compiling
+        if version == _observed.get(role_id):
+            _bundles[role_id] = bundle
+    return bundle
+
+
+def representation(bundle: NavigationBundle, encoding: Optional[str]) -> Tuple[bytes, str]:
+    # Each bundle is compressed at most once per coding. Compressed bytes are a different representation,
+    # so they get their own strong ETag
+    if encoding is None or len(bundle.body) < settings.COMPRESSION_MINIMUM_SIZE:
+        return bundle.body, bundle.etag
+    body = bundle.encoded.get(encoding)
+    if body is None:
+        body = bundle.encoded.setdefault(encoding, compress(bundle.body, encoding))
+    return body, bundle.etag[:-1] + f'-{encoding}"'
+
+
+def bundle_response(bundle: NavigationBundle, if_none_match: Optional[str], accept_encoding: Optional[str] = None) -> Response:
+    encoding = negotiate(accept_encoding)
+    body, etag = representation(bundle, encoding)
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if settings.COMPRESSION_ENABLED:
+        headers['Vary'] = 'Accept-Encoding'
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if body is not bundle.body:
+        headers['Content-Encoding'] = encoding
+    return Response(content=body, media_type='application/json', headers=headers)
+
+
+def invalidate_menus(db: Session):
+    bump_versions(db, MENU_VERSION_KEY)
+    with _lock:
+        _bundles.clear()
@@ -7,11 +7,14 @@ from fastapi import BackgroundTasks
 from app.schemas.enum import UserRoleEnum
 
 from . import models
-from .database import get_db
+from .database import get_db, get_read_db
 from sqlalchemy.orm import Session
 from .config import settings
 from sqlalchemy import and_
 from sqlalchemy.orm import joinedload
+from .audit import record_user_history
+from .permission_cache import RolePermissionSnapshot, aget_role_snapshot, get_role_snapshot
+from .principal_cache import Principal, aget_principal
 from app.logging_config import setup_logging
 logger = setup_logging()
 class Settings(BaseModel):
@@ -39,11 +42,11 @@ class UserNotFound(Exception):
 class UserNotPermission(Exception):
     pass
 
-def require_user(db: Session = Depends(get_db), Authorize: AuthJWT = Depends()):
+async def require_user(db = Depends(get_read_db), Authorize: AuthJWT = Depends()):
     try:
         Authorize.jwt_required()
         user_id = Authorize.get_jwt_subject()
-        user = db.query(models.User).filter(models.User.id == user_id).first()
+        user = await aget_principal(db, user_id)
 
         if not user or not user.is_activate:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='User authentication failed')
@@ -67,43 +70,48 @@ def require_user(db: Session = Depends(get_db), Authorize: AuthJWT = Depends()):
 def check_permissions_detail(
     required_permissions: List[str],
     required_permissions_detail: List[str],
-    user: models.User,
+    user: Principal,
     background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
 ):
-    
-    if user.role.code == UserRoleEnum.admin:
-        background_tasks.add_task(user_history, user, db=db, status_code=status.HTTP_200_OK, permission=required_permissions[0], permission_detail=required_permissions_detail[0])
-        return user
-    else:
-        user_role_permissions = {permission.permission.code for permission in user.role.permissions}
+    snapshot = get_role_snapshot(db, user.role_id)
+    return _authorize(snapshot, required_permissions, required_permissions_detail, user, background_tasks)
 
-        user_permission_details = {
-            permission_detail.code
-            for role_permission in user.role.permissions
-            for permission_detail in role_permission.permission.permissions_detail
-        }
+async def acheck_permissions_detail(
+    required_permissions: List[str],
+    required_permissions_detail: List[str],
+    user: Principal,
+    background_tasks: BackgroundTasks,
+    db = Depends(get_read_db),
+):
+    snapshot = await aget_role_snapshot(db, user.role_id)
+    return _authorize(snapshot, required_permissions, required_permissions_detail, user, background_tasks)
 
+def _authorize(
+    snapshot: RolePermissionSnapshot,
+    required_permissions: List[str],
+    required_permissions_detail: List[str],
+    user: Principal,
+    background_tasks: BackgroundTasks,
+):
+    if snapshot.role_code == UserRoleEnum.admin:
+        background_tasks.add_task(user_history, user, status_code=status.HTTP_200_OK, permission=required_permissions[0], permission_detail=required_permissions_detail[0])
+        return user
+    else:
         all_required_permissions = set(required_permissions + required_permissions_detail)
 
-        if not all_required_permissions.issubset(user_role_permissions.union(user_permission_details)):
+        if not snapshot.codes.issuperset(all_required_permissions):
             status_code = status.HTTP_403_FORBIDDEN
         else:
             status_code = status.HTTP_200_OK
 
-        # background_tasks.add_task(user_history, user, db=db, status_code=status.HTTP_200_OK, permission=required_permissions[0], permission_detail=required_permissions_detail[0])
+        # background_tasks.add_task(user_history, user, status_code=status.HTTP_200_OK, permission=required_permissions[0], permission_detail=required_permissions_detail[0])
 
         if status_code == status.HTTP_403_FORBIDDEN:
             raise HTTPException(status_code=status_code, detail='User does not have required permissions')
 
     
-def user_history(user: models.User, db: Session = Depends(get_db), permission: str = '', permission_detail: str = '',status_code: int = None):
-    try:
-        new_history = models.UserHisory(email=user.email, user_id=user.id, status_code=status_code, permission=permission, permission_detail=permission_detail)
-        db.add(new_history)
-        db.commit()
-        db.refresh(new_history)
-    except Exception as e:
-        error_message = f"Error creating history. Error: {str(e)}"
-        logger.error(error_message)
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Cannot create history')
\ No newline at end of file
+def user_history(user: Principal, permission: str = '', permission_detail: str = '',status_code: int = None):
+    if user is None:
+        return
+    record_user_history(user.id, user.email, permission=permission, permission_detail=permission_detail, status_code=status_code)
\ No newline at end of file
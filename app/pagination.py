@@ -0,0 +1,58 @@
+import base64
+import json
+from datetime import datetime
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from sqlalchemy import tuple_
+
+# Parsers for the common (created_at, id) keyset
+CREATED_AT_ID_PARSERS = (datetime.fromisoformat, UUID)
+
+
+def encode_cursor(*values) -> str:
+    payload = [
+        value.isoformat() if isinstance(value, datetime) else str(value) if isinstance(value, UUID) else value
+        for value in values
+    ]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, *parsers) -> tuple:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if len(values) != len(parsers):
+            raise ValueError('cursor length mismatch')
+        return tuple(parser(value) for parser, value in zip(parsers, values))
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid cursor')
+
+
+def keyset_condition(columns, values, descending: bool = True):
+    # Row-value comparison lets Postgres walk a composite index straight to the cursor position
+    if descending:
+        return tuple_(*columns) < tuple_(*values)
+    return tuple_(*columns) > tuple_(*values)
+
+
+def keyset_statement(query, columns, parsers, cursor: str, limit: int, descending: bool = True):
+    # Works on both ORM Query objects and select() statements; one extra row tells whether a next page exists
+    if cursor:
+        query = query.where(keyset_condition(columns, decode_cursor(cursor, *parsers), descending))
+
+    query = query.order_by(*[column.desc() if descending else column.asc() for column in columns])
+    return query.limit(limit + 1)
+
+
+def split_page(rows, columns, limit: int):
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(*[getattr(rows[-1], column.key) for column in columns])
+
+    return rows, next_cursor
+
+
+def keyset_page(query, columns, parsers, cursor: str, limit: int, descending: bool = True):
+    rows = keyset_statement(query, columns, parsers, cursor, limit, descending).all()
+    return split_page(rows, columns, limit)
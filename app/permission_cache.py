@@ -0,0 +1,121 @@
+import threading
+import time
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+from .cache_versions import aread_versions, bump_versions, read_versions
+from .config import settings
+from .database import execute
+
+
+class RolePermissionSnapshot(NamedTuple):
+    role_id: UUID
+    role_code: Optional[str]
+    codes: FrozenSet[str]
+    version: Tuple[int, int]
+    compiled_at: float
+
+
+_lock = threading.Lock()
+_snapshots: Dict[UUID, RolePermissionSnapshot] = {}
+# Last shared version each role was seen at by this worker
+_observed: Dict[UUID, Tuple[int, int]] = {}
+
+GLOBAL_VERSION_KEY = 'permissions'
+# Moves with every role's grant changes, for readers that span roles (e.g. the permission list's role names)
+GRANTS_VERSION_KEY = 'grants'
+
+
+def version_keys(role_id: UUID) -> List[str]:
+    # Permission and detail changes move the global stamp, grant changes move the role's own stamp
+    return [GLOBAL_VERSION_KEY, f'role:{role_id}']
+
+
+def role_snapshot_statement(role_id: UUID):
+    # One round trip: role code, every granted permission code and every detail code of those permissions
+    return (
+        select(models.Role.code, models.Permission.code, models.PermissionDetail.code)
+        .select_from(models.Role)
+        .outerjoin(models.RolePermission, models.RolePermission.role_id == models.Role.id)
+        .outerjoin(models.Permission, models.Permission.id == models.RolePermission.permission_id)
+        .outerjoin(models.PermissionDetail, models.PermissionDetail.permission_id == models.Permission.id)
+        .where(models.Role.id == role_id)
+    )
+
+
+def compile_role_snapshot(rows, role_id: UUID, version: Tuple[int, int]) -> RolePermissionSnapshot:
+    role_code = rows[0][0] if rows else None
+    codes = frozenset(
+        code
+        for _, permission_code, detail_code in rows
+        for code in (permission_code, detail_code)
+        if code is not None
+    )
+
+    return RolePermissionSnapshot(
+        role_id=role_id,
+        role_code=role_code,
+        codes=codes,
+        version=version,
+        compiled_at=time.monotonic(),
+    )
+
+
+def _cached_snapshot(role_id: UUID, version: Tuple[int, int]) -> Optional[RolePermissionSnapshot]:
+    _observed[role_id] = version
+    snapshot = _snapshots.get(role_id)
+    if (
+        snapshot is not None
+        and snapshot.version == version
+        and time.monotonic() - snapshot.compiled_at < settings.PERMISSION_CACHE_TTL
+    ):
+        return snapshot
+    return None
+
+
+def _store_snapshot(snapshot: RolePermissionSnapshot):
+    with _lock:
+        # A newer version may have been seen while we were compiling
+        if snapshot.version == _observed.get(snapshot.role_id):
+            _snapshots[snapshot.role_id] = snapshot
+
+
+# The snapshot is checked against the shared stamps in cache_versions on every lookup (one primary key
+# read), so a change made through any worker is seen by all of them on their next request. The version
+# is read before the grants, so a snapshot can only ever be filed under a version older than its data
+def get_role_snapshot(db: Session, role_id: UUID) -> RolePermissionSnapshot:
+    version = read_versions(db, version_keys(role_id))
+    snapshot = _cached_snapshot(role_id, version)
+    if snapshot is not None:
+        return snapshot
+
+    snapshot = compile_role_snapshot(db.execute(role_snapshot_statement(role_id)).all(), role_id, version)
+    _store_snapshot(snapshot)
+    return snapshot
+
+
+async def aget_role_snapshot(db, role_id: UUID) -> RolePermissionSnapshot:
+    version = await aread_versions(db, version_keys(role_id))
+    snapshot = _cached_snapshot(role_id, version)
+    if snapshot is not None:
+        return snapshot
+
+    snapshot = compile_role_snapshot((await execute(db, role_snapshot_statement(role_id))).all(), role_id, version)
+    _store_snapshot(snapshot)
+    return snapshot
+
+
+def invalidate_role(db: Session, role_id: UUID):
+    bump_versions(db, f'role:{role_id}', GRANTS_VERSION_KEY)
+    with _lock:
+        _snapshots.pop(role_id, None)
+
+
+def invalidate_all(db: Session):
+    bump_versions(db, GLOBAL_VERSION_KEY)
+    with _lock:
+        _snapshots.clear()
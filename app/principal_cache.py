@@ -0,0 +1,117 @@
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+from .cache_versions import aread_versions, bump_versions
+from .config import settings
+from .database import execute
+
+
+class RolePrincipal(NamedTuple):
+    id: UUID
+    name: str
+    code: Optional[str]
+    icon: Optional[str]
+    color: Optional[str]
+
+
+class Principal(NamedTuple):
+    id: UUID
+    name: str
+    email: str
+    avatar: Optional[str]
+    is_activate: bool
+    role_id: UUID
+    role: RolePrincipal
+
+
+_lock = threading.Lock()
+_principals: Dict[str, Tuple[Principal, Tuple[int, int], float]] = {}
+
+GLOBAL_VERSION_KEY = 'principals'
+
+
+def version_keys(user_id) -> List[str]:
+    # Changes to one user move that user's stamp; role changes move the global stamp, since they reach
+    # every principal holding the role
+    return [GLOBAL_VERSION_KEY, f'user:{user_id}']
+
+
+def principal_statement(user_id):
+    return (
+        select(
+            models.User.id, models.User.name, models.User.email, models.User.avatar, models.User.is_activate, models.User.role_id,
+            models.Role.name.label('role_name'), models.Role.code.label('role_code'), models.Role.icon.label('role_icon'), models.Role.color.label('role_color'),
+        )
+        .join(models.Role, models.Role.id == models.User.role_id)
+        .where(models.User.id == user_id)
+    )
+
+
+def _to_principal(row) -> Optional[Principal]:
+    if not row:
+        return None
+
+    return Principal(
+        id=row.id,
+        name=row.name,
+        email=row.email,
+        avatar=row.avatar,
+        is_activate=row.is_activate,
+        role_id=row.role_id,
+        role=RolePrincipal(id=row.role_id, name=row.role_name, code=row.role_code, icon=row.role_icon, color=row.role_color),
+    )
+
+
+def _cached_principal(key: str, version: Tuple[int, int]) -> Optional[Principal]:
+    cached = _principals.get(key)
+    if cached is not None and cached[1] == version and cached[2] > time.monotonic():
+        return cached[0]
+    return None
+
+
+def _store_principal(key: str, principal: Optional[Principal], version: Tuple[int, int]):
+    # Only active users are cached so a deactivated account is re-checked on every request
+    if principal is None or not principal.is_activate:
+        return
+
+    # The version was read before the row, so an entry filed under a version that has since moved
+    # is simply never matched again
+    with _lock:
+        if len(_principals) >= settings.PRINCIPAL_CACHE_MAX_SIZE:
+            _principals.pop(next(iter(_principals)), None)
+        _principals[key] = (principal, version, time.monotonic() + settings.PRINCIPAL_CACHE_TTL)
+
+
+# Like the permission snapshots, a cached principal is checked against its shared stamps in
+# cache_versions on every lookup, so a deactivated, deleted or re-roled user is locked out on every
+# worker by their next request
+async def aget_principal(db, user_id) -> Optional[Principal]:
+    key = str(user_id)
+    version = await aread_versions(db, version_keys(user_id))
+    principal = _cached_principal(key, version)
+    if principal is not None:
+        return principal
+
+    principal = _to_principal((await execute(db, principal_statement(user_id))).first())
+    _store_principal(key, principal, version)
+    return principal
+
+
+# Both run in the caller's transaction, before its commit
+def evict(db: Session, user_id):
+    bump_versions(db, f'user:{user_id}')
+    with _lock:
+        _principals.pop(str(user_id), None)
+
+
+def evict_role(db: Session, role_id: UUID):
+    bump_versions(db, GLOBAL_VERSION_KEY)
+    with _lock:
+        for key in [key for key, (principal, _, _) in _principals.items() if principal.role_id == role_id]:
+            del _principals[key]
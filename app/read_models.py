@@ -0,0 +1,96 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+from sqlalchemy import String, func, select
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from . import models
+from .fieldsets import keep_columns
+
+
+class ReadModel:
+    # A column projection for one list response schema. Its select returns plain Core rows (tuples,
+    # no identity map or change tracking) and serialize turns them into dicts whose keys mirror the
+    # schema, so the result can go through trusted_response.
+    # nested maps a response field to columns of a joined table, e.g. a user's role; hidden columns
+    # are selected but left out of the output
+    def __init__(self, columns: Sequence, nested: Dict[str, Sequence] = None, hidden: Iterable[str] = ()):
+        self.columns = list(columns)
+        self.nested = nested or {}
+        self.hidden = set(hidden)
+        self._keys = [(index, column.key) for index, column in enumerate(self.columns) if column.key not in self.hidden]
+        self._nested_keys = []
+        start = len(self.columns)
+        for name, nested_columns in self.nested.items():
+            keys = [column.key for column in nested_columns]
+            self._nested_keys.append((name, keys, start, start + len(keys)))
+            start += len(keys)
+
+    def only(self, fields: Optional[Set[str]], keep: Iterable[str] = ()) -> 'ReadModel':
+        # Narrows the projection to a ?fields= selection; keep names columns the query needs anyway
+        if fields is None:
+            return self
+        columns = keep_columns(self.columns, fields, keep)
+        nested = {name: nested_columns for name, nested_columns in self.nested.items() if name in fields}
+        return ReadModel(columns, nested, hidden=[column.key for column in columns if column.key not in fields])
+
+    def select(self):
+        nested_columns = [
+            column.label(f'{name}_{column.key}')
+            for name, columns in self.nested.items()
+            for column in columns
+        ]
+        return select(*self.columns, *nested_columns)
+
+    def serialize(self, rows) -> List[dict]:
+        keys = self._keys
+        nested_keys = self._nested_keys
+        result = []
+        for row in rows:
+            item = {key: row[index] for index, key in keys}
+            for name, columns, start, end in nested_keys:
+                item[name] = dict(zip(columns, row[start:end]))
+            result.append(item)
+        return result
+
+
+CATEGORY = ReadModel([
+    models.Category.name, models.Category.code,
+    models.Category.id, models.Category.created_at, models.Category.updated_at,
+])
+
+STATUS = ReadModel([
+    models.Status.title, models.Status.type, models.Status.color, models.Status.code,
+    models.Status.id, models.Status.created_at, models.Status.updated_at,
+])
+
+SUBJECT_MENU = ReadModel([
+    models.SubjectMenu.name, models.SubjectMenu.code, models.SubjectMenu.position, models.SubjectMenu.icon,
+    models.SubjectMenu.decscript, models.SubjectMenu.id, models.SubjectMenu.created_at, models.SubjectMenu.updated_at,
+])
+
+# The role names come from a correlated array subquery, so a page is still a single row per permission
+PERMISSION_ROLE_NAMES = func.array(
+    select(models.Role.name).join(
+        models.RolePermission, models.RolePermission.role_id == models.Role.id
+    ).where(
+        models.RolePermission.permission_id == models.Permission.id
+    ).scalar_subquery(),
+    type_=ARRAY(String),
+).label('role_names')
+
+PERMISSION = ReadModel([
+    models.Permission.name, models.Permission.code, models.Permission.id,
+    PERMISSION_ROLE_NAMES, models.Permission.created_at, models.Permission.updated_at,
+])
+
+USER = ReadModel([
+    models.User.name, models.User.email, models.User.id, models.User.is_activate,
+    models.User.avatar, models.User.created_at, models.User.updated_at,
+], nested={
+    'role': [models.Role.name, models.Role.code, models.Role.icon, models.Role.color, models.Role.id],
+})
+
+ROLE = ReadModel([
+    models.Role.name, models.Role.code, models.Role.icon, models.Role.color,
+    models.Role.id, models.Role.created_at, models.Role.updated_at, models.Role.user_count,
+])
@@ -0,0 +1,87 @@
+from typing import List
+from uuid import UUID
+
+from sqlalchemy import delete, insert, literal_column, select, union_all
+from sqlalchemy.orm import Session
+
+from . import models
+from app.schemas.role import PermissionDetailSchema
+
+
+def _current_grants(db: Session, role_id: UUID):
+    rows = db.execute(union_all(
+        select(literal_column("'permission'").label('kind'), models.RolePermission.permission_id.label('id'))
+        .where(models.RolePermission.role_id == role_id),
+        select(literal_column("'detail'").label('kind'), models.RolePermissionDetail.permission_detail_id.label('id'))
+        .where(models.RolePermissionDetail.role_id == role_id),
+    )).all()
+    return (
+        {row.id for row in rows if row.kind == 'permission'},
+        {row.id for row in rows if row.kind == 'detail'},
+    )
+
+
+def _catalog(db: Session, permission_ids, detail_ids):
+    # Only ids that exist are granted; unknown ones are dropped like the old per-row .get() did
+    if not permission_ids and not detail_ids:
+        return {}, {}
+    rows = db.execute(union_all(
+        select(literal_column("'permission'").label('kind'), models.Permission.id, models.Permission.name, models.Permission.code)
+        .where(models.Permission.id.in_(permission_ids)),
+        select(literal_column("'detail'").label('kind'), models.PermissionDetail.id, models.PermissionDetail.name, models.PermissionDetail.code)
+        .where(models.PermissionDetail.id.in_(detail_ids)),
+    )).all()
+    return (
+        {row.id: row for row in rows if row.kind == 'permission'},
+        {row.id: row for row in rows if row.kind == 'detail'},
+    )
+
+
+def sync_role_permissions(db: Session, role_id: UUID, requested: List[PermissionDetailSchema]) -> list:
+    # Diffs the role's grants against the request and writes only the changes; the caller commits
+    requested = requested or []
+    permissions, details = _catalog(
+        db,
+        {item.permission_id for item in requested},
+        {detail_id for item in requested for detail_id in item.permission_details},
+    )
+    requested = [item for item in requested if item.permission_id in permissions]
+    desired_permission_ids = {item.permission_id for item in requested}
+    desired_detail_ids = {detail_id for item in requested for detail_id in item.permission_details if detail_id in details}
+
+    current_permission_ids, current_detail_ids = _current_grants(db, role_id)
+
+    removed_detail_ids = current_detail_ids - desired_detail_ids
+    if removed_detail_ids:
+        db.execute(delete(models.RolePermissionDetail).where(
+            models.RolePermissionDetail.role_id == role_id,
+            models.RolePermissionDetail.permission_detail_id.in_(removed_detail_ids),
+        ))
+    removed_permission_ids = current_permission_ids - desired_permission_ids
+    if removed_permission_ids:
+        db.execute(delete(models.RolePermission).where(
+            models.RolePermission.role_id == role_id,
+            models.RolePermission.permission_id.in_(removed_permission_ids),
+        ))
+
+    added_permission_ids = desired_permission_ids - current_permission_ids
+    if added_permission_ids:
+        db.execute(insert(models.RolePermission), [
+            {'role_id': role_id, 'permission_id': permission_id} for permission_id in added_permission_ids
+        ])
+    added_detail_ids = desired_detail_ids - current_detail_ids
+    if added_detail_ids:
+        db.execute(insert(models.RolePermissionDetail), [
+            {'role_id': role_id, 'permission_detail_id': detail_id} for detail_id in added_detail_ids
+        ])
+
+    return [{
+        'permission_id': str(item.permission_id),
+        'permission_name': permissions[item.permission_id].name,
+        'permission_code': permissions[item.permission_id].code,
+        'permission_details': [{
+            'id': str(detail_id),
+            'name': details[detail_id].name,
+            'code': details[detail_id].code,
+        } for detail_id in item.permission_details if detail_id in details],
+    } for item in requested]
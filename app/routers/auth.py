@@ -29,11 +29,19 @@ async def login(
     if not user or not user.is_activate:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='User authentication failed')
 
-    password_is_valid = await utils.verify_password(payload.password, user.password)
+    password_is_valid, new_password_hash = await utils.verify_and_update_password(payload.password, user.password)
     
     if not password_is_valid:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Incorrect Password')
 
+    if new_password_hash:
+        try:
+            user.password = new_password_hash
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error rehashing password. Error: {str(e)}")
+
     # Create access token
     access_token = Authorize.create_access_token(
         subject=str(user.id), expires_time=timedelta(minutes=ACCESS_TOKEN_EXPIRES_IN))
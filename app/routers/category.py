@@ -2,23 +2,36 @@ from app.schemas.category import CategoryResponse
 from fastapi import APIRouter, BackgroundTasks, Request, Response, status, Depends, HTTPException
 from app.schemas.category import CreateCategorySchema, ListCategoryResponse, UpdateCategorySchema
 from app.schemas.enum import PermissionDetailEnum, PermissionEnum
+from ..conditional import ConditionalGet
 from ..database import get_db
+from ..pagination import CREATED_AT_ID_PARSERS, keyset_statement, split_page
+from ..read_models import CATEGORY
+from ..serialization import trusted_response
 from sqlalchemy.orm import Session
 from .. import models, oauth2
 from uuid import UUID
 from fastapi import Depends, HTTPException, status, APIRouter, Response
 from app.logging_config import setup_logging
+from app.search import search_conditions, search_rank
 logger = setup_logging()
 router = APIRouter()
 
-@router.get('', response_model=ListCategoryResponse)
-async def get_category(background_tasks: BackgroundTasks, db: Session = Depends(get_db), limit: int = 100, page: int = 1,  name: str='', user: str = Depends(oauth2.require_user)):
-    oauth2.check_permissions_detail([PermissionEnum.categories], [PermissionDetailEnum.read], user, background_tasks=background_tasks, db=db)
+conditional_categories = ConditionalGet([models.Category], [PermissionEnum.categories], [PermissionDetailEnum.read])
+
+@router.get('', response_model=ListCategoryResponse, dependencies=[Depends(conditional_categories)])
+async def get_category(background_tasks: BackgroundTasks, response: Response, db: Session = Depends(get_db), limit: int = 100, page: int = 1,  name: str='', cursor: str = None, user: str = Depends(oauth2.require_user)):
     skip = (page - 1) * limit
-    categories = db.query(models.Category).filter(
-        models.Category.name.contains(name)).limit(limit).offset(skip).all()
+    terms = [(models.Category.name, name)]
+    query = CATEGORY.select().where(*search_conditions(terms))
+
+    next_cursor = None
+    keyset = [models.Category.created_at, models.Category.id]
+    if cursor is None:
+        categories = db.execute(query.order_by(*search_rank(terms)).limit(limit).offset(skip)).all()
+    else:
+        categories, next_cursor = split_page(db.execute(keyset_statement(query, keyset, CREATED_AT_ID_PARSERS, cursor, limit, descending=False)).all(), keyset, limit)
     
-    return {'status': 'success', 'results': len(categories), 'categories': categories}
+    return trusted_response({'status': 'success', 'results': len(categories), 'next_cursor': next_cursor, 'categories': CATEGORY.serialize(categories)}, response)
 
 @router.post('', status_code=status.HTTP_201_CREATED, response_model=CategoryResponse)
 async def create_category(background_tasks: BackgroundTasks, payload: CreateCategorySchema, request: Request, db: Session = Depends(get_db), user: str = Depends(oauth2.require_user)):
@@ -35,10 +48,8 @@ async def create_category(background_tasks: BackgroundTasks, payload: CreateCate
         logger.error(error_message)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Cannot create catgory')
 
-@router.get('/{id}', response_model=CategoryResponse)
+@router.get('/{id}', response_model=CategoryResponse, dependencies=[Depends(conditional_categories)])
 async def get_category(background_tasks: BackgroundTasks, id: UUID, db: Session = Depends(get_db), user: str = Depends(oauth2.require_user)):
-    oauth2.check_permissions_detail([PermissionEnum.categories], [PermissionDetailEnum.read], user, background_tasks=background_tasks, db=db)
-    
     permission = db.query(models.Category).filter(models.Category.id == id).first()
     if not permission:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
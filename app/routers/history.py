@@ -0,0 +1,116 @@
+import json
+from datetime import datetime
+from uuid import UUID
+from fastapi import APIRouter, BackgroundTasks, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from app.pagination import CREATED_AT_ID_PARSERS, keyset_page
+from app.schemas.enum import PermissionDetailEnum, PermissionEnum
+from app.schemas.history import ListUserHistoryResponse
+from ..database import SessionLocal, get_db
+from ..db_routing import mark_read_only
+from .. import models, oauth2
+from app.logging_config import setup_logging
+logger = setup_logging()
+router = APIRouter()
+
+HISTORY_COLUMNS = (
+    models.UserHisory.id,
+    models.UserHisory.user_id,
+    models.UserHisory.email,
+    models.UserHisory.permission,
+    models.UserHisory.permission_detail,
+    models.UserHisory.status_code,
+    models.UserHisory.created_at,
+)
+STREAM_BATCH_SIZE = 1000
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+class HistoryFilters:
+    def __init__(
+        self,
+        user_id: UUID = None,
+        permission: str = None,
+        permission_detail: str = None,
+        status_code: int = None,
+        created_from: datetime = None,
+        created_to: datetime = None,
+    ):
+        self.user_id = user_id
+        self.permission = permission
+        self.permission_detail = permission_detail
+        self.status_code = status_code
+        self.created_from = created_from
+        self.created_to = created_to
+
+
+def build_history_query(db: Session, filters: HistoryFilters):
+    # Only plain columns are selected, so rows never enter the identity map
+    query = db.query(*HISTORY_COLUMNS)
+    if filters.user_id:
+        query = query.filter(models.UserHisory.user_id == filters.user_id)
+    if filters.permission:
+        query = query.filter(models.UserHisory.permission == filters.permission)
+    if filters.permission_detail:
+        query = query.filter(models.UserHisory.permission_detail == filters.permission_detail)
+    if filters.status_code is not None:
+        query = query.filter(models.UserHisory.status_code == filters.status_code)
+    # A bounded created_at range lets the planner prune monthly partitions
+    if filters.created_from:
+        query = query.filter(models.UserHisory.created_at >= filters.created_from)
+    if filters.created_to:
+        query = query.filter(models.UserHisory.created_at < filters.created_to)
+    return query
+
+
+def stream_history(filters: HistoryFilters):
+    # The export outlives the request's session, so it opens its own; like get_db for a GET, it reads
+    # from the replica when one is configured and healthy
+    db = SessionLocal()
+    mark_read_only(db)
+    try:
+        query = (
+            build_history_query(db, filters)
+            .order_by(models.UserHisory.created_at.desc(), models.UserHisory.id.desc())
+            .yield_per(STREAM_BATCH_SIZE)
+        )
+        for row in query:
+            yield json.dumps(dict(row._mapping), default=_json_default) + '\n'
+    finally:
+        db.close()
+
+
+def get_history_page(db: Session, filters: HistoryFilters, limit: int, cursor: str, output_format: str):
+    if output_format == 'ndjson':
+        return StreamingResponse(stream_history(filters), media_type='application/x-ndjson')
+
+    history, next_cursor = keyset_page(
+        build_history_query(db, filters),
+        [models.UserHisory.created_at, models.UserHisory.id],
+        CREATED_AT_ID_PARSERS,
+        cursor,
+        limit,
+    )
+
+    return {'status': 'success', 'results': len(history), 'next_cursor': next_cursor, 'history': history}
+
+
+@router.get('', response_model=ListUserHistoryResponse)
+async def get_history(
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    filters: HistoryFilters = Depends(),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str = None,
+    output_format: str = Query('json', alias='format', regex='^(json|ndjson)$'),
+    user: str = Depends(oauth2.require_user)
+):
+    oauth2.check_permissions_detail([PermissionEnum.history], [PermissionDetailEnum.read], user, background_tasks=background_tasks, db=db)
+
+    return get_history_page(db, filters, limit, cursor, output_format)
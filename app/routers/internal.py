@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from app import db_pool, metrics, oauth2
+from app.principal_cache import Principal
+from app.schemas.enum import UserRoleEnum
+
+router = APIRouter()
+
+
+def require_admin(user: Principal = Depends(oauth2.require_user)):
+    if user.role.code != UserRoleEnum.admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='User does not have required permissions')
+    return user
+
+
+@router.get('/metrics')
+async def get_metrics(user: Principal = Depends(require_admin)):
+    return {'status': 'success', 'metrics': metrics.collect()}
+
+
+@router.get('/db-pool')
+async def get_db_pool(user: Principal = Depends(require_admin)):
+    return {'status': 'success', 'pools': db_pool.get_pool_stats()}
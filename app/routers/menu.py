@@ -1,81 +1,135 @@
+from typing import Optional, Set
 from fastapi import APIRouter, BackgroundTasks, Request, Response, status, Depends, HTTPException
-from psycopg2 import IntegrityError
 from app.logging_config import setup_logging
+from app.pagination import CREATED_AT_ID_PARSERS, keyset_statement, split_page
+from app.search import search_conditions, search_rank
+from app.fieldsets import FieldSet, fields_response, keep_columns, wants
 from app.schemas.enum import PermissionDetailEnum, PermissionEnum, UserRoleEnum
-from app.schemas.menu import CreateMenuSchema, ListMenuAndSubjectMenuResponse, ListMenuResponse, ListMenuUserLoginResponse, UpdateMenuSchema, MenuResponse
-from ..database import get_db
+from app.schemas.menu import CreateMenuSchema, ListMenuAndSubjectMenuResponse, MenuAndSubjectResponse, ListMenuResponse, ListMenuUserLoginResponse, UpdateMenuSchema, MenuResponse
+from ..database import execute, get_db, get_read_db
 from sqlalchemy.orm import Session
-from .. import models, oauth2
+from .. import models, navigation, oauth2
 from uuid import UUID
 from fastapi import Depends, HTTPException, status, APIRouter, Response
-from sqlalchemy.orm import joinedload
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import joinedload, load_only, selectinload
 
 router = APIRouter()
 logger = setup_logging()
 
-@router.get('', response_model=ListMenuAndSubjectMenuResponse)
-async def get_menu(background_tasks: BackgroundTasks, db: Session = Depends(get_db),
-                   limit: int = 100,
-                   page: int = 1,
-                   name: str = '',
-                   user: str = Depends(oauth2.require_user)
-                   ):
+menu_list_fields = FieldSet(MenuAndSubjectResponse)
+menu_fields = FieldSet(MenuResponse)
 
-    oauth2.check_permissions_detail([PermissionEnum.menu], [
-                                    PermissionDetailEnum.read], user, background_tasks=background_tasks, db=db)
+MENU_COLUMNS = [models.Menu.name, models.Menu.code, models.Menu.icon, models.Menu.position]
+MENU_TIMESTAMP_COLUMNS = [models.Menu.created_at, models.Menu.updated_at]
 
-    skip = (page - 1) * limit
 
-    query = db.query(models.Menu)
+def menu_load_options(fields, keep=()) -> list:
+    # load_only narrows the menu columns (the primary key always comes along); relationships that
+    # were not asked for are not loaded at all
+    options = [load_only(*keep_columns(MENU_COLUMNS + MENU_TIMESTAMP_COLUMNS, fields, keep))]
+    if wants(fields, 'roles'):
+        options.append(selectinload(models.Menu.menu).joinedload(models.RoleMenu.role))
+    if wants(fields, 'submenus'):
+        options.append(selectinload(models.Menu.sub_menu))
+    if wants(fields, 'subject_menu'):
+        options.append(joinedload(models.Menu.menu_subject))
+    return options
 
-    if user.role.code not in [UserRoleEnum.admin, UserRoleEnum.operators]:
-        query = query.join(models.RoleMenu).filter(models.RoleMenu.role_id == user.role.id)
 
-    if name:
-        query = query.filter(models.Menu.name.contains(name))
+def serialize_menu(menu_item, fields=None) -> dict:
+    # Keys mirror MenuAndSubjectResponse, since fields_response may skip its validation. Only what
+    # menu_load_options loaded for the same fields is touched, so nothing lazy-loads
+    data = {column.key: getattr(menu_item, column.key) for column in keep_columns(MENU_COLUMNS, fields)}
 
-    menu = query.options(joinedload(models.Menu.menu).joinedload(models.RoleMenu.role), joinedload(models.Menu.sub_menu)).limit(limit).offset(skip).all()
-    result = []
-    for menu_item in menu:
-        roles = [{
-            'id': str(role_menu.role.id),
-            'name': role_menu.role.name,
-            'code': role_menu.role.code,
-            'icon': role_menu.role.icon,
-        } for role_menu in menu_item.menu]
-
-        subbject_menu = None
+    if wants(fields, 'subject_menu'):
+        data['subject_menu'] = None
         if menu_item.menu_subject:
-            subbject_menu = {
+            data['subject_menu'] = {
                 "id" :  menu_item.menu_subject.id,
                 "name" :  menu_item.menu_subject.name,
                 "code" :  menu_item.menu_subject.code,
                 "position" :  menu_item.menu_subject.position,
             }
 
-        submenus = [{
+    if wants(fields, 'roles'):
+        data['roles'] = [{
+            'id': str(role_menu.role.id),
+            'name': role_menu.role.name,
+            'code': role_menu.role.code,
+            'icon': role_menu.role.icon,
+        } for role_menu in menu_item.menu]
+
+    if wants(fields, 'submenus'):
+        data['submenus'] = [{
             'id': str(sub_menu.id),
             'name': sub_menu.name,
             'code': sub_menu.code,
             'icon': sub_menu.icon,
-            'created_at': sub_menu.created_at,
-            'updated_at': sub_menu.updated_at,
         } for sub_menu in menu_item.sub_menu]
 
-        result.append({
-            'name': menu_item.name,
-            'code': menu_item.code,
-            'icon': menu_item.icon,
-            'position': menu_item.position,
-            'subject_menu': subbject_menu,
-            'roles': roles,
-            'submenus': submenus,
-            'id': str(menu_item.id),
-            'created_at': menu_item.created_at,
-            'updated_at': menu_item.updated_at,
-        })
+    if wants(fields, 'id'):
+        data['id'] = str(menu_item.id)
+    for column in keep_columns(MENU_TIMESTAMP_COLUMNS, fields):
+        data[column.key] = getattr(menu_item, column.key)
+    return data
+
+
+@router.get('', response_model=ListMenuAndSubjectMenuResponse)
+async def get_menu(background_tasks: BackgroundTasks, db = Depends(get_read_db),
+                   limit: int = 100,
+                   page: int = 1,
+                   name: str = '',
+                   cursor: str = None,
+                   fields: Optional[Set[str]] = Depends(menu_list_fields),
+                   user: str = Depends(oauth2.require_user)
+                   ):
+
+    await oauth2.acheck_permissions_detail([PermissionEnum.menu], [
+                                           PermissionDetailEnum.read], user, background_tasks=background_tasks, db=db)
 
-    return {'status': 'success', 'results': len(result), 'menu': result}
+    skip = (page - 1) * limit
+
+    query = select(models.Menu)
+
+    if user.role.code not in [UserRoleEnum.admin, UserRoleEnum.operators]:
+        query = query.join(models.RoleMenu).where(models.RoleMenu.role_id == user.role.id)
+
+    terms = [(models.Menu.name, name)]
+    # Every relationship is loaded up front so the session can be an AsyncSession
+    query = query.where(*search_conditions(terms)).options(*menu_load_options(fields, keep=('created_at',)))
+
+    next_cursor = None
+    keyset = [models.Menu.created_at, models.Menu.id]
+    if cursor is None:
+        menu = (await execute(db, query.order_by(*search_rank(terms)).limit(limit).offset(skip))).scalars().all()
+    else:
+        menu, next_cursor = split_page((await execute(db, keyset_statement(query, keyset, CREATED_AT_ID_PARSERS, cursor, limit, descending=False))).scalars().all(), keyset, limit)
+    result = [serialize_menu(menu_item, fields) for menu_item in menu]
+    return fields_response({'status': 'success', 'results': len(result), 'next_cursor': next_cursor, 'menu': result}, fields)
+
+def assign_menu_roles(db: Session, menu_id: UUID, role_ids) -> list:
+    # One IN query for the role summaries and one multi-row insert; the caller commits once
+    role_ids = list(dict.fromkeys(role_id for role_id in (role_ids or []) if role_id))
+    if not role_ids:
+        return []
+
+    roles = {role.id: role for role in db.query(
+        models.Role.id, models.Role.name, models.Role.code, models.Role.icon
+    ).filter(models.Role.id.in_(role_ids)).all()}
+    role_ids = [role_id for role_id in role_ids if role_id in roles]
+    if role_ids:
+        db.execute(postgresql.insert(models.RoleMenu).values([
+            {'role_id': role_id, 'menu_id': menu_id} for role_id in role_ids
+        ]).on_conflict_do_nothing())
+
+    return [{
+        'id': str(role_id),
+        'name': roles[role_id].name,
+        'code': roles[role_id].code,
+        'icon': roles[role_id].icon,
+    } for role_id in role_ids]
 
 @router.post('', status_code=status.HTTP_201_CREATED, response_model=MenuResponse)
 async def create_menu(background_tasks: BackgroundTasks, payload: CreateMenuSchema, request: Request, db: Session = Depends(get_db), user: str = Depends(oauth2.require_user)):
@@ -92,28 +146,12 @@ async def create_menu(background_tasks: BackgroundTasks, payload: CreateMenuSche
             name=payload.name, code=payload.code, icon=payload.icon, position=payload.position, subject_id=payload.subject_id)
         
         db.add(new_menu)
+        db.flush()
+        new_role_menu_list = assign_menu_roles(db, new_menu.id, payload.role_ids)
+        navigation.invalidate_menus(db)
         db.commit()
         db.refresh(new_menu)
-        new_role_menu_list = []
-        if payload.role_ids:
-            for role_id in payload.role_ids:
-                try:
-                    new_role_menu = models.RoleMenu(
-                        role_id=role_id, menu_id=new_menu.id)
-                    db.add(new_role_menu)
-                    db.commit()
-                    db.refresh(new_role_menu)
-
-                    new_role_menu_list.append({
-                        'id': str(role_id),
-                        'name': new_role_menu.role.name,
-                        'code': new_role_menu.role.code,
-                        'icon': new_role_menu.role.icon,
-                    })
-                except IntegrityError as e:
-                    db.rollback()
-                    error_message = f"Error creating RoleMenu. IntegrityError: {str(e)}"
-                    logger.error(error_message)
+
         submenu = None
         if new_menu.menu_subject:
             submenu = {
@@ -143,14 +181,14 @@ async def create_menu(background_tasks: BackgroundTasks, payload: CreateMenuSche
             status_code=status.HTTP_400_BAD_REQUEST, detail='Cannot create menu')
 
 @router.get('/{id}', response_model=MenuResponse)
-async def get_menu(background_tasks: BackgroundTasks, id: UUID, db: Session = Depends(get_db), user: str = Depends(oauth2.require_user)):
+async def get_menu(background_tasks: BackgroundTasks, id: UUID, db: Session = Depends(get_db), fields: Optional[Set[str]] = Depends(menu_fields), user: str = Depends(oauth2.require_user)):
     oauth2.check_permissions_detail([PermissionEnum.menu], [
                                     PermissionDetailEnum.read], user, background_tasks=background_tasks, db=db)
 
     menu = (
         db.query(models.Menu)
         .filter(models.Menu.id == id)
-        .options(joinedload(models.Menu.menu).joinedload(models.RoleMenu.role), joinedload(models.Menu.sub_menu))
+        .options(*menu_load_options(fields))
         .first()
     )
     
@@ -158,43 +196,7 @@ async def get_menu(background_tasks: BackgroundTasks, id: UUID, db: Session = De
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=f"Menu not found")
 
-    roles = [{
-        'id': str(role_menu.role.id),
-        'name': role_menu.role.name,
-        'code': role_menu.role.code,
-        'icon': role_menu.role.icon,
-    } for role_menu in menu.menu]
-
-    submenus = [{
-        'id': str(sub_menu.id),
-        'name': sub_menu.name,
-        'code': sub_menu.code,
-        'icon': sub_menu.icon
-    } for sub_menu in menu.sub_menu]
-
-    subbject_menu = None
-    if menu.menu_subject:
-        subbject_menu = {
-            "id" :  menu.menu_subject.id,
-            "name" :  menu.menu_subject.name,
-            "code" :  menu.menu_subject.code,
-            "position" :  menu.menu_subject.position,
-        }
-
-    response_data = {
-        'id': str(menu.id),
-        'name': str(menu.name),
-        'code': str(menu.code),
-        'icon': str(menu.icon),
-        'position': str(menu.position),
-        'subject_menu': subbject_menu,
-        'roles': roles,
-        'submenus': submenus,
-        'created_at': menu.created_at,
-        'updated_at': menu.updated_at,
-    }
-
-    return response_data
+    return fields_response(serialize_menu(menu, fields), fields)
 
 @router.put('/{id}', response_model=MenuResponse)
 async def update_menu(background_tasks: BackgroundTasks, id: UUID, payload: UpdateMenuSchema, db: Session = Depends(get_db), user: str = Depends(oauth2.require_user)):
@@ -226,27 +228,8 @@ async def update_menu(background_tasks: BackgroundTasks, id: UUID, payload: Upda
             .first()
         )
 
-        new_role_menu_list = []
-        db.query(models.RoleMenu).filter(models.RoleMenu.menu_id == id).delete()
-        if payload.role_ids:
-            for role_id in payload.role_ids:
-                try:
-                    new_role_menu = models.RoleMenu(
-                        role_id=role_id, menu_id=id)
-                    db.add(new_role_menu)
-                    db.commit()
-                    db.refresh(new_role_menu)
-
-                    new_role_menu_list.append({
-                        'id': str(role_id),
-                        'name': new_role_menu.role.name,
-                        'code': new_role_menu.role.code,
-                        'icon': new_role_menu.role.icon,
-                    })
-                except IntegrityError as e:
-                    db.rollback()
-                    error_message = f"Error creating RoleMenu. IntegrityError: {str(e)}"
-                    logger.error(error_message)
+        db.query(models.RoleMenu).filter(models.RoleMenu.menu_id == id).delete(synchronize_session=False)
+        new_role_menu_list = assign_menu_roles(db, id, payload.role_ids)
 
         subbject_menu = None
         if updated_menu.menu_subject:
@@ -277,6 +260,8 @@ async def update_menu(background_tasks: BackgroundTasks, id: UUID, payload: Upda
             'created_at': updated_menu.created_at,
             'updated_at': updated_menu.updated_at,
         }
+        navigation.invalidate_menus(db)
+        db.commit()
 
         return response_data
     except Exception as e:
@@ -291,30 +276,18 @@ async def delete_menu(background_tasks: BackgroundTasks, id: UUID, db: Session =
     oauth2.check_permissions_detail([PermissionEnum.menu], [
                                     PermissionDetailEnum.delete], user, background_tasks=background_tasks, db=db)
 
-    menu_query = db.query(models.Menu).filter(models.Menu.id == id)
-    menu = menu_query.first()
-    if not menu:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                            detail=f'Menu not found')
     try:
-
-        # Delete Rolemenu
-        role_menu_using_menu =  db.query(models.RoleMenu).filter(models.RoleMenu.menu_id == id)
-        for role_menu_using_menu_item in role_menu_using_menu:
-            db.delete(role_menu_using_menu_item)
+        # Role links and submenus go with the menu through ON DELETE CASCADE
+        deleted = db.query(models.Menu).filter(models.Menu.id == id).delete(synchronize_session=False)
+        navigation.invalidate_menus(db)
         db.commit()
-
-        # Delete SubMenu
-        submenu_using_menu =  db.query(models.SubMenu).filter(models.SubMenu.menu_id == id)
-        for submenu_using_menu_item in submenu_using_menu:
-            db.delete(submenu_using_menu_item)
-        db.commit()
-
-        menu_query.delete(synchronize_session=False)
-        db.commit()
-        return Response(status_code=status.HTTP_204_NO_CONTENT)
     except Exception as e:
         error_message = f"Error Detele menu. Error: {str(e)}"
         logger.error(error_message)
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail='Cannot delete menu')
\ No newline at end of file
+            status_code=status.HTTP_400_BAD_REQUEST, detail='Cannot delete menu')
+
+    if not deleted:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f'Menu not found')
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
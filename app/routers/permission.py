@@ -1,45 +1,50 @@
+from typing import Optional, Set
 import uuid
 from app.schemas.enum import PermissionDetailEnum, PermissionEnum, UserRoleEnum
 
-from app.schemas.permission import ListPermissionResponse, PermissionResponse, UpdatePermissionSchema
+from app.schemas.permission import ListPermissionResponse, PermissionResponse, PermissionRoleResponse, UpdatePermissionSchema
 from .. import models
 from sqlalchemy.orm import Session
 from fastapi import BackgroundTasks, Depends, HTTPException, status, APIRouter, Response
 from app.oauth2 import check_permissions_detail, require_user
 from uuid import UUID
+from ..conditional import ConditionalGet
 from ..database import get_db
-from sqlalchemy.orm import joinedload
+from ..fieldsets import FieldSet, fields_response
+from ..pagination import CREATED_AT_ID_PARSERS, keyset_statement, split_page
+from ..permission_cache import GLOBAL_VERSION_KEY, GRANTS_VERSION_KEY, invalidate_all
+from ..read_models import PERMISSION
+from sqlalchemy import exists, func, select
 from app.logging_config import setup_logging
 
 router = APIRouter()
 logger = setup_logging()
 
-@router.get('', response_model=ListPermissionResponse)
-async def get_permissions(background_tasks: BackgroundTasks, limit: int = 100, page: int = 1, db: Session = Depends(get_db), user: str = Depends(require_user)):
+permission_list_fields = FieldSet(PermissionRoleResponse)
+permission_fields = FieldSet(PermissionResponse)
 
-    check_permissions_detail([PermissionEnum.permissions], [PermissionDetailEnum.read], user, background_tasks=background_tasks, db=db)
-    skip = (page - 1) * limit
-    permissions_query = db.query(models.Permission).options(joinedload(models.Permission.roles))
+conditional_permissions = ConditionalGet(
+    [models.Permission, models.RolePermission, models.Role], [PermissionEnum.permissions], [PermissionDetailEnum.read],
+    version_keys=[GLOBAL_VERSION_KEY, GRANTS_VERSION_KEY],
+)
+
+@router.get('', response_model=ListPermissionResponse, dependencies=[Depends(conditional_permissions)])
+async def get_permissions(background_tasks: BackgroundTasks, response: Response, limit: int = 100, page: int = 1, cursor: str = None, db: Session = Depends(get_db), fields: Optional[Set[str]] = Depends(permission_list_fields), user: str = Depends(require_user)):
 
-    count_all = permissions_query.count()
+    skip = (page - 1) * limit
+    read_model = PERMISSION.only(fields, keep=('created_at', 'id'))
+    query = read_model.select()
 
-    permissions = permissions_query.limit(limit).offset(skip).all()
+    count_all = db.execute(select(func.count()).select_from(models.Permission)).scalar()
 
-    permission_list = []
-    for permission in permissions:
-        role_names = [role.role.name for role in permission.roles]
-        permission_data = {
-            'id': str(permission.id),
-            'name': permission.name,
-            'code': permission.code,
-            'description': permission.description,
-            'created_at': permission.created_at,
-            'updated_at': permission.updated_at,
-            'role_names': role_names,
-        }
-        permission_list.append(permission_data)
+    next_cursor = None
+    keyset = [models.Permission.created_at, models.Permission.id]
+    if cursor is None:
+        permissions = db.execute(query.limit(limit).offset(skip)).all()
+    else:
+        permissions, next_cursor = split_page(db.execute(keyset_statement(query, keyset, CREATED_AT_ID_PARSERS, cursor, limit, descending=False)).all(), keyset, limit)
 
-    return {'status': 'success', 'count_all': count_all, 'results': len(permissions), 'permissions': permission_list}
+    return fields_response({'status': 'success', 'count_all': count_all, 'results': len(permissions), 'next_cursor': next_cursor, 'permissions': read_model.serialize(permissions)}, fields, response)
 
 @router.post('', status_code=status.HTTP_201_CREATED, response_model=PermissionResponse)
 async def create_permission(background_tasks: BackgroundTasks, permission: UpdatePermissionSchema, db: Session = Depends(get_db), user: str = Depends(require_user)):
@@ -55,15 +60,16 @@ async def create_permission(background_tasks: BackgroundTasks, permission: Updat
         try:
             new_permission = models.Permission(**permission.dict())
             db.add(new_permission)
-            db.commit()
-            db.refresh(new_permission)
+            db.flush()
 
             admin_role = db.query(models.Role).filter(models.Role.code == UserRoleEnum.admin).first()
             if admin_role:
                 role_permission = models.RolePermission(role=admin_role, permission=new_permission)
                 db.add(role_permission)
-                db.commit()
 
+            invalidate_all(db)
+            db.commit()
+            db.refresh(new_permission)
             return new_permission
         except Exception as e:
             error_message = f"Error creating permission. Error: {str(e)}"
@@ -84,6 +90,7 @@ async def update_permission(background_tasks: BackgroundTasks, id: UUID, permisi
                             detail=f'Permission not found')
     try:
         permission_query.update(permision.dict(exclude_unset=True), synchronize_session=False)
+        invalidate_all(db)
         db.commit()
         return updated_Permission
     except Exception as e:
@@ -91,41 +98,37 @@ async def update_permission(background_tasks: BackgroundTasks, id: UUID, permisi
         logger.error(error_message)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Cannot update permission. Maybe permission already exists')
 
-@router.get('/{id}', response_model=PermissionResponse)
-async def get_permission(background_tasks: BackgroundTasks, id: UUID, db: Session = Depends(get_db), user: str = Depends(require_user)):
-    
-    check_permissions_detail([PermissionEnum.permissions], [PermissionDetailEnum.read], user, background_tasks=background_tasks, db=db)
-
-    permission = db.query(models.Permission).filter(models.Permission.id == id).first()
+@router.get('/{id}', response_model=PermissionResponse, dependencies=[Depends(conditional_permissions)])
+async def get_permission(background_tasks: BackgroundTasks, response: Response, id: UUID, db: Session = Depends(get_db), fields: Optional[Set[str]] = Depends(permission_fields), user: str = Depends(require_user)):
+    # Without ?fields= the detail carries PermissionResponse's fields, which leave out the role names
+    read_model = PERMISSION.only(fields or set(permission_fields.allowed))
+    permission = db.execute(read_model.select().where(models.Permission.id == id)).first()
     if not permission:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=f"Permission not found")
-    return permission
+    return fields_response(read_model.serialize([permission])[0], fields, response)
 
 @router.delete('/{id}')
 async def delete_permission(background_tasks: BackgroundTasks, id: UUID, db: Session = Depends(get_db), user: str = Depends(require_user)):
     check_permissions_detail([PermissionEnum.permissions], [PermissionDetailEnum.delete], user, background_tasks=background_tasks, db=db)
 
-    permission = db.query(models.Permission).filter(models.Permission.id == id).first()
-    if not permission:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Permission not found')
-
-    role_permissions = db.query(models.RolePermission).filter(models.RolePermission.permission_id == id).all()
+    # Details and grants go with the permission through ON DELETE CASCADE; a permission granted to more than one role is kept
+    granted_roles = select(func.count()).where(models.RolePermission.permission_id == id).scalar_subquery()
+    try:
+        deleted = db.query(models.Permission).filter(models.Permission.id == id, granted_roles <= 1).delete(synchronize_session=False)
+        if deleted:
+            invalidate_all(db)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        error_message = f"Error Delete permission. Error: {str(e)}"
+        logger.error(error_message)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Cannot delete permission')
 
-    if len(role_permissions) > 1:
+    if not deleted:
+        if not db.query(exists().where(models.Permission.id == id)).scalar():
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Permission not found')
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
                             detail='Cannot delete permission. It is associated with one or more roles.')
-    elif len(role_permissions) == 1:
-        try:
-            db.delete(role_permissions[0])
-            db.commit()
-        except Exception as e:
-            db.rollback()
-            error_message = f"Error Delete permission. Error: {str(e)}"
-            logger.error(error_message)
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='An error occurred while deleting RolePermission')
-
-    db.delete(permission)
-    db.commit()
     
     return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -6,16 +6,18 @@ from sqlalchemy.orm import Session
 from fastapi import BackgroundTasks, Depends, HTTPException, status, APIRouter, Response
 from app.oauth2 import require_user, check_permissions_detail
 from uuid import UUID
+from ..conditional import ConditionalGet
 from ..database import get_db
+from ..permission_cache import invalidate_all
 from app.logging_config import setup_logging
 
 router = APIRouter()
 logger = setup_logging()
 
-@router.get('', response_model=ListPermissionDetailResponse)
+conditional_permissions_detail = ConditionalGet([models.PermissionDetail], [PermissionEnum.permission_detail], [PermissionDetailEnum.read])
+
+@router.get('', response_model=ListPermissionDetailResponse, dependencies=[Depends(conditional_permissions_detail)])
 async def get_permissions_detail(background_tasks: BackgroundTasks, db: Session = Depends(get_db), permission_id: UUID = None, user: str = Depends(require_user)):
-    check_permissions_detail([PermissionEnum.permission_detail], [PermissionDetailEnum.read], user, background_tasks=background_tasks, db=db)
-    
     if permission_id:
         permission_detail_list = db.query(models.PermissionDetail).filter(models.PermissionDetail.permission_id == permission_id).all()
     else:
@@ -35,10 +37,10 @@ async def create_permission_detail(background_tasks: BackgroundTasks, permission
         try:
             new_permission_detail = models.PermissionDetail(**permission_detail.dict())
             db.add(new_permission_detail)
+            invalidate_all(db)
             db.commit()
             db.refresh(new_permission_detail)
 
-
             return new_permission_detail
         except Exception as e:
             error_message = f"Error creating permission detail. Error: {str(e)}"
@@ -57,6 +59,7 @@ async def update_permission_detail(background_tasks: BackgroundTasks, id: UUID,
                             detail=f'Permission detail not found')
     try:
         permission_detail_query.update(permision.dict(exclude_unset=True), synchronize_session=False)
+        invalidate_all(db)
         db.commit()
         return updated_Permission_detail
     except Exception as e:
@@ -64,10 +67,8 @@ async def update_permission_detail(background_tasks: BackgroundTasks, id: UUID,
         logger.error(error_message)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Cannot update permission detail. Maybe permission detail already exists')
 
-@router.get('/{id}', response_model=PermissionDetailResponse)
+@router.get('/{id}', response_model=PermissionDetailResponse, dependencies=[Depends(conditional_permissions_detail)])
 async def get_permission_detail(background_tasks: BackgroundTasks, id: UUID, db: Session = Depends(get_db), user: str = Depends(require_user)):
-    check_permissions_detail([PermissionEnum.permission_detail], [PermissionDetailEnum.read], user, background_tasks=background_tasks, db=db)
-    
     permission_detail = db.query(models.PermissionDetail).filter(models.PermissionDetail.id == id).first()
     if not permission_detail:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
@@ -83,6 +84,7 @@ async def delete_permission(background_tasks: BackgroundTasks, id: UUID, db: Ses
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Permission Detail not found')
 
     db.delete(permission_detail)
+    invalidate_all(db)
     db.commit()
     
     return Response(status_code=status.HTTP_204_NO_CONTENT)
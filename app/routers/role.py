@@ -1,4 +1,5 @@
-from sqlalchemy.orm import selectinload
+from typing import Optional, Set
+from sqlalchemy.orm import load_only
 from app.schemas.enum import PermissionDetailEnum, PermissionEnum, UserRoleEnum
 from app.schemas.role import ListRoleResponse, RoleDetailResponse, RoleWithUserCountResponse, CreateRoleSchema
 from .. import models
@@ -7,38 +8,29 @@ from fastapi import BackgroundTasks, Depends, HTTPException, status, APIRouter,
 from app.oauth2 import check_permissions_detail, require_user
 from uuid import UUID
 from ..database import get_db
+from ..fieldsets import FieldSet, fields_response, keep_columns, pick, wants
+from ..permission_cache import invalidate_role
+from ..principal_cache import evict_role
+from ..read_models import ROLE
+from ..role_permissions import sync_role_permissions
 from app.logging_config import setup_logging
-from sqlalchemy.orm import selectinload
-from sqlalchemy import func
+from sqlalchemy import exists
 logger = setup_logging()
 
 router = APIRouter()
 
+role_list_fields = FieldSet(RoleWithUserCountResponse)
+role_fields = FieldSet(RoleDetailResponse)
+
+ROLE_COLUMNS = [models.Role.name, models.Role.code, models.Role.icon, models.Role.color]
+
 @router.get('', response_model=ListRoleResponse)
-async def get_roles(background_tasks: BackgroundTasks, db: Session = Depends(get_db), user: str = Depends(require_user)):
+async def get_roles(background_tasks: BackgroundTasks, db: Session = Depends(get_db), fields: Optional[Set[str]] = Depends(role_list_fields), user: str = Depends(require_user)):
     check_permissions_detail([PermissionEnum.roles], [PermissionDetailEnum.read], user, background_tasks=background_tasks, db=db)
-    roles = (
-        db.query(models.Role, func.count(models.User.id).label('user_count'))
-        .outerjoin(models.User, models.User.role_id == models.Role.id)
-        .group_by(models.Role.id)
-        .all()
-    )
-
-    roles_with_user_count = [
-        RoleWithUserCountResponse(
-            id=role.id,
-            name=role.name,
-            code=role.code,
-            icon=role.icon,
-            color=role.color,
-            created_at=role.created_at,
-            updated_at=role.updated_at,
-            user_count=user_count,
-        )
-        for role, user_count in roles
-    ]
-
-    return {'status': 'success', 'results': len(roles_with_user_count), 'roles': roles_with_user_count}
+    read_model = ROLE.only(fields)
+    roles = db.execute(read_model.select()).all()
+
+    return fields_response({'status': 'success', 'results': len(roles), 'roles': read_model.serialize(roles)}, fields)
 
 
 @router.post('', status_code=status.HTTP_201_CREATED, response_model=RoleDetailResponse)
@@ -53,43 +45,10 @@ async def create_role(background_tasks: BackgroundTasks, role: CreateRoleSchema,
     try:
         new_role = models.Role(name=role.name, code=role.code, icon=role.icon, color=role.color)
         db.add(new_role)
-        db.commit()
-        db.refresh(new_role)
+        db.flush()
 
-        new_role_permissions = []
-
-        try:
-            if role.permissions:
-                for permission_detail in role.permissions:
-
-                    permission = db.query(models.Permission).get(permission_detail.permission_id)
-                    if permission:
-                        role_permission = models.RolePermission(role=new_role, permission=permission)
-                        db.add(role_permission)
-
-                        # Save permission details
-                        permission_details_list = []
-                        for detail_id in permission_detail.permission_details:
-                            permission_detail_model = models.RolePermissionDetail(role_id=new_role.id, permission_detail_id=detail_id)
-                            
-                            db.add(permission_detail_model)
-                            associated_permission_detail = db.query(models.PermissionDetail).get(detail_id)
-                            permission_details_list.append({
-                                'id': str(detail_id),
-                                'name': associated_permission_detail.name,
-                                'code': associated_permission_detail.code,
-                            })
-
-
-                        new_role_permissions.append({
-                            'permission_id': str(permission.id),
-                            'permission_name': permission.name,
-                            'permission_code': permission.code,
-                            'permission_details': permission_details_list,
-                        })
-        except Exception as e:
-            error_message = f"Error Role Permission Detail role. Error: {str(e)}"
-            logger.error(error_message)
+        new_role_permissions = sync_role_permissions(db, new_role.id, role.permissions)
+        invalidate_role(db, new_role.id)
 
         db.commit()
         db.refresh(new_role)
@@ -151,8 +110,7 @@ async def update_role(background_tasks: BackgroundTasks, id: UUID, role: CreateR
     role.code = role.code.lower()
 
     try:
-        # Fetch the existing role with permissions
-        updated_role = db.query(models.Role).options(selectinload(models.Role.permissions)).filter(models.Role.id == id).first()
+        updated_role = db.query(models.Role).filter(models.Role.id == id).first()
 
         if not updated_role:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Role not found')
@@ -161,42 +119,8 @@ async def update_role(background_tasks: BackgroundTasks, id: UUID, role: CreateR
             existing_role = db.query(models.Role).filter(models.Role.code == role.code).first()
             if existing_role:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Role with the updated code '{role.name}' already exists")
-        new_role_permissions = []
-
-        db.query(models.RolePermissionDetail).filter(models.RolePermissionDetail.role_id == id).delete()
-        db.query(models.RolePermission).filter(models.RolePermission.role_id == id).delete()
-        
-        if role.permissions:
-            # Clear existing RolePermissionDetails
-            
-            for permission_detail in role.permissions:
-                permission_id = permission_detail.permission_id
-
-                if permission_id:
-                    permission = db.query(models.Permission).get(permission_id)
-                    
-                    # Create a new RolePermission instance for each permission
-                    new_permission = models.RolePermission(role_id=id, permission_id=permission_id)
-                    db.add(new_permission)
-
-                    permission_details = permission_detail.permission_details
-                    permission_details_list = []
-                    for detail_id in permission_details:
-                        new_permission_detail = models.RolePermissionDetail(role=updated_role, permission_detail_id=detail_id)
-                        db.add(new_permission_detail)
-                        associated_permission_detail = db.query(models.PermissionDetail).get(detail_id)
-                        permission_details_list.append({
-                            'id': str(detail_id),
-                            'name': associated_permission_detail.name,
-                            'code': associated_permission_detail.code,
-                        })
-
-                    new_role_permissions.append({
-                        'permission_id': str(permission.id),
-                        'permission_name': permission.name,
-                        'permission_code': permission.code,
-                        'permission_details': permission_details_list,
-                    })
+
+        new_role_permissions = sync_role_permissions(db, id, role.permissions)
 
         if updated_role.code not in [UserRoleEnum.admin, UserRoleEnum.commentators, UserRoleEnum.operators]:
             updated_role.code = role.code
@@ -204,6 +128,8 @@ async def update_role(background_tasks: BackgroundTasks, id: UUID, role: CreateR
         updated_role.name = role.name
         updated_role.icon = role.icon
         updated_role.color = role.color
+        invalidate_role(db, id)
+        evict_role(db, id)
 
         db.commit()
         db.refresh(updated_role)
@@ -226,15 +152,18 @@ async def update_role(background_tasks: BackgroundTasks, id: UUID, role: CreateR
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Cannot update role')
 
 @router.get('/{id}', response_model=RoleDetailResponse)
-async def get_role(background_tasks: BackgroundTasks, id: UUID, db: Session = Depends(get_db), user: str = Depends(require_user)):
+async def get_role(background_tasks: BackgroundTasks, id: UUID, db: Session = Depends(get_db), fields: Optional[Set[str]] = Depends(role_fields), user: str = Depends(require_user)):
     check_permissions_detail([PermissionEnum.roles], [PermissionDetailEnum.read], user, background_tasks=background_tasks, db=db)
     
-    role = db.query(models.Role).filter(models.Role.id == id).first()
+    role = db.query(models.Role).filter(models.Role.id == id).options(
+        load_only(*keep_columns(ROLE_COLUMNS, fields))
+    ).first()
     if not role:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Role not found")
 
+    # Grants are only walked when they are part of the response
     role_permissions = []
-    for rp in role.permissions:
+    for rp in (role.permissions if wants(fields, 'permissions') else []):
         permission_id = rp.permission.id
 
         permission_details = db.query(models.RolePermissionDetail.permission_detail_id).filter(
@@ -262,50 +191,34 @@ async def get_role(background_tasks: BackgroundTasks, id: UUID, db: Session = De
             'permission_details': permission_details_list,
         })
 
-    response_data = {
-        'id': str(role.id),
-        'name': str(role.name),
-        'icon': str(role.icon),
-        'code': str(role.code),
-        'color': str(role.color),
-        'permissions': role_permissions,
-    }
+    response_data = {'id': str(role.id)}
+    for column in keep_columns(ROLE_COLUMNS, fields):
+        response_data[column.key] = str(getattr(role, column.key))
+    response_data['permissions'] = role_permissions
 
-    return response_data
+    return fields_response(pick(response_data, fields), fields)
 
 @router.delete('/{id}')
 async def delete_role(background_tasks: BackgroundTasks, id: UUID, db: Session = Depends(get_db), user: str = Depends(require_user)):
     check_permissions_detail([PermissionEnum.roles], [PermissionDetailEnum.delete], user, background_tasks=background_tasks, db=db)
     
-    role_query = db.query(models.Role).filter(models.Role.id == id)
-    role = role_query.first()
-    if not role:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                            detail=f'Role not found')
-    
-    # Delete User using Role
-    user_using_role =  db.query(models.User).filter(models.User.role_id == id).first()
-    if user_using_role:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                                detail=f'Role is being used')
-        
-    # Delete Permission using Role
-    permissions_using_role =  db.query(models.RolePermission).filter(models.RolePermission.role_id == id)
-    for permission_using_role in permissions_using_role:
-        db.delete(permission_using_role)
-    db.commit()
-
-    permissions_detail_using_roles =  db.query(models.RolePermissionDetail).filter(models.RolePermissionDetail.role_id == id)
-    for permissions_detail_using_role in permissions_detail_using_roles:
-        db.delete(permissions_detail_using_role)
-    db.commit()
-
+    # Grants and menu links go with the role through ON DELETE CASCADE; a role still assigned to users is kept
+    role_in_use = exists().where(models.User.role_id == id)
     try:
-        role_query.delete(synchronize_session=False)
+        deleted = db.query(models.Role).filter(models.Role.id == id, ~role_in_use).delete(synchronize_session=False)
+        if deleted:
+            invalidate_role(db, id)
         db.commit()
-
-        return Response(status_code=status.HTTP_204_NO_CONTENT)
     except Exception as e:
         error_message = f"Error delete role. Error: {str(e)}"
         logger.error(error_message)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Cannot delete role')
+
+    if not deleted:
+        if not db.query(exists().where(models.Role.id == id)).scalar():
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                detail=f'Role not found')
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                detail=f'Role is being used')
+
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,7 +1,11 @@
 from fastapi import APIRouter, BackgroundTasks, Request, Response, status, Depends, HTTPException
 from app.schemas.enum import PermissionDetailEnum, PermissionEnum
 from app.schemas.status import CreateStatusSchema, ListStatusResponse, UpdateStatusSchema, StatusResponse
+from ..conditional import ConditionalGet
 from ..database import get_db
+from ..pagination import CREATED_AT_ID_PARSERS, keyset_statement, split_page
+from ..read_models import STATUS
+from ..serialization import trusted_response
 from sqlalchemy.orm import Session
 from .. import models, oauth2
 from uuid import UUID
@@ -10,15 +14,20 @@ from app.logging_config import setup_logging
 logger = setup_logging()
 router = APIRouter()
 
-@router.get('', response_model=ListStatusResponse)
-async def get_status(background_tasks: BackgroundTasks, db: Session = Depends(get_db), limit: int = 100, page: int = 1, user: str = Depends(oauth2.require_user)):
-    oauth2.check_permissions_detail([PermissionEnum.statuses], [PermissionDetailEnum.read], user, background_tasks=background_tasks, db=db)
+conditional_statuses = ConditionalGet([models.Status], [PermissionEnum.statuses], [PermissionDetailEnum.read])
 
-    query = db.query(models.Status)
+@router.get('', response_model=ListStatusResponse, dependencies=[Depends(conditional_statuses)])
+async def get_status(background_tasks: BackgroundTasks, response: Response, db: Session = Depends(get_db), limit: int = 100, page: int = 1, cursor: str = None, user: str = Depends(oauth2.require_user)):
+    query = STATUS.select()
     skip = (page - 1) * limit
-    status = query.limit(limit).offset(skip).all()
+    next_cursor = None
+    keyset = [models.Status.created_at, models.Status.id]
+    if cursor is None:
+        statuses = db.execute(query.limit(limit).offset(skip)).all()
+    else:
+        statuses, next_cursor = split_page(db.execute(keyset_statement(query, keyset, CREATED_AT_ID_PARSERS, cursor, limit, descending=False)).all(), keyset, limit)
     
-    return {'status': 'success', 'results': len(status), 'statuses': status}
+    return trusted_response({'status': 'success', 'results': len(statuses), 'next_cursor': next_cursor, 'statuses': STATUS.serialize(statuses)}, response)
 
 @router.post('', status_code=status.HTTP_201_CREATED, response_model=StatusResponse)
 async def create_status(background_tasks: BackgroundTasks, payload: CreateStatusSchema, request: Request, db: Session = Depends(get_db), user: str = Depends(oauth2.require_user)):
@@ -37,10 +46,8 @@ async def create_status(background_tasks: BackgroundTasks, payload: CreateStatus
         logger.error(error_message)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Cannot create status')
 
-@router.get('/{id}', response_model=StatusResponse)
+@router.get('/{id}', response_model=StatusResponse, dependencies=[Depends(conditional_statuses)])
 async def get_status(background_tasks: BackgroundTasks, id: UUID, db: Session = Depends(get_db), user: str = Depends(oauth2.require_user)):
-    oauth2.check_permissions_detail([PermissionEnum.statuses], [PermissionDetailEnum.read], user, background_tasks=background_tasks, db=db)
-    
     status_query = db.query(models.Status).filter(models.Status.id == id).first()
     if not status_query:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
@@ -1,10 +1,11 @@
 from fastapi import APIRouter, BackgroundTasks, Request, Response, status, Depends, HTTPException
 from app.logging_config import setup_logging
+from app.search import search_conditions, search_rank
 from app.schemas.enum import PermissionDetailEnum, PermissionEnum, UserRoleEnum
 from app.schemas.sub_menu import CreateSubMenuSchema, ListSubMenuResponse, UpdateSubMenuSchema, SubMenuResponse
 from ..database import get_db
 from sqlalchemy.orm import Session
-from .. import models, oauth2
+from .. import models, navigation, oauth2
 from uuid import UUID
 from fastapi import Depends, HTTPException, status, APIRouter, Response
 router = APIRouter()
@@ -22,13 +23,12 @@ async def get_sub_menu(background_tasks: BackgroundTasks, db: Session = Depends(
     oauth2.check_permissions_detail([PermissionEnum.sub_menu], [PermissionDetailEnum.read], user, background_tasks=background_tasks, db=db)
     
     skip = (page - 1) * limit
-    query = db.query(models.SubMenu)
-    if name:
-        query = query.filter(models.SubMenu.name.contains(name))
+    terms = [(models.SubMenu.name, name)]
+    query = db.query(models.SubMenu).filter(*search_conditions(terms))
     if menu_id:
-        query = query.filter(models.SubMenu.menu_id == menu_id, models.SubMenu.name.contains(name))
+        query = query.filter(models.SubMenu.menu_id == menu_id)
     
-    sub_menu = query.limit(limit).offset(skip).all()
+    sub_menu = query.order_by(*search_rank(terms)).limit(limit).offset(skip).all()
     
     return {'status': 'success', 'results': len(sub_menu), 'sub_menu': sub_menu}
 
@@ -40,6 +40,7 @@ async def create_sub_menu(background_tasks: BackgroundTasks, payload: CreateSubM
     try:
         new_sub_menu = models.SubMenu(**payload.dict())
         db.add(new_sub_menu)
+        navigation.invalidate_menus(db)
         db.commit()
         db.refresh(new_sub_menu)
         return new_sub_menu
@@ -71,6 +72,7 @@ async def update_sub_menu(background_tasks: BackgroundTasks, id: UUID, payload:
                                 detail=f'SubMenu not found')
         try:
             sub_menu_query.update(payload.dict(exclude_unset=True), synchronize_session=False)
+            navigation.invalidate_menus(db)
             db.commit()
             return updated_sub_menu
         except Exception as e:
@@ -90,6 +92,7 @@ async def delete_sub_menu(background_tasks: BackgroundTasks, id: UUID, db: Sessi
                                 detail=f'SubMenu not found')
         try:
             sub_menu_query.delete(synchronize_session=False)
+            navigation.invalidate_menus(db)
             db.commit()
             return Response(status_code=status.HTTP_204_NO_CONTENT)
         except Exception as e:
@@ -1,24 +1,33 @@
 from fastapi import APIRouter, BackgroundTasks, Request, Response, status, Depends, HTTPException
 from app.schemas.enum import PermissionDetailEnum, PermissionEnum
 from app.schemas.subject_menu import CreateSubjectMenuSchema, ListSubjectMenuResponse, UpdateSubjectMenuSchema, SubjectMenuResponse
+from ..conditional import ConditionalGet
 from ..database import get_db
+from ..pagination import CREATED_AT_ID_PARSERS, keyset_statement, split_page
+from ..read_models import SUBJECT_MENU
+from ..serialization import trusted_response
 from sqlalchemy.orm import Session
-from .. import models, oauth2
+from .. import models, navigation, oauth2
 from uuid import UUID
 from fastapi import Depends, HTTPException, status, APIRouter, Response
 from app.logging_config import setup_logging
 logger = setup_logging()
 router = APIRouter()
 
-@router.get('', response_model=ListSubjectMenuResponse)
-async def get_subject_menu(background_tasks: BackgroundTasks, db: Session = Depends(get_db), limit: int = 100, page: int = 1, user: str = Depends(oauth2.require_user)):
-    oauth2.check_permissions_detail([PermissionEnum.subject_menu], [PermissionDetailEnum.read], user, background_tasks=background_tasks, db=db)
+conditional_subject_menus = ConditionalGet([models.SubjectMenu], [PermissionEnum.subject_menu], [PermissionDetailEnum.read])
 
-    query = db.query(models.SubjectMenu)
+@router.get('', response_model=ListSubjectMenuResponse, dependencies=[Depends(conditional_subject_menus)])
+async def get_subject_menu(background_tasks: BackgroundTasks, response: Response, db: Session = Depends(get_db), limit: int = 100, page: int = 1, cursor: str = None, user: str = Depends(oauth2.require_user)):
+    query = SUBJECT_MENU.select()
     skip = (page - 1) * limit
-    subject_menus = query.limit(limit).offset(skip).all()
+    next_cursor = None
+    keyset = [models.SubjectMenu.created_at, models.SubjectMenu.id]
+    if cursor is None:
+        subject_menus = db.execute(query.limit(limit).offset(skip)).all()
+    else:
+        subject_menus, next_cursor = split_page(db.execute(keyset_statement(query, keyset, CREATED_AT_ID_PARSERS, cursor, limit, descending=False)).all(), keyset, limit)
     
-    return {'status': 'success', 'results': len(subject_menus), 'subject_menus': subject_menus}
+    return trusted_response({'status': 'success', 'results': len(subject_menus), 'next_cursor': next_cursor, 'subject_menus': SUBJECT_MENU.serialize(subject_menus)}, response)
 
 @router.post('', status_code=status.HTTP_201_CREATED, response_model=SubjectMenuResponse)
 async def create_subject_menu(background_tasks: BackgroundTasks, payload: CreateSubjectMenuSchema, request: Request, db: Session = Depends(get_db), user: str = Depends(oauth2.require_user)):
@@ -32,6 +41,7 @@ async def create_subject_menu(background_tasks: BackgroundTasks, payload: Create
     try:
         new_subject_menu = models.SubjectMenu(**payload.dict())
         db.add(new_subject_menu)
+        navigation.invalidate_menus(db)
         db.commit()
         db.refresh(new_subject_menu)
 
@@ -41,10 +51,8 @@ async def create_subject_menu(background_tasks: BackgroundTasks, payload: Create
         logger.error(error_message)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Cannot create status')
 
-@router.get('/{id}', response_model=SubjectMenuResponse)
+@router.get('/{id}', response_model=SubjectMenuResponse, dependencies=[Depends(conditional_subject_menus)])
 async def get_subject_menu(background_tasks: BackgroundTasks, id: UUID, db: Session = Depends(get_db), user: str = Depends(oauth2.require_user)):
-    oauth2.check_permissions_detail([PermissionEnum.subject_menu], [PermissionDetailEnum.read], user, background_tasks=background_tasks, db=db)
-    
     subject_menu_query = db.query(models.SubjectMenu).filter(models.SubjectMenu.id == id).first()
     if not subject_menu_query:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
@@ -70,6 +78,7 @@ async def update_subject_menu(background_tasks: BackgroundTasks, id: UUID, paylo
 
     try:
         subject_menu_query.update(payload.dict(exclude_unset=True), synchronize_session=False)
+        navigation.invalidate_menus(db)
         db.commit()
         return updated_subject_menu
     
@@ -94,6 +103,7 @@ async def delete_subject_menu(background_tasks: BackgroundTasks, id: UUID, db: S
     
     try:
         subject_menu_query.delete(synchronize_session=False)
+        navigation.invalidate_menus(db)
         db.commit()
         return Response(status_code=status.HTTP_204_NO_CONTENT)
     except Exception as e:
@@ -1,29 +1,42 @@
+from typing import Optional, Set
 from sqlalchemy import or_
 from sqlalchemy.orm import aliased
 import base64
 from datetime import datetime
 import os
 from pathlib import Path
-from fastapi import APIRouter, BackgroundTasks, Request, Response, status, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Query, Request, Response, status, Depends, HTTPException
 from pydantic import EmailStr
 from app import utils
+from app.counts import COUNT_MODES, estimate_count, estimate_table_count
+from app.pagination import CREATED_AT_ID_PARSERS, keyset_statement, split_page
+from app.fieldsets import FieldSet, fields_response
+from app.read_models import USER
+from app.search import search_conditions, search_rank
+from app.serialization import trusted_body, trusted_response
+from app.routers.history import HistoryFilters, get_history_page
 from app.schemas.enum import PermissionDetailEnum, PermissionEnum, UserRoleEnum
+from app.schemas.history import ListUserHistoryResponse
 from app.schemas.menu import ListMenuUserLoginResponse
 from app.schemas.role import RoleDetailResponse, RoleLitleResponse
 from app.schemas.user import AvatarReposnseBase, CreateUserSchema, ListUserCommentatorResponse, ListUserMemberChatResponse, PermissiionDetailUserResponse, ProfileInfoResponse, ProfileResponse, ProfileUpdate, ResetPasswordUserSchema, UploadAvatarBase, UserMemberResponse, UserMetaResponse
 from app.schemas.user import UpdateUserSchema, UserResponse, ListUserResponse, ListUserAllResponse
-from ..database import get_db
+from ..database import execute, get_db, get_read_db
 from sqlalchemy.orm import Session
-from .. import models, oauth2
+from .. import models, navigation, oauth2, principal_cache
 from uuid import UUID
 from fastapi import Depends, HTTPException, status, APIRouter
 from app.logging_config import setup_logging
-from sqlalchemy.orm import joinedload
-from sqlalchemy import or_, func
+from sqlalchemy.orm import selectinload
+from sqlalchemy import and_, or_, func, select
 
 logger = setup_logging()
 router = APIRouter()
 
+NAVIGATION_LIMIT = 1000
+
+user_fields = FieldSet(UserResponse)
+
 
 @router.post('', status_code=status.HTTP_201_CREATED)
 async def create_user(background_tasks: BackgroundTasks, payload: CreateUserSchema, request: Request, db: Session = Depends(get_db), user: str = Depends(oauth2.require_user)):
@@ -74,6 +87,7 @@ async def reset_password(background_tasks: BackgroundTasks, payload: ResetPasswo
     del payload.passwordConfirm
     try:
         user.password = payload.password
+        principal_cache.evict(db, user.id)
         db.commit()
         db.refresh(user)
 
@@ -85,37 +99,65 @@ async def reset_password(background_tasks: BackgroundTasks, payload: ResetPasswo
 
     return {'status': 'success', 'message': f'Reset password for user {user.email} successfully'}
 
+async def count_users(db, conditions, count_mode: str):
+    if count_mode == 'none':
+        return None, None, None
+
+    if count_mode == 'estimate':
+        count_all = await estimate_table_count(db, models.User.__table__)
+        if conditions:
+            count_all = await estimate_count(db, select(models.User.id).where(*conditions))
+        return (
+            await estimate_count(db, select(models.User.id).where(models.User.is_activate == True)),
+            await estimate_count(db, select(models.User.id).where(models.User.is_activate == False)),
+            count_all,
+        )
+
+    # One scan of users answers all three counts
+    count_all = func.count().filter(and_(*conditions)) if conditions else func.count()
+    return (await execute(db, select(
+        func.count().filter(models.User.is_activate == True),
+        func.count().filter(models.User.is_activate == False),
+        count_all,
+    ))).one()
+
 @router.get('', response_model=ListUserAllResponse)
 async def get_users(
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db = Depends(get_read_db),
     limit: int = 100,
     page: int = 1,
     name: str = '',
     email: str = '',
     status: bool = None,
+    cursor: str = None,
+    count_mode: str = Query('exact', regex=COUNT_MODES),
+    fields: Optional[Set[str]] = Depends(user_fields),
     user: str = Depends(oauth2.require_user)
 ):
     skip = (page - 1) * limit
 
     # Build the query with filters
-    query = db.query(models.User).filter(
-        models.User.name.contains(name),
-        models.User.email.contains(email)
-    ).order_by(models.User.created_at.desc())
+    terms = [(models.User.name, name), (models.User.email, email)]
+    conditions = search_conditions(terms)
 
     if status is not None:
-        query = query.filter(models.User.is_activate == status)
+        conditions.append(models.User.is_activate == status)
 
-    all_user = db.query(models.User)
+    read_model = USER.only(fields, keep=('created_at', 'id'))
+    query = read_model.select().join_from(models.User, models.Role).where(*conditions)
 
-    users_activate = all_user.filter(models.User.is_activate == True).count()
-    users_inactivate = all_user.filter(models.User.is_activate == False).count()
-    count_all = query.count()
+    users_activate, users_inactivate, count_all = await count_users(db, conditions, count_mode)
 
-    users = query.limit(limit).offset(skip).all()
+    # Cursor mode (an empty cursor starts at the first page) orders by (created_at, id) only, so it skips the similarity rank
+    next_cursor = None
+    keyset = [models.User.created_at, models.User.id]
+    if cursor is None:
+        users = (await execute(db, query.order_by(*search_rank(terms), models.User.created_at.desc()).limit(limit).offset(skip))).all()
+    else:
+        users, next_cursor = split_page((await execute(db, keyset_statement(query, keyset, CREATED_AT_ID_PARSERS, cursor, limit))).all(), keyset, limit)
 
-    return {'status': 'success', 'count_all': count_all, 'users_activate': users_activate, 'users_inactivate': users_inactivate,'results': len(users), 'users': users}
+    return fields_response({'status': 'success', 'count_all': count_all, 'users_activate': users_activate, 'users_inactivate': users_inactivate,'results': len(users), 'next_cursor': next_cursor, 'users': read_model.serialize(users)}, fields)
 
 @router.get('/commentators', response_model=ListUserCommentatorResponse)
 async def get_users_commentators(
@@ -130,16 +172,16 @@ async def get_users_commentators(
     skip = (page - 1) * limit
 
     # Build the query with filters
+    terms = [(models.User.name, name), (models.User.email, email)]
     query = db.query(models.User).join(models.Role).filter(
         models.Role.code == UserRoleEnum.commentators,
         models.User.is_activate == True,
-        models.User.name.contains(name),
-        models.User.email.contains(email)
+        *search_conditions(terms)
     )
 
     count_all = query.count()
 
-    users = query.limit(limit).offset(skip).all()
+    users = query.order_by(*search_rank(terms)).limit(limit).offset(skip).all()
 
     return {'status': 'success', 'count_all': count_all, 'results': len(users), 'users': users}
 
@@ -156,69 +198,63 @@ async def get_users_customer_service(
     skip = (page - 1) * limit
 
     # Build the query with filters
+    terms = [(models.User.name, name), (models.User.email, email)]
     query = db.query(models.User).join(models.Role).filter(
         models.Role.code == UserRoleEnum.customer_service,
         models.User.is_activate == True,
-        models.User.name.contains(name),
-        models.User.email.contains(email)
+        *search_conditions(terms)
     )
 
     count_all = query.count()
 
-    users = query.limit(limit).offset(skip).all()
+    users = query.order_by(*search_rank(terms)).limit(limit).offset(skip).all()
 
     return {'status': 'success', 'count_all': count_all, 'results': len(users), 'users': users}
 
+async def get_role_permissions(db, role):
+    # Admins see every detail of their permissions, other roles only the details granted to them
+    permissions = (await execute(db, select(models.Permission.id, models.Permission.name, models.Permission.code).join(
+        models.RolePermission, models.RolePermission.permission_id == models.Permission.id
+    ).where(
+        models.RolePermission.role_id == role.id
+    ))).all()
+
+    permission_ids = [permission.id for permission in permissions]
+    details_query = select(models.PermissionDetail.id, models.PermissionDetail.name, models.PermissionDetail.code, models.PermissionDetail.permission_id).where(
+        models.PermissionDetail.permission_id.in_(permission_ids))
+    if role.code != UserRoleEnum.admin:
+        details_query = details_query.join(
+            models.RolePermissionDetail, models.RolePermissionDetail.permission_detail_id == models.PermissionDetail.id
+        ).where(
+            models.RolePermissionDetail.role_id == role.id
+        )
+
+    details_by_permission = {}
+    if permission_ids:
+        for detail in (await execute(db, details_query)).all():
+            details_by_permission.setdefault(detail.permission_id, []).append({
+                'id': str(detail.id),
+                'name': detail.name,
+                'code': detail.code,
+            })
+
+    return [{
+        'permission_id': str(permission.id),
+        'permission_name': str(permission.name),
+        'permission_code': str(permission.code),
+        'permission_details': details_by_permission.get(permission.id, []),
+    } for permission in permissions]
+
 @router.get('/permission', response_model=PermissiionDetailUserResponse)
-async def get_user_permissions(background_tasks: BackgroundTasks, db: Session = Depends(get_db), user: str = Depends(oauth2.require_user)):
+async def get_user_permissions(background_tasks: BackgroundTasks, db = Depends(get_read_db), user: str = Depends(oauth2.require_user)):
     try:
-        role = db.query(models.Role).filter(
-            models.Role.id == user.role_id).first()
-        role_permissions = []
-        for rp in role.permissions:
-            permission_details = []
-            permission_id = rp.permission.id
-            if role.code != UserRoleEnum.admin:
-
-                permission_details = db.query(models.RolePermissionDetail.permission_detail_id).filter(
-                    models.RolePermissionDetail.role_id == role.id,
-                    models.RolePermissionDetail.permission_detail.has(
-                        permission_id=permission_id),
-                    models.RolePermissionDetail.permission_detail_id.isnot(
-                        None)
-                ).all()
-            else:
-                permission_details = db.query(models.PermissionDetail.id).join(
-                    models.Permission
-                ).filter(
-                    models.Permission.id == permission_id
-                ).all()
-
-            permission_details = [str(detail[0])
-                                  for detail in permission_details]
-
-            permission_details_list = []
-            for detail_id in permission_details:
-                associated_permission_detail = db.query(
-                    models.PermissionDetail).get(detail_id)
-                permission_details_list.append({
-                    'id': str(detail_id),
-                    'name': associated_permission_detail.name,
-                    'code': associated_permission_detail.code,
-                })
-
-            role_permissions.append({
-                'permission_id': str(permission_id),
-                'permission_name': str(rp.permission.name),
-                'permission_code': str(rp.permission.code),
-                'permission_details': permission_details_list,
-            })
+        role_permissions = await get_role_permissions(db, user.role)
 
         response_data = {
             'permissions': role_permissions,
         }
 
-        background_tasks.add_task(oauth2.user_history, user, db=db, status_code=status.HTTP_200_OK,
+        background_tasks.add_task(oauth2.user_history, user, status_code=status.HTTP_200_OK,
                                   permission="permission", permission_detail="permission")
 
         return response_data
@@ -288,6 +324,7 @@ async def update_profile(profile_update: ProfileUpdate, db: Session = Depends(ge
 
                     db.add(new_meta_detail)
 
+        principal_cache.evict(db, user.id)
         db.commit()
         db.refresh(user_to_update)
 
@@ -309,7 +346,7 @@ async def update_profile(profile_update: ProfileUpdate, db: Session = Depends(ge
             user_meta_response.append(meta_response)
 
         profile_info = ProfileInfoResponse(
-            name=user.name, email=user.email, status=user.is_activate, role_name=user.role.name, avatar=user.avatar)
+            name=user_to_update.name, email=user.email, status=user.is_activate, role_name=user.role.name, avatar=user.avatar)
 
         profile_response = ProfileResponse(
             info=profile_info, user_meta=user_meta_response)
@@ -348,6 +385,7 @@ async def upload_avatar(avarta: UploadAvatarBase, db: Session = Depends(get_db),
         
         check_exist_user.avatar = file_url
         db.add(check_exist_user)
+        principal_cache.evict(db, check_exist_user.id)
         db.commit()
         db.refresh(check_exist_user)
 
@@ -356,65 +394,19 @@ async def upload_avatar(avarta: UploadAvatarBase, db: Session = Depends(get_db),
         db.rollback()
         logger.error(f"Error updating profile. Error: {str(e)}")
 
-@router.get('/menu', response_model=ListMenuUserLoginResponse)
-async def get_menu_and_permission(background_tasks: BackgroundTasks, db: Session = Depends(get_db),
-                                  limit: int = 1000,
-                                  page: int = 1,
-                                  name: str = '',
-                                  user: str = Depends(oauth2.require_user)
-                                  ):
+async def build_navigation(db, role, limit: int, skip: int, name: str):
+    query = select(models.Menu)
 
-    skip = (page - 1) * limit
+    query = query.join(models.RoleMenu).where(
+        models.RoleMenu.role_id == role.id)
 
-    query = db.query(models.Menu)
-
-    query = query.join(models.RoleMenu).filter(
-        models.RoleMenu.role_id == user.role.id)
-
-    if name:
-        query = query.filter(models.Menu.name.contains(name))
-
-    menu = query.options(joinedload(models.Menu.menu).joinedload(models.RoleMenu.role), joinedload(
-        models.Menu.sub_menu)).order_by(models.Menu.position.asc()).limit(limit).offset(skip).all()
-
-    role = db.query(models.Role).filter(models.Role.id == user.role_id).first()
-    role_permissions = []
-    for rp in role.permissions:
-        permission_details = []
-        permission_id = rp.permission.id
-        if role.code != UserRoleEnum.admin:
-
-            permission_details = db.query(models.RolePermissionDetail.permission_detail_id).filter(
-                models.RolePermissionDetail.role_id == role.id,
-                models.RolePermissionDetail.permission_detail.has(
-                    permission_id=permission_id),
-                models.RolePermissionDetail.permission_detail_id.isnot(None)
-            ).all()
-        else:
-            permission_details = db.query(models.PermissionDetail.id).join(
-                models.Permission
-            ).filter(
-                models.Permission.id == permission_id
-            ).all()
-
-        permission_details = [str(detail[0]) for detail in permission_details]
-
-        permission_details_list = []
-        for detail_id in permission_details:
-            associated_permission_detail = db.query(
-                models.PermissionDetail).get(detail_id)
-            permission_details_list.append({
-                'id': str(detail_id),
-                'name': associated_permission_detail.name,
-                'code': associated_permission_detail.code,
-            })
+    terms = [(models.Menu.name, name)]
+    query = query.where(*search_conditions(terms))
 
-        role_permissions.append({
-            'permission_id': str(permission_id),
-            'permission_name': str(rp.permission.name),
-            'permission_code': str(rp.permission.code),
-            'permission_details': permission_details_list,
-        })
+    menu = (await execute(db, query.options(selectinload(models.Menu.sub_menu)).order_by(
+        *search_rank(terms), models.Menu.position.asc()).limit(limit).offset(skip))).scalars().all()
+
+    role_permissions = await get_role_permissions(db, role)
 
     role_permission_res = {
         'id': str(role.id),
@@ -425,6 +417,7 @@ async def get_menu_and_permission(background_tasks: BackgroundTasks, db: Session
         'permissions': role_permissions,
     }
 
+    # Keys mirror ListMenuUserLoginResponse exactly, since the trusted paths may skip its validation
     result = []
     for menu_item in menu:
         submenus = [{
@@ -441,31 +434,73 @@ async def get_menu_and_permission(background_tasks: BackgroundTasks, db: Session
             'position': menu_item.position,
             'icon': menu_item.icon,
             'submenus': submenus,
-            'created_at': menu_item.created_at,
-            'updated_at': menu_item.updated_at,
         })
-    background_tasks.add_task(oauth2.user_history, user, db=db,
-                              status_code=status.HTTP_200_OK, permission="menu", permission_detail="menu")
 
     return {'status': 'success', 'menu': result, 'role_permissions_detail': role_permission_res}
 
+@router.get('/menu', response_model=ListMenuUserLoginResponse)
+async def get_menu_and_permission(background_tasks: BackgroundTasks, request: Request, db = Depends(get_read_db),
+                                  limit: int = NAVIGATION_LIMIT,
+                                  page: int = 1,
+                                  name: str = '',
+                                  user: str = Depends(oauth2.require_user)
+                                  ):
+
+    skip = (page - 1) * limit
+    background_tasks.add_task(oauth2.user_history, user,
+                              status_code=status.HTTP_200_OK, permission="menu", permission_detail="menu")
+
+    # The unfiltered first page is the role's whole navigation, served from a pre-serialized bundle
+    if name or page != 1 or limit != NAVIGATION_LIMIT:
+        return trusted_response(await build_navigation(db, user.role, limit, skip, name))
+
+    if_none_match = request.headers.get('if-none-match')
+    version = await navigation.current_version(db, user.role.id)
+    bundle = navigation.cached_bundle(user.role.id, version)
+    if bundle is None:
+        data = await build_navigation(db, user.role, limit, skip, name)
+        bundle = navigation.store_bundle(user.role.id, trusted_body(data, ListMenuUserLoginResponse), version)
+
+    return navigation.bundle_response(bundle, if_none_match, request.headers.get('accept-encoding'))
+
 
 @router.get('/me', response_model=UserResponse)
 async def get_me(background_tasks: BackgroundTasks, db: Session = Depends(get_db), user: str = Depends(oauth2.require_user)):
 
     user = db.query(models.User).filter(models.User.id == user.id).first()
-    background_tasks.add_task(oauth2.user_history, user, db=db,
+    background_tasks.add_task(oauth2.user_history, user,
                               status_code=status.HTTP_200_OK, permission="", permission_detail="get me")
     return user
 
 
 @router.get('/{user_id}', response_model=UserResponse)
-async def get_user(background_tasks: BackgroundTasks, user_id: UUID, db: Session = Depends(get_db), user: models.User = Depends(oauth2.require_user)):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+async def get_user(background_tasks: BackgroundTasks, user_id: UUID, db: Session = Depends(get_db), fields: Optional[Set[str]] = Depends(user_fields), user: models.User = Depends(oauth2.require_user)):
+    # The history entry is recorded against the looked-up user, so its id and email are always read
+    read_model = USER.only(fields, keep=('id', 'email'))
+    found = db.execute(read_model.select().join_from(models.User, models.Role).where(models.User.id == user_id)).first()
 
-    background_tasks.add_task(oauth2.user_history, user, db=db,
+    background_tasks.add_task(oauth2.user_history, found,
                               status_code=status.HTTP_200_OK, permission="", permission_detail="get user")
-    return user
+    if found is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='User not found')
+    return fields_response(read_model.serialize([found])[0], fields)
+
+
+@router.get('/{user_id}/history', response_model=ListUserHistoryResponse)
+async def get_user_history(
+    background_tasks: BackgroundTasks,
+    user_id: UUID,
+    db: Session = Depends(get_db),
+    filters: HistoryFilters = Depends(),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str = None,
+    output_format: str = Query('json', alias='format', regex='^(json|ndjson)$'),
+    user: str = Depends(oauth2.require_user)
+):
+    oauth2.check_permissions_detail([PermissionEnum.history], [PermissionDetailEnum.read], user, background_tasks=background_tasks, db=db)
+
+    filters.user_id = user_id
+    return get_history_page(db, filters, limit, cursor, output_format)
 
 
 @router.put('/{id}', response_model=UserResponse)
@@ -495,6 +530,7 @@ async def update_user(background_tasks: BackgroundTasks, id: UUID, user: UpdateU
         updated_user.role_id = user.role_id
 
     try:
+        principal_cache.evict(db, updated_user.id)
         db.commit()
         db.refresh(updated_user)
 
@@ -511,6 +547,7 @@ async def delete_user(id: UUID, db: Session = Depends(get_db), user: str = Depen
         users = db.query(models.User).filter(models.User.id == id).first()
 
         db.delete(users)
+        principal_cache.evict(db, id)
         db.commit()
 
         return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -38,4 +38,5 @@ class UpdateCategorySchema(BaseModel):
 class ListCategoryResponse(BaseModel):
     status: str
     results: int
+    next_cursor: Optional[Union[str, None]] = None
     categories: List[CategoryRoleResponse]
\ No newline at end of file
@@ -23,6 +23,7 @@ class PermissionEnum(str):
     sub_menu = 'sub_menu'
     subject_menu = 'subject_menu'
     customer_service = 'customer_service'
+    history = 'history'
 
 
 class PermissionDetailEnum(str):
@@ -0,0 +1,23 @@
+from datetime import datetime
+from typing import List, Optional, Union
+from uuid import UUID
+from pydantic import BaseModel
+
+# UserHistory Start
+class UserHistoryResponse(BaseModel):
+    id: UUID
+    user_id: Optional[Union[UUID, None]] = None
+    email: Optional[Union[str, None]] = None
+    permission: Optional[Union[str, None]] = None
+    permission_detail: Optional[Union[str, None]] = None
+    status_code: Optional[Union[int, None]] = None
+    created_at: datetime
+    class Config:
+        orm_mode = True
+
+class ListUserHistoryResponse(BaseModel):
+    status: str
+    results: int
+    next_cursor: Optional[Union[str, None]] = None
+    history: List[UserHistoryResponse]
+# UserHistory End
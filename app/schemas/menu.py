@@ -134,4 +134,5 @@ class MenuAndSubjectResponse(MenuAndSubjectBaseSchema):
 class ListMenuAndSubjectMenuResponse(BaseModel):
     status: str
     results: int
+    next_cursor: Optional[Union[str, None]] = None
     menu: List[MenuAndSubjectResponse]
\ No newline at end of file
@@ -40,6 +40,7 @@ class ListPermissionResponse(BaseModel):
     status: str
     count_all: int
     results: int
+    next_cursor: Optional[Union[str, None]] = None
     permissions: List[PermissionRoleResponse]
     
 class ListPermissionLiteResponse(BaseModel):
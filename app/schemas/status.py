@@ -39,4 +39,5 @@ class UpdateStatusSchema(BaseModel):
 class ListStatusResponse(BaseModel):
     status: str
     results: int
+    next_cursor: Optional[Union[str, None]] = None
     statuses: List[StatusResponse]
\ No newline at end of file
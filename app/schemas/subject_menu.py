@@ -42,4 +42,5 @@ class UpdateSubjectMenuSchema(BaseModel):
 class ListSubjectMenuResponse(BaseModel):
     status: str
     results: int
+    next_cursor: Optional[Union[str, None]] = None
     subject_menus: List[SubjectMenuResponse]
\ No newline at end of file
@@ -76,10 +76,11 @@ class ListUserResponse(BaseModel):
 
 class ListUserAllResponse(BaseModel):
     status: str
-    users_activate: int
-    users_inactivate: int
-    count_all: int
+    users_activate: Optional[Union[int, None]] = None
+    users_inactivate: Optional[Union[int, None]] = None
+    count_all: Optional[Union[int, None]] = None
     results: int
+    next_cursor: Optional[Union[str, None]] = None
     users: List[UserResponse]
 
 class ListUserCommentatorResponse(BaseModel):
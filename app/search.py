@@ -0,0 +1,25 @@
+from sqlalchemy import func
+
+
+def _escape_like(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _active_terms(terms):
+    return [(column, value.strip()) for column, value in terms if value and value.strip()]
+
+
+def search_conditions(terms) -> list:
+    # Empty filters produce no SQL at all; the rest become ILIKE, which the gin_trgm_ops indexes serve
+    return [
+        column.ilike(f'%{_escape_like(value)}%', escape='\\')
+        for column, value in _active_terms(terms)
+    ]
+
+
+def search_rank(terms) -> list:
+    # Best trigram similarity across the searched columns, most similar first
+    similarities = [func.similarity(column, value) for column, value in _active_terms(terms)]
+    if not similarities:
+        return []
+    return [func.greatest(*similarities).desc()]
@@ -0,0 +1,87 @@
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+from app.logging_config import setup_logging
+logger = setup_logging()
+
+# Bind placeholders as the drivers render them: psycopg2 %(name)s, the format style %s that SQLAlchemy's
+# asyncpg dialect hands to the cursor, and asyncpg's own $1 (%% is an escaped percent sign, not a bind)
+_PLACEHOLDER = r'(?:(?<!%)%\([^)]+\)s|(?<!%)%s|\$\d+)'
+# Expanded IN lists render one placeholder per value; collapse them so the shape ignores list length
+_IN_LIST = re.compile(r'IN \((?:\s*' + _PLACEHOLDER + r'\s*,?)+\)')
+_PARAM = re.compile(_PLACEHOLDER)
+_WHITESPACE = re.compile(r'\s+')
+
+
+class NPlusOneError(Exception):
+    pass
+
+
+class RequestSqlStats:
+    def __init__(self):
+        self.statements = 0
+        self.db_time = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement: str, elapsed: float):
+        self.statements += 1
+        self.db_time += elapsed
+        shape = statement_shape(statement)
+        self.shapes[shape] += 1
+        return shape, self.shapes[shape]
+
+    def repeated_shapes(self, threshold: int):
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > threshold]
+
+
+_request_stats: ContextVar[Optional[RequestSqlStats]] = ContextVar('request_sql_stats', default=None)
+
+
+def statement_shape(statement: str) -> str:
+    shape = _IN_LIST.sub('IN (?)', statement)
+    shape = _PARAM.sub('?', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+def start_request():
+    return _request_stats.set(RequestSqlStats())
+
+
+def finish_request(token) -> RequestSqlStats:
+    stats = _request_stats.get()
+    _request_stats.reset(token)
+    return stats
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _request_stats.get() is not None:
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _request_stats.get()
+    if stats is None or not conn.info.get('query_start'):
+        return
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    shape, count = stats.record(statement, elapsed)
+    # Strict mode fails at the offending statement, so the traceback points at the loop
+    if settings.SQL_STRICT_MODE and count > settings.SQL_REPEAT_THRESHOLD:
+        raise NPlusOneError(f'Statement ran {count} times in one request: {shape}')
+
+
+def server_timing(stats: RequestSqlStats, total: float) -> str:
+    return f'db;dur={stats.db_time * 1000:.1f};desc="{stats.statements} queries", total;dur={total * 1000:.1f}'
+
+
+def report_repeated_shapes(stats: RequestSqlStats, method: str, path: str):
+    for shape, count in stats.repeated_shapes(settings.SQL_REPEAT_THRESHOLD):
+        logger.warning(f'Possible N+1 on {method} {path}: statement ran {count} times: {shape}')
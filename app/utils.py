@@ -1,3 +1,7 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import time
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 import uuid
 from typing import Dict
@@ -9,22 +13,101 @@ from sqlalchemy.orm import Session
 from app.database import SessionLocal
 import random
 import string
-from app import models
+from app import metrics, models
+from app.config import settings
 import redis
+import redis.asyncio
 from app.logging_config import setup_logging
 logger = setup_logging()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=1)
+# Hashes below bcrypt__min_rounds are reported as needing an update, so raising
+# BCRYPT_ROUNDS upgrades stored hashes on the next successful login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+)
 
 # User connnect websocket Store
 active_websockets: Dict[str, List[WebSocket]] = {}
 
-async def hash_password(password: str):
+_password_executor: Executor = None
+_password_stats = {
+    'submitted': 0,
+    'completed': 0,
+    'rejected': 0,
+    'in_flight': 0,
+    'peak_in_flight': 0,
+    'wait_seconds_total': 0.0,
+    'run_seconds_total': 0.0,
+}
+
+def get_password_executor() -> Executor:
+    global _password_executor
+    if _password_executor is None:
+        if settings.PASSWORD_HASH_EXECUTOR == 'process':
+            _password_executor = ProcessPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS)
+        else:
+            _password_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix='password-hash')
+    return _password_executor
+
+def shutdown_password_executor():
+    global _password_executor
+    if _password_executor is not None:
+        _password_executor.shutdown(wait=True)
+        _password_executor = None
+
+def get_password_stats():
+    return dict(_password_stats, workers=settings.PASSWORD_HASH_WORKERS, executor=settings.PASSWORD_HASH_EXECUTOR, max_pending=settings.PASSWORD_HASH_MAX_PENDING)
+
+metrics.register('password_hasher', get_password_stats)
+
+# Worker-side helpers live at module level so they can be pickled for the process pool
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def _hash(password: str):
     return pwd_context.hash(password)
 
-async def verify_password(password: str, hashed_password: str):
+def _verify(password: str, hashed_password: str):
     return pwd_context.verify(password, hashed_password)
 
+def _verify_and_update(password: str, hashed_password: str):
+    return pwd_context.verify_and_update(password, hashed_password)
+
+async def _run_password_task(func, *args):
+    if _password_stats['in_flight'] >= settings.PASSWORD_HASH_MAX_PENDING:
+        _password_stats['rejected'] += 1
+        logger.warning('Password hasher queue is full, rejecting request')
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail='Server is busy, please try again')
+
+    _password_stats['submitted'] += 1
+    _password_stats['in_flight'] += 1
+    _password_stats['peak_in_flight'] = max(_password_stats['peak_in_flight'], _password_stats['in_flight'])
+    start = time.perf_counter()
+    try:
+        loop = asyncio.get_running_loop()
+        result, run_seconds = await loop.run_in_executor(get_password_executor(), _timed, func, *args)
+        _password_stats['run_seconds_total'] += run_seconds
+        _password_stats['wait_seconds_total'] += time.perf_counter() - start - run_seconds
+        return result
+    finally:
+        _password_stats['in_flight'] -= 1
+        _password_stats['completed'] += 1
+
+async def hash_password(password: str):
+    return await _run_password_task(_hash, password)
+
+async def verify_password(password: str, hashed_password: str):
+    return await _run_password_task(_verify, password, hashed_password)
+
+async def verify_and_update_password(password: str, hashed_password: str):
+    # Returns (is_valid, new_hash); new_hash is set when the stored hash uses an outdated cost factor
+    return await _run_password_task(_verify_and_update, password, hashed_password)
+
 def get_user_ids_by_roles(db: Session, roles: list):
     role_ids = db.query(Role.id).filter(Role.name.in_(roles)).all()
 
@@ -44,14 +127,41 @@ def get_db():
     finally:
         db.close()
 
+def redis_options() -> dict:
+    return {
+        'host': settings.REDIS_HOST,
+        'port': settings.REDIS_PORT,
+        'db': settings.REDIS_DB,
+        'password': settings.REDIS_PASSWORD,
+        'max_connections': settings.REDIS_MAX_CONNECTIONS,
+        'timeout': settings.REDIS_POOL_TIMEOUT,
+        'socket_timeout': settings.REDIS_SOCKET_TIMEOUT,
+        'socket_connect_timeout': settings.REDIS_SOCKET_TIMEOUT,
+    }
+
+
 class RedisManager:
     _instance = None
 
     def __new__(cls, *args, **kwargs):
         if not cls._instance:
             cls._instance = super(RedisManager, cls).__new__(cls)
-            cls._instance._redis = redis.Redis(host="localhost", port=6379, db=0)
+            # Blocking pools wait up to REDIS_POOL_TIMEOUT for a free connection instead of failing at the cap
+            cls._instance._redis = redis.Redis(connection_pool=redis.BlockingConnectionPool(**redis_options()))
+            cls._instance._async_redis = None
         return cls._instance
 
     def get_redis(self):
-        return self._redis
\ No newline at end of file
+        return self._redis
+
+    def get_async_redis(self):
+        # Created on first use, inside the event loop its connections belong to
+        if self._async_redis is None:
+            self._async_redis = redis.asyncio.Redis(connection_pool=redis.asyncio.BlockingConnectionPool(**redis_options()))
+        return self._async_redis
+
+    async def close(self):
+        if self._async_redis is not None:
+            await self._async_redis.aclose()
+            await self._async_redis.connection_pool.disconnect()
+            self._async_redis = None
\ No newline at end of file
@@ -0,0 +1,88 @@
+import os
+import statistics
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Sequence
+
+from dotenv import dotenv_values
+
+# Run the scripts from the repository root, e.g. python -m benchmarks.serialization. app.config needs the
+# full settings at import time; the sample values fill in whatever the environment does not set
+for name, value in dotenv_values(os.path.join(os.path.dirname(__file__), '..', '.env.sample')).items():
+    if value is not None:
+        os.environ.setdefault(name, value)
+
+
+def percentile(samples: Sequence[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples: Sequence[float]) -> Dict[str, float]:
+    # Samples are in seconds, the summary is in milliseconds
+    if not samples:
+        return {'n': 0, 'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0}
+    return {
+        'n': len(samples),
+        'mean': statistics.fmean(samples) * 1000,
+        'p50': percentile(samples, 50) * 1000,
+        'p95': percentile(samples, 95) * 1000,
+        'p99': percentile(samples, 99) * 1000,
+    }
+
+
+def timed(fn: Callable, iterations: int) -> List[float]:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def report(title: str, rows: Dict[str, Dict[str, float]]):
+    print(f'\n{title}')
+    columns = list(next(iter(rows.values())).keys())
+    width = max(len(label) for label in rows) + 2
+    widths = [max(12, len(column) + 2) for column in columns]
+    print(''.ljust(width) + ''.join(column.rjust(size) for column, size in zip(columns, widths)))
+    for label, values in rows.items():
+        cells = ''.join(
+            (f'{value:{size}.3f}' if isinstance(value, float) else f'{value:>{size}}')
+            for value, size in zip(values.values(), widths)
+        )
+        print(label.ljust(width) + cells)
+
+
+@contextmanager
+def rolled_back_connection():
+    # Seed data and measurements share one transaction against the configured database, which must be
+    # migrated to head; nothing is left behind
+    from app.database import engine
+    connection = engine.connect()
+    transaction = connection.begin()
+    try:
+        yield connection
+    finally:
+        transaction.rollback()
+        connection.close()
+
+
+class StatementCounter:
+    # Counts the statements sent on a connection while active
+    def __init__(self, connection):
+        self.connection = connection
+        self.count = 0
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        from sqlalchemy import event
+        event.listen(self.connection, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        from sqlalchemy import event
+        event.remove(self.connection, 'before_cursor_execute', self._on_execute)
@@ -0,0 +1,79 @@
+import argparse
+import asyncio
+import time
+
+from benchmarks._common import report, summarize
+
+import httpx
+
+# Throughput of the hot read paths at rising concurrency, against a running server. Start the server once
+# per mode and run the script against each, e.g.
+#   DATABASE_ASYNC_MODE=false uvicorn app.main:app --port 8000
+#   python -m benchmarks.async_throughput --email admin@example.com --password ... --label sync
+#   DATABASE_ASYNC_MODE=true uvicorn app.main:app --port 8000
+#   python -m benchmarks.async_throughput --email admin@example.com --password ... --label async
+PATHS = ['/api/users', '/api/menu', '/api/users/menu', '/api/users/permission']
+
+
+async def login(client: httpx.AsyncClient, email: str, password: str) -> str:
+    response = await client.post('/api/auth/login', json={'email': email, 'password': password})
+    response.raise_for_status()
+    return response.json()['access_token']
+
+
+async def run(client: httpx.AsyncClient, paths, concurrency: int, duration: float):
+    samples, errors = [], 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(offset: int):
+        nonlocal errors
+        position = offset
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = await client.get(paths[position % len(paths)])
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                samples.append(time.perf_counter() - started)
+            else:
+                errors += 1
+            position += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(offset) for offset in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return dict(summarize(samples), rps=len(samples) / elapsed, errors=errors)
+
+
+async def main_async(args):
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        token = args.token or await login(client, args.email, args.password)
+        client.headers['Authorization'] = f'Bearer {token}'
+        rows = {}
+        for concurrency in args.concurrency:
+            rows[f'{args.label} x{concurrency}'] = await run(client, args.paths, concurrency, args.duration)
+    report(f'Latency, ms and requests per second ({", ".join(args.paths)})', rows)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--token')
+    parser.add_argument('--email')
+    parser.add_argument('--password')
+    parser.add_argument('--label', default='server')
+    parser.add_argument('--paths', nargs='+', default=PATHS)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[50, 200, 1000])
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--timeout', type=float, default=30.0)
+    args = parser.parse_args()
+    if not args.token and not (args.email and args.password):
+        parser.error('pass --token, or --email and --password to log in')
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+import argparse
+import time
+
+from benchmarks._common import report, summarize, timed
+from benchmarks.serialization import fake_payload
+
+from app.compression import ENCODINGS, compress
+from app.navigation import NavigationBundle, representation
+from app.schemas.menu import ListMenuUserLoginResponse
+from app.schemas.user import ListUserAllResponse
+from app.serialization import dumps
+
+# Bytes on the wire and CPU per response for each coding the middleware negotiates, at the configured
+# GZIP_COMPRESSION_LEVEL / BROTLI_QUALITY (br only when brotli is installed), plus the navigation
+# bundle served from its cached representation against compressing it on every request.
+#   python -m benchmarks.compression --menus 40 --users 1000 --iterations 200
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--menus', type=int, default=40)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    bodies = {
+        f'menu tree ({args.menus} menus)': dumps(fake_payload(ListMenuUserLoginResponse, args.menus)),
+        f'user page ({args.users} rows)': dumps(fake_payload(ListUserAllResponse, args.users)),
+    }
+    rows = {}
+    for label, body in bodies.items():
+        rows[f'{label} identity'] = {'bytes': len(body), 'ratio': 1.0, 'p50 ms': 0.0, 'p99 ms': 0.0}
+        for encoding in ENCODINGS:
+            encoded = compress(body, encoding)
+            cost = summarize(timed(lambda: compress(body, encoding), args.iterations))
+            rows[f'{label} {encoding}'] = {
+                'bytes': len(encoded), 'ratio': len(body) / len(encoded), 'p50 ms': cost['p50'], 'p99 ms': cost['p99'],
+            }
+    report('Response size and compression CPU', rows)
+
+    body = bodies[f'menu tree ({args.menus} menus)']
+    rows = {}
+    for encoding in ENCODINGS:
+        bundle = NavigationBundle(body=body, etag='"bench"', version=(), compiled_at=time.monotonic(), encoded={})
+        representation(bundle, encoding)
+        cached = summarize(timed(lambda: representation(bundle, encoding), args.iterations))
+        fresh = summarize(timed(lambda: compress(bundle.body, encoding), args.iterations))
+        rows[encoding] = {
+            'cached p50': cached['p50'], 'cached p99': cached['p99'],
+            'recompress p50': fresh['p50'], 'recompress p99': fresh['p99'],
+        }
+    report('Navigation bundle per request, ms', rows)
+
+
+if __name__ == '__main__':
+    main()
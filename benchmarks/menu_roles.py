@@ -0,0 +1,85 @@
+import argparse
+import time
+import uuid
+
+from benchmarks._common import StatementCounter, report, rolled_back_connection, summarize
+
+from sqlalchemy.orm import Session
+
+from app import models
+from app.routers.menu import assign_menu_roles
+
+# Assigning one menu to many roles, against the configured database (migrated to head; seeded in a
+# transaction that is rolled back):
+#   per row   what create_menu/update_menu used to do for each role: add, commit, refresh, lazy-load the
+#             role. Each commit is a savepoint release here so the run can still be rolled back
+#   batched   assign_menu_roles: one IN query and one multi-row INSERT ... ON CONFLICT DO NOTHING
+#   python -m benchmarks.menu_roles --roles 100 --iterations 50
+
+
+def seed_roles(db: Session, roles: int):
+    suffix = uuid.uuid4().hex[:8]
+    role_ids = [uuid.uuid4() for _ in range(roles)]
+    db.execute(models.Role.__table__.insert(), [
+        {'id': role_id, 'name': f'Role {index}', 'code': f'bench-{suffix}-{index}'}
+        for index, role_id in enumerate(role_ids)
+    ])
+    return role_ids
+
+
+def new_menu(db: Session):
+    menu_id = uuid.uuid4()
+    db.execute(models.Menu.__table__.insert().values(id=menu_id, name='Benchmark', code=f'bench-{menu_id.hex[:8]}', position=0))
+    return menu_id
+
+
+def per_row(db: Session, menu_id, role_ids):
+    result = []
+    for role_id in role_ids:
+        db.begin_nested()
+        new_role_menu = models.RoleMenu(role_id=role_id, menu_id=menu_id)
+        db.add(new_role_menu)
+        db.commit()
+        db.refresh(new_role_menu)
+        result.append({
+            'id': str(role_id),
+            'name': new_role_menu.role.name,
+            'code': new_role_menu.role.code,
+            'icon': new_role_menu.role.icon,
+        })
+    return result
+
+
+def batched(db: Session, menu_id, role_ids):
+    return assign_menu_roles(db, menu_id, role_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--roles', type=int, default=100)
+    parser.add_argument('--iterations', type=int, default=50)
+    args = parser.parse_args()
+
+    rows = {}
+    with rolled_back_connection() as connection:
+        db = Session(bind=connection)
+        role_ids = seed_roles(db, args.roles)
+        for label, assign in (('per row', per_row), ('batched', batched)):
+            samples, statements = [], 0
+            for _ in range(args.iterations):
+                menu_id = new_menu(db)
+                db.expunge_all()
+                with StatementCounter(connection) as counter:
+                    started = time.perf_counter()
+                    assigned = assign(db, menu_id, role_ids)
+                    samples.append(time.perf_counter() - started)
+                statements = counter.count
+                assert len(assigned) == len(role_ids), f'{label} assigned {len(assigned)} roles'
+            rows[label] = dict(summarize(samples), statements=statements)
+        db.close()
+
+    report(f'Assigning a menu to {args.roles} roles, ms', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+import argparse
+import asyncio
+import time
+
+from benchmarks._common import report, summarize
+
+import httpx
+from fastapi import FastAPI, HTTPException, status
+
+from app import utils
+from app.config import settings
+
+# Ordinary GETs running alongside a stream of logins. inline verifies the password on the event loop, the
+# way login did before the hasher pool; pool goes through utils.verify_password. The interesting number is
+# the GET tail latency: bcrypt on the loop stalls every other request behind it. With fewer cores than
+# PASSWORD_HASH_WORKERS the pool keeps the loop free but cannot add login throughput.
+#   BCRYPT_ROUNDS=12 PASSWORD_HASH_WORKERS=4 python -m benchmarks.password_load --logins 8 --readers 16
+PASSWORD = 'benchmark-password'
+
+
+def build_app(hashed: str, mode: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.post('/login')
+    async def login():
+        if mode == 'inline':
+            valid = utils.pwd_context.verify(PASSWORD, hashed)
+        else:
+            valid = await utils.verify_password(PASSWORD, hashed)
+        if not valid:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Incorrect Email or Password')
+        return {'status': 'success'}
+
+    @app.get('/ping')
+    async def ping():
+        return {'status': 'success'}
+
+    return app
+
+
+async def run(mode: str, hashed: str, logins: int, readers: int, interval: float, duration: float):
+    app = build_app(hashed, mode)
+    get_samples, login_samples = [], []
+    rejected = 0
+    deadline = time.perf_counter() + duration
+    logins_done = asyncio.Event()
+
+    async def login_client(client):
+        nonlocal rejected
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = await client.post('/login')
+            if response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
+                rejected += 1
+            else:
+                login_samples.append(time.perf_counter() - started)
+            # The in-process transport never suspends on its own; a real socket would
+            await asyncio.sleep(0)
+
+    async def login_clients(client):
+        await asyncio.gather(*(login_client(client) for _ in range(logins)))
+        logins_done.set()
+
+    async def get_client(client):
+        # Each reader sends a GET every interval seconds and its latency is counted from when it was due,
+        # so time spent waiting for a blocked event loop shows up in the numbers. Reads go on for as long
+        # as logins are running
+        due = time.perf_counter()
+        while not logins_done.is_set():
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+            await client.get('/ping')
+            get_samples.append(time.perf_counter() - due)
+            due = max(due + interval, time.perf_counter())
+
+    async with httpx.AsyncClient(app=app, base_url='http://benchmark') as client:
+        await asyncio.gather(*(get_client(client) for _ in range(readers)), login_clients(client))
+    return summarize(get_samples), summarize(login_samples), rejected
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logins', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=16)
+    parser.add_argument('--interval-ms', type=float, default=10.0)
+    parser.add_argument('--duration', type=float, default=10.0)
+    args = parser.parse_args()
+
+    hashed = utils.pwd_context.hash(PASSWORD)
+    rows = {}
+    for mode in ('inline', 'pool'):
+        gets, logins, rejected = asyncio.run(run(mode, hashed, args.logins, args.readers, args.interval_ms / 1000, args.duration))
+        rows[f'{mode} GET'] = dict(gets, rejected=0)
+        rows[f'{mode} login'] = dict(logins, rejected=rejected)
+    utils.shutdown_password_executor()
+    report(
+        f'Latency, ms ({args.logins} login clients, {args.readers} GET clients every {args.interval_ms} ms, bcrypt rounds '
+        f'{settings.BCRYPT_ROUNDS}, {settings.PASSWORD_HASH_WORKERS} {settings.PASSWORD_HASH_EXECUTOR} workers)',
+        rows,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+import argparse
+import uuid
+
+from benchmarks._common import StatementCounter, report, rolled_back_connection, summarize, timed
+
+from sqlalchemy.orm import Session
+
+from app import models, permission_cache
+
+# Permission check cost per request for one role with many grants, against the configured database
+# (migrated to head; everything is seeded in a transaction that is rolled back):
+#   lazy      how check_permissions_detail used to walk role.permissions and each permission's details
+#   cold      permission_cache compiling the role's snapshot (one joined query)
+#   warm      the cached snapshot, checked against cache_versions
+#   python -m benchmarks.permission_snapshot --permissions 60 --details 4 --iterations 500
+
+
+def seed(db: Session, permissions: int, details: int):
+    suffix = uuid.uuid4().hex[:8]
+    role = models.Role(name=f'Benchmark {suffix}', code=f'bench-{suffix}')
+    db.add(role)
+    for index in range(permissions):
+        permission = models.Permission(name=f'Permission {index}', code=f'bench-{suffix}-{index}')
+        permission.permissions_detail = [
+            models.PermissionDetail(name=f'Detail {detail}', code=f'detail-{detail}') for detail in range(details)
+        ]
+        db.add(permission)
+        db.add(models.RolePermission(role=role, permission=permission))
+    db.flush()
+    return role.id
+
+
+def lazy_codes(db: Session, role_id):
+    # Fresh identity map each time, as each request had its own session
+    db.expunge_all()
+    role = db.get(models.Role, role_id)
+    codes = {role_permission.permission.code for role_permission in role.permissions}
+    codes.update(
+        permission_detail.code
+        for role_permission in role.permissions
+        for permission_detail in role_permission.permission.permissions_detail
+    )
+    return codes
+
+
+def cold_codes(db: Session, role_id):
+    permission_cache._snapshots.clear()
+    return permission_cache.get_role_snapshot(db, role_id).codes
+
+
+def warm_codes(db: Session, role_id):
+    return permission_cache.get_role_snapshot(db, role_id).codes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--permissions', type=int, default=60)
+    parser.add_argument('--details', type=int, default=4)
+    parser.add_argument('--iterations', type=int, default=500)
+    args = parser.parse_args()
+
+    with rolled_back_connection() as connection:
+        db = Session(bind=connection)
+        role_id = seed(db, args.permissions, args.details)
+        expected = lazy_codes(db, role_id)
+
+        rows = {}
+        for label, check in (('lazy', lazy_codes), ('cold', cold_codes), ('warm', warm_codes)):
+            assert set(check(db, role_id)) == expected, f'{label} sees different permission codes'
+            with StatementCounter(connection) as counter:
+                check(db, role_id)
+            samples = timed(lambda: check(db, role_id), args.iterations)
+            rows[label] = dict(summarize(samples), queries=counter.count)
+        db.close()
+
+    report(f'Permission check per request, ms ({args.permissions} permissions x {args.details} details)', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+import argparse
+import gc
+import time
+import tracemalloc
+
+from benchmarks._common import report, rolled_back_connection, summarize
+from benchmarks.serialization import trusted, validated
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app import models
+from app.read_models import USER
+from app.schemas.user import ListUserAllResponse
+
+# One 1,000-row user page, against the configured database (migrated to head; seeded in a transaction
+# that is rolled back):
+#   orm         what get_users used to do: full User instances in the identity map, validated through
+#               response_model (role loaded lazily, as before)
+#   read model  app.read_models.USER: a column projection returning Core rows, serialized straight to JSON
+# Memory is what the fetched rows keep alive, per row; throughput covers fetch plus serialization.
+#   python -m benchmarks.read_models --rows 1000 --iterations 30
+
+
+def seed(connection, rows: int):
+    connection.execute(text("""
+        WITH role AS (
+            INSERT INTO roles (id, name, code) VALUES (gen_random_uuid(), 'Benchmark', 'bench-' || gen_random_uuid())
+            RETURNING id
+        )
+        INSERT INTO users (id, name, email, password, is_activate, role_id)
+        SELECT gen_random_uuid(), 'Benchmark user ' || g, 'bench-' || gen_random_uuid() || '@example.com', 'x', g % 5 <> 0, role.id
+        FROM generate_series(1, :rows) AS g, role
+    """), {'rows': rows})
+
+
+def orm_page(db: Session, rows: int):
+    return db.query(models.User).order_by(models.User.created_at.desc(), models.User.id.desc()).limit(rows).all()
+
+
+def orm_body(db: Session, rows: int) -> bytes:
+    users = orm_page(db, rows)
+    return validated(ListUserAllResponse, {'status': 'success', 'results': len(users), 'users': users})
+
+
+def read_model_page(db: Session, rows: int):
+    query = USER.select().join_from(models.User, models.Role)
+    return db.execute(query.order_by(models.User.created_at.desc(), models.User.id.desc()).limit(rows)).all()
+
+
+def read_model_body(db: Session, rows: int) -> bytes:
+    users = USER.serialize(read_model_page(db, rows))
+    return trusted({'status': 'success', 'results': len(users), 'users': users})
+
+
+def retained_per_row(db: Session, fetch, rows: int) -> float:
+    db.expunge_all()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    page = fetch(db, rows)
+    if page and isinstance(page[0], models.User):
+        # The old response touched each user's role
+        for user in page:
+            user.role
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return retained / len(page)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--iterations', type=int, default=30)
+    args = parser.parse_args()
+
+    rows = {}
+    with rolled_back_connection() as connection:
+        seed(connection, args.rows)
+        db = Session(bind=connection)
+        for label, fetch, body in (('orm', orm_page, orm_body), ('read model', read_model_page, read_model_body)):
+            memory = retained_per_row(db, fetch, args.rows)
+            samples = []
+            for _ in range(args.iterations):
+                db.expunge_all()
+                started = time.perf_counter()
+                body(db, args.rows)
+                samples.append(time.perf_counter() - started)
+            summary = summarize(samples)
+            rows[label] = dict(summary, bytes_per_row=memory, rows_per_s=args.rows / (summary['p50'] / 1000))
+        db.close()
+
+    report(f'User page of {args.rows} rows, ms per request', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+import argparse
+import enum
+import uuid
+from datetime import date, datetime
+
+from benchmarks._common import report, summarize, timed
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import BaseModel, EmailStr
+from pydantic.fields import SHAPE_SINGLETON
+from pydantic.utils import lenient_issubclass
+
+from app.schemas.category import ListCategoryResponse
+from app.schemas.history import ListUserHistoryResponse
+from app.schemas.menu import ListMenuAndSubjectMenuResponse, ListMenuUserLoginResponse
+from app.schemas.permission import ListPermissionResponse
+from app.schemas.permisson_detail import ListPermissionDetailResponse
+from app.schemas.role import ListRoleResponse
+from app.schemas.status import ListStatusResponse
+from app.schemas.sub_menu import ListSubMenuResponse
+from app.schemas.subject_menu import ListSubjectMenuResponse
+from app.schemas.user import ListUserAllResponse
+
+# Per list response schema: what a response_model route pays (validate the handler's dicts against the
+# schema, jsonable_encoder, json.dumps) against what trusted_response sends with FAST_JSON_RESPONSES on
+# (the same dicts straight through orjson).
+#   python -m benchmarks.serialization --rows 100 --iterations 200
+SCHEMAS = [
+    ListCategoryResponse, ListStatusResponse, ListSubjectMenuResponse, ListPermissionResponse,
+    ListPermissionDetailResponse, ListRoleResponse, ListSubMenuResponse, ListUserAllResponse,
+    ListUserHistoryResponse, ListMenuAndSubjectMenuResponse, ListMenuUserLoginResponse,
+]
+
+NESTED_ROWS = 3
+
+
+def fake_scalar(type_, index: int):
+    if lenient_issubclass(type_, BaseModel):
+        return fake_payload(type_, NESTED_ROWS, index)
+    if lenient_issubclass(type_, enum.Enum):
+        return list(type_)[index % len(type_)].value
+    if lenient_issubclass(type_, EmailStr):
+        return f'user{index}@example.com'
+    if lenient_issubclass(type_, uuid.UUID):
+        return uuid.uuid4()
+    if lenient_issubclass(type_, datetime):
+        return datetime(2024, 1, 1, 12, 0, index % 60, 123456)
+    if lenient_issubclass(type_, date):
+        return date(2024, 1, 1 + index % 28)
+    if lenient_issubclass(type_, bool):
+        return index % 2 == 0
+    if lenient_issubclass(type_, int):
+        return index
+    if lenient_issubclass(type_, float):
+        return index / 3
+    return f'value-{index}'
+
+
+def fake_field(field, index: int, rows: int):
+    if field.shape != SHAPE_SINGLETON:
+        # Lists get rows items at the top level and a few inside nested models
+        item = field.sub_fields[0] if field.sub_fields else None
+        return [
+            fake_field(item, position, NESTED_ROWS) if item is not None else fake_scalar(field.type_, position)
+            for position in range(rows)
+        ]
+    if field.sub_fields:
+        # Union: the first member that is not None
+        return fake_field(field.sub_fields[0], index, rows)
+    return fake_scalar(field.type_, index)
+
+
+def fake_payload(model, rows: int, index: int = 0) -> dict:
+    return {name: fake_field(field, index, rows) for name, field in model.__fields__.items()}
+
+
+def validated(model, content) -> bytes:
+    return JSONResponse(jsonable_encoder(model.parse_obj(content))).body
+
+
+def trusted(content) -> bytes:
+    return ORJSONResponse(content).body
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    rows = {}
+    for model in SCHEMAS:
+        content = fake_payload(model, args.rows)
+        # The fast path must send the same document the schema would
+        if orjson.loads(validated(model, content)) != orjson.loads(trusted(content)):
+            print(f'{model.__name__}: orjson output differs from the validated response')
+        slow = summarize(timed(lambda: validated(model, content), args.iterations))
+        fast = summarize(timed(lambda: trusted(content), args.iterations))
+        rows[model.__name__] = {
+            'model p50': slow['p50'], 'model p99': slow['p99'],
+            'orjson p50': fast['p50'], 'orjson p99': fast['p99'],
+            'speedup': slow['p50'] / fast['p50'],
+        }
+    report(f'Serialization per response, ms ({args.rows} rows per list)', rows)
+
+
+if __name__ == '__main__':
+    main()
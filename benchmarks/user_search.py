@@ -0,0 +1,78 @@
+import argparse
+import uuid
+
+from benchmarks._common import report, rolled_back_connection, summarize, timed
+
+from sqlalchemy import func, select, text
+
+from app import models
+from app.search import search_conditions, search_rank
+
+# User search latency over synthetic users: the old filters (name/email .contains(), LIKE '%x%' even for
+# an empty filter) against search_conditions/search_rank on the pg_trgm indexes. Everything runs in one
+# transaction that is rolled back. The old behaviour is measured after dropping the trigram indexes in
+# that transaction, which holds a lock on users until the end: use a scratch database migrated to head.
+#   python -m benchmarks.user_search --users 1000000 --iterations 20
+TERMS = ['', 'ab', 'nguyen', 'Tran Van', 'user12345@', 'zzqx']
+LIMIT = 20
+
+
+def seed(connection, users: int):
+    role_id = uuid.uuid4()
+    connection.execute(models.Role.__table__.insert().values(id=role_id, name='Benchmark', code=f'bench-{role_id.hex[:8]}'))
+    # Vietnamese-style names from a few syllables give trigram statistics closer to real data than hashes
+    connection.execute(text("""
+        INSERT INTO users (id, name, email, password, is_activate, role_id, created_at)
+        SELECT gen_random_uuid(),
+               (ARRAY['Nguyen','Tran','Le','Pham','Hoang','Vu','Dang','Bui'])[1 + g % 8] || ' ' ||
+               (ARRAY['Van','Thi','Minh','Duc','Ngoc','Quang'])[1 + (g / 8) % 6] || ' ' ||
+               (ARRAY['An','Binh','Cuong','Dung','Giang','Hai','Khanh','Linh','Nam','Phuong'])[1 + (g / 48) % 10] ||
+               ' ' || substr(md5(g::text), 1, 4),
+               'user' || g || '@example.com', 'x', g % 5 <> 0, :role_id,
+               now() - make_interval(secs => g)
+        FROM generate_series(1, :users) AS g
+    """), {'role_id': role_id, 'users': users})
+    connection.execute(text('ANALYZE users'))
+
+
+def old_search(connection, term: str):
+    conditions = [models.User.name.contains(term), models.User.email.contains('')]
+    connection.execute(select(func.count()).select_from(models.User).where(*conditions)).scalar()
+    return connection.execute(
+        select(models.User.id, models.User.name, models.User.email)
+        .where(*conditions).order_by(models.User.created_at.desc()).limit(LIMIT)
+    ).all()
+
+
+def new_search(connection, term: str):
+    terms = [(models.User.name, term), (models.User.email, '')]
+    conditions = search_conditions(terms)
+    connection.execute(select(func.count()).select_from(models.User).where(*conditions)).scalar()
+    return connection.execute(
+        select(models.User.id, models.User.name, models.User.email)
+        .where(*conditions).order_by(*search_rank(terms), models.User.created_at.desc()).limit(LIMIT)
+    ).all()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=1000000)
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    rows = {}
+    with rolled_back_connection() as connection:
+        seed(connection, args.users)
+        for term in TERMS:
+            new_search(connection, term)
+            rows[f'trigram {term!r}'] = summarize(timed(lambda: new_search(connection, term), args.iterations))
+        connection.execute(text('DROP INDEX ix_users_name_trgm, ix_users_email_trgm'))
+        for term in TERMS:
+            old_search(connection, term)
+            rows[f'like {term!r}'] = summarize(timed(lambda: old_search(connection, term), args.iterations))
+
+    report(f'User search with count, ms ({args.users} synthetic users, page of {LIMIT})', rows)
+
+
+if __name__ == '__main__':
+    main()
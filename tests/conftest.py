@@ -0,0 +1,40 @@
+import os
+
+import pytest
+from dotenv import dotenv_values
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+# app.config needs the full settings at import time; the sample values are enough for tests that do not
+# reach a database or Redis. Anything already set in the environment wins
+for name, value in dotenv_values(os.path.join(os.path.dirname(__file__), '..', '.env.sample')).items():
+    if value is not None:
+        os.environ.setdefault(name, value)
+
+# Any test that runs the same statement shape more than SQL_REPEAT_THRESHOLD times in one request fails
+os.environ.setdefault('SQL_STRICT_MODE', 'true')
+
+
+@pytest.fixture(scope='session')
+def pg_engine():
+    # Tests that need PostgreSQL run against the configured database migrated to head, and are skipped
+    # when it cannot be reached
+    from app.database import engine
+    try:
+        with engine.connect() as connection:
+            migrated = connection.execute(text("SELECT to_regclass('public.cache_versions')")).scalar()
+    except OperationalError as e:
+        pytest.skip(f'PostgreSQL is not reachable: {e.orig}')
+    if migrated is None:
+        pytest.skip('The test database is not migrated to head (alembic upgrade head)')
+    return engine
+
+
+@pytest.fixture
+def pg(pg_engine):
+    # Everything a test writes is rolled back
+    connection = pg_engine.connect()
+    transaction = connection.begin()
+    yield connection
+    transaction.rollback()
+    connection.close()
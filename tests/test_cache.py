@@ -0,0 +1,207 @@
+import asyncio
+
+import pytest
+from redis.exceptions import RedisError
+
+from app import cache
+from app.cache import TwoTierCache
+from app.config import settings
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.calls = []
+        self.fail = False
+
+    def _call(self, name):
+        self.calls.append(name)
+        if self.fail:
+            raise RedisError('connection refused')
+
+    async def get(self, key):
+        self._call('get')
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self._call('set')
+        self.data[key] = value
+
+    async def delete(self, *keys):
+        self._call('delete')
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def scan_iter(self, match=None, count=None):
+        self._call('scan')
+        prefix = match.rstrip('*')
+        for key in list(self.data):
+            if key.startswith(prefix):
+                yield key
+
+
+@pytest.fixture(autouse=True)
+def clear_l1():
+    cache._l1.clear()
+    yield
+    cache._l1.clear()
+
+
+@pytest.fixture
+def redis():
+    return FakeRedis()
+
+
+def make_cache(redis, namespace='test'):
+    return TwoTierCache(namespace, redis_client=redis)
+
+
+def test_concurrent_misses_load_once(redis):
+    store = make_cache(redis)
+    loads = 0
+
+    async def loader():
+        nonlocal loads
+        loads += 1
+        await asyncio.sleep(0.01)
+        return {'value': 1}
+
+    async def run():
+        return await asyncio.gather(*[store.get_or_load('k', loader) for _ in range(50)])
+
+    results = asyncio.run(run())
+    assert loads == 1
+    assert all(result == {'value': 1} for result in results)
+    assert store.coalesced == 49
+    assert redis.data[store.key('k')] == b'{"value":1}'
+
+
+def test_l2_hit_skips_loader(redis):
+    store = make_cache(redis)
+    redis.data[store.key('k')] = b'[1,2]'
+
+    async def loader():
+        raise AssertionError('loader should not run')
+
+    assert asyncio.run(store.get_or_load('k', loader)) == [1, 2]
+    assert store.l2_hits == 1
+
+
+def test_none_is_cached(redis):
+    store = make_cache(redis)
+    loads = 0
+
+    async def loader():
+        nonlocal loads
+        loads += 1
+        return None
+
+    async def run():
+        await store.get_or_load('k', loader)
+        cache._l1.clear()
+        return await store.get_or_load('k', loader)
+
+    assert asyncio.run(run()) is None
+    assert loads == 1
+
+
+def test_loader_error_reaches_every_waiter_and_is_not_cached(redis):
+    store = make_cache(redis)
+    attempts = 0
+
+    async def failing():
+        nonlocal attempts
+        attempts += 1
+        await asyncio.sleep(0.01)
+        raise ValueError('boom')
+
+    async def run():
+        return await asyncio.gather(*[store.get_or_load('k', failing) for _ in range(5)], return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert attempts == 1
+    assert all(isinstance(result, ValueError) for result in results)
+    assert store.load_errors == 1
+    assert store.key('k') not in redis.data
+    assert asyncio.run(store.get_or_load('k', lambda: asyncio.sleep(0, result=2))) == 2
+
+
+def test_cancelled_loader_hands_over_to_waiter(redis):
+    store = make_cache(redis)
+    loads = 0
+
+    async def loader():
+        nonlocal loads
+        loads += 1
+        await asyncio.sleep(0.05 if loads == 1 else 0)
+        return loads
+
+    async def run():
+        first = asyncio.create_task(store.get_or_load('k', loader))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(store.get_or_load('k', loader))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == 2
+    assert not store._inflight
+
+
+def test_undecodable_entry_is_dropped_and_reloaded(redis):
+    store = make_cache(redis)
+    redis.data[store.key('k')] = b'{not json'
+
+    assert asyncio.run(store.get_or_load('k', lambda: asyncio.sleep(0, result='fresh'))) == 'fresh'
+    assert store.l2_errors == 1
+    assert redis.data[store.key('k')] == b'"fresh"'
+
+
+def test_redis_failure_falls_back_and_backs_off(redis, monkeypatch):
+    monkeypatch.setattr(settings, 'CACHE_L2_RETRY_AFTER', 60)
+    store = make_cache(redis)
+    redis.fail = True
+
+    assert asyncio.run(store.get_or_load('a', lambda: asyncio.sleep(0, result=1))) == 1
+    assert store.l2_errors == 1
+    calls, skipped = len(redis.calls), store.l2_skipped
+
+    # Within the backoff window neither the read nor the write goes to Redis
+    assert asyncio.run(store.get_or_load('b', lambda: asyncio.sleep(0, result=2))) == 2
+    assert len(redis.calls) == calls
+    assert store.l2_skipped == skipped + 2
+
+    redis.fail = False
+    store._l2_retry_at = 0
+    assert asyncio.run(store.get_or_load('c', lambda: asyncio.sleep(0, result=3))) == 3
+    assert redis.data[store.key('c')] == b'3'
+
+
+def test_invalidate_reaches_redis_during_backoff(redis, monkeypatch):
+    monkeypatch.setattr(settings, 'CACHE_L2_RETRY_AFTER', 60)
+    store = make_cache(redis)
+    asyncio.run(store.set('k', 'old'))
+
+    redis.fail = True
+    asyncio.run(store.get('other'))
+    redis.fail = False
+
+    asyncio.run(store.invalidate('k'))
+    assert store.key('k') not in redis.data
+    assert asyncio.run(store.get('k')) is None
+
+
+def test_clear_only_touches_its_namespace(redis):
+    users = make_cache(redis, 'users')
+    roles = make_cache(redis, 'roles')
+
+    async def run():
+        await users.set(1, 'u')
+        await roles.set(1, 'r')
+        await users.clear()
+        return await users.get(1), await roles.get(1)
+
+    assert asyncio.run(run()) == (None, 'r')
+    assert list(redis.data) == [roles.key(1)]
@@ -0,0 +1,62 @@
+import asyncio
+import uuid
+
+import pytest
+from fastapi import BackgroundTasks
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app import permission_cache
+from app.principal_cache import Principal, RolePrincipal
+from app.routers.menu import delete_menu
+from app.schemas.enum import UserRoleEnum
+
+
+@pytest.fixture
+def admin(pg):
+    role_id = pg.execute(text('SELECT id FROM roles WHERE code = :code'), {'code': UserRoleEnum.admin}).scalar()
+    if role_id is None:
+        role_id = uuid.uuid4()
+        pg.execute(text("INSERT INTO roles (id, name, code) VALUES (:id, 'Admin', :code)"), {'id': role_id, 'code': UserRoleEnum.admin})
+    role = RolePrincipal(id=role_id, name='Admin', code=UserRoleEnum.admin, icon=None, color=None)
+    return Principal(id=uuid.uuid4(), name='Admin', email='admin@example.com', avatar=None, is_activate=True, role_id=role_id, role=role)
+
+
+def seed_menu(pg, submenus: int):
+    menu_id = uuid.uuid4()
+    pg.execute(text("INSERT INTO menus (id, name, code, position) VALUES (:id, 'Seed menu', :code, 0)"), {'id': menu_id, 'code': f'seed-{menu_id}'})
+    pg.execute(text(
+        "INSERT INTO submenus (id, menu_id, name, code) "
+        "SELECT gen_random_uuid(), :menu_id, 'Seed submenu ' || g, 'seed-' || g FROM generate_series(1, :count) g"
+    ), {'menu_id': menu_id, 'count': submenus})
+    pg.execute(text(
+        'INSERT INTO role_menus (role_id, menu_id) SELECT id, :menu_id FROM roles'
+    ), {'menu_id': menu_id})
+    return menu_id
+
+
+def statements_for_delete(pg, admin, menu_id) -> int:
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    # The role snapshot is compiled fresh each time, so both deletes run the same permission check
+    permission_cache._snapshots.clear()
+    event.listen(pg, 'before_cursor_execute', count)
+    try:
+        with Session(bind=pg) as db:
+            response = asyncio.run(delete_menu(BackgroundTasks(), menu_id, db, admin))
+    finally:
+        event.remove(pg, 'before_cursor_execute', count)
+    assert response.status_code == 204
+    return len(statements)
+
+
+def test_delete_menu_statement_count_does_not_grow_with_children(pg, admin):
+    small = seed_menu(pg, submenus=1)
+    large = seed_menu(pg, submenus=1000)
+
+    assert statements_for_delete(pg, admin, large) == statements_for_delete(pg, admin, small)
+    assert pg.execute(text('SELECT count(*) FROM submenus WHERE menu_id IN (:small, :large)'), {'small': small, 'large': large}).scalar() == 0
+    assert pg.execute(text('SELECT count(*) FROM role_menus WHERE menu_id IN (:small, :large)'), {'small': small, 'large': large}).scalar() == 0
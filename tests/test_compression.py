@@ -0,0 +1,95 @@
+import asyncio
+import gzip
+
+import pytest
+
+from app import compression
+from app.compression import CompressionMiddleware, negotiate
+from app.config import settings
+
+
+@pytest.mark.parametrize('accept_encoding, expected', [
+    (None, None),
+    ('', None),
+    ('identity', None),
+    ('gzip', 'gzip'),
+    ('deflate, gzip;q=0.5', 'gzip'),
+    ('gzip;q=0', None),
+    ('*', compression.ENCODINGS[0]),
+    ('*;q=0.1, gzip;q=0', 'br' if 'br' in compression.ENCODINGS else None),
+    ('GZIP; Q=1.0', 'gzip'),
+    ('gzip;q=oops', None),
+])
+def test_negotiate(accept_encoding, expected):
+    assert negotiate(accept_encoding) == expected
+
+
+def test_compress_is_deterministic():
+    body = b'{"items": [' + b'1,' * 2000 + b'1]}'
+    assert compression.compress(body, 'gzip') == compression.compress(body, 'gzip')
+    assert gzip.decompress(compression.compress(body, 'gzip')) == body
+
+
+def run(app, accept_encoding='gzip'):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    headers = [(b'accept-encoding', accept_encoding.encode())] if accept_encoding else []
+    asyncio.run(CompressionMiddleware(app)({'type': 'http', 'headers': headers}, None, send))
+    start = messages[0]
+    return {key.decode().lower(): value.decode() for key, value in start['headers']}, messages[1:]
+
+
+def json_app(body: bytes, content_type=b'application/json', extra_headers=()):
+    async def app(scope, receive, send):
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', content_type), (b'content-length', str(len(body)).encode()), *extra_headers]})
+        await send({'type': 'http.response.body', 'body': body})
+    return app
+
+
+def test_large_json_is_gzipped():
+    body = b'{"value": "' + b'a' * 5000 + b'"}'
+    headers, messages = run(json_app(body))
+    assert headers['content-encoding'] == 'gzip'
+    assert headers['vary'] == 'Accept-Encoding'
+    assert int(headers['content-length']) == len(messages[0]['body'])
+    assert gzip.decompress(messages[0]['body']) == body
+
+
+def test_small_body_passes_through_with_vary():
+    headers, messages = run(json_app(b'{"ok": true}'))
+    assert 'content-encoding' not in headers
+    assert headers['vary'] == 'Accept-Encoding'
+    assert messages[0]['body'] == b'{"ok": true}'
+
+
+def test_precompressed_and_binary_responses_are_left_alone():
+    body = b'x' * 5000
+    headers, messages = run(json_app(body, extra_headers=[(b'content-encoding', b'br')]))
+    assert headers['content-encoding'] == 'br'
+    assert messages[0]['body'] == body
+
+    headers, messages = run(json_app(body, content_type=b'image/png'))
+    assert 'content-encoding' not in headers
+    assert 'vary' not in headers
+
+
+def test_stream_is_flushed_in_blocks_not_per_chunk():
+    rows = [b'{"row": %d, "padding": "%s"}\n' % (index, b'p' * 40) for index in range(5000)]
+
+    async def app(scope, receive, send):
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [(b'content-type', b'application/x-ndjson')]})
+        for row in rows:
+            await send({'type': 'http.response.body', 'body': row, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+    headers, messages = run(app)
+    body = b''.join(message['body'] for message in messages)
+
+    assert headers['content-encoding'] == 'gzip'
+    assert 'content-length' not in headers
+    assert gzip.decompress(body) == b''.join(rows)
+    assert len(messages) <= sum(map(len, rows)) // settings.COMPRESSION_STREAM_FLUSH_SIZE + 2
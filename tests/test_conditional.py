@@ -0,0 +1,64 @@
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from starlette.requests import Request
+
+from app.conditional import etag_matches, not_modified
+from app.routers.category import conditional_categories
+from app.routers.permission import conditional_permissions
+
+LAST_MODIFIED = datetime(2026, 10, 18, 9, 30, 15, 500000, tzinfo=timezone.utc)
+
+
+def make_request(**headers) -> Request:
+    return Request({'type': 'http', 'headers': [(name.replace('_', '-').encode(), value.encode()) for name, value in headers.items()]})
+
+
+@pytest.mark.parametrize('if_none_match, matches', [
+    (None, False),
+    ('', False),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"xyz", W/"abc"', True),
+    ('*', True),
+    ('"abcd"', False),
+])
+def test_etag_matches_uses_weak_comparison(if_none_match, matches):
+    assert etag_matches(if_none_match, 'W/"abc"') is matches
+
+
+def test_if_none_match_wins_over_if_modified_since():
+    request = make_request(if_none_match='"other"', if_modified_since='Sun, 18 Oct 2026 09:30:15 GMT')
+    assert not not_modified(request, 'W/"abc"', LAST_MODIFIED)
+
+
+@pytest.mark.parametrize('since, expected', [
+    ('Sun, 18 Oct 2026 09:30:15 GMT', True),
+    ('Sun, 18 Oct 2026 09:30:14 GMT', False),
+    ('Sun, 18 Oct 2026 10:00:00 GMT', True),
+    ('not a date', False),
+])
+def test_if_modified_since_has_second_resolution(since, expected):
+    assert not_modified(make_request(if_modified_since=since), 'W/"abc"', LAST_MODIFIED) is expected
+
+
+def test_no_validators_is_never_a_304():
+    assert not not_modified(make_request(), 'W/"abc"', LAST_MODIFIED)
+    assert not not_modified(make_request(if_modified_since='Sun, 18 Oct 2026 09:30:15 GMT'), 'W/"abc"', None)
+
+
+def fingerprint_sql(conditional) -> str:
+    return str(conditional.fingerprint_statement().compile(dialect=postgresql.dialect(), compile_kwargs={'render_postcompile': True}))
+
+
+def test_permission_fingerprint_includes_grant_stamps():
+    sql = fingerprint_sql(conditional_permissions)
+    assert 'count(*)' in sql and 'FROM role_permissions' in sql
+    assert 'sum(cache_versions.version)' in sql
+
+
+def test_plain_table_fingerprint_has_no_stamps():
+    sql = fingerprint_sql(conditional_categories)
+    assert 'max(categories.updated_at)' in sql
+    assert 'cache_versions' not in sql
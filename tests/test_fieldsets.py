@@ -0,0 +1,52 @@
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app import models
+from app.fieldsets import FieldSet, keep_columns, pick
+from app.read_models import USER
+from app.schemas.user import UserResponse
+
+user_fields = FieldSet(UserResponse)
+
+
+@pytest.mark.parametrize('fields', [None, '', ' , '])
+def test_missing_or_blank_means_every_field(fields):
+    assert user_fields(fields) is None
+
+
+def test_requested_fields_are_trimmed():
+    assert user_fields(' id, name ,,email') == {'id', 'name', 'email'}
+
+
+def test_unknown_fields_are_rejected():
+    with pytest.raises(HTTPException) as error:
+        user_fields('id,password')
+    assert error.value.status_code == 400
+    assert 'password' in error.value.detail
+
+
+def test_pick_and_keep_columns():
+    data = {'id': 1, 'name': 'Ada', 'email': 'ada@example.com'}
+    assert pick(data, None) is data
+    assert pick(data, {'name'}) == {'name': 'Ada'}
+
+    columns = [models.User.name, models.User.email, models.User.id, models.User.created_at]
+    assert [column.key for column in keep_columns(columns, {'name'}, keep=('id',))] == ['name', 'id']
+
+
+def test_narrowed_read_model_selects_kept_columns_but_hides_them():
+    read_model = USER.only({'name', 'role'}, keep=('created_at', 'id'))
+    assert [column.key for column in read_model.columns] == ['name', 'id', 'created_at']
+
+    created_at = datetime(2026, 10, 18, tzinfo=timezone.utc)
+    role_id = uuid.uuid4()
+    row = ('Ada', uuid.uuid4(), created_at, 'Admin', 'admin', None, None, role_id)
+    [item] = read_model.serialize([row])
+    assert item == {'name': 'Ada', 'role': {'name': 'Admin', 'code': 'admin', 'icon': None, 'color': None, 'id': role_id}}
+
+
+def test_unrestricted_read_model_is_unchanged():
+    assert USER.only(None) is USER
@@ -0,0 +1,96 @@
+import pytest
+from sqlalchemy import text
+
+# A seeded dataset big enough that the filters below are selective: 50 roles, 5,000 users,
+# 1,000 permission details, 1,000 submenus and one meta value per user
+SEED = [
+    """INSERT INTO roles (id, name, code)
+       SELECT gen_random_uuid(), 'Seed role ' || g, 'seed-role-' || g || '-' || gen_random_uuid()
+       FROM generate_series(0, 49) g""",
+    """CREATE TEMP TABLE seed_roles ON COMMIT DROP AS
+       SELECT id, row_number() OVER (ORDER BY id) - 1 AS n FROM roles WHERE code LIKE 'seed-role-%'""",
+    """INSERT INTO users (id, name, email, password, is_activate, role_id)
+       SELECT gen_random_uuid(), 'Seed user ' || g, 'seed-' || gen_random_uuid() || '@example.com', 'x', g % 50 <> 0, r.id
+       FROM generate_series(0, 4999) g JOIN seed_roles r ON r.n = g % 50""",
+    """INSERT INTO permissions (id, name, code)
+       SELECT gen_random_uuid(), 'Seed ' || g, 'seed-' || g FROM generate_series(0, 199) g""",
+    """INSERT INTO permissions_detail (id, permission_id, name, code)
+       SELECT gen_random_uuid(), p.id, 'Seed detail ' || g, 'seed-detail-' || g
+       FROM permissions p CROSS JOIN generate_series(0, 4) g WHERE p.code LIKE 'seed-%'""",
+    """INSERT INTO role_permission_details (id, role_id, permission_detail_id)
+       SELECT gen_random_uuid(), r.id, d.id
+       FROM seed_roles r JOIN (
+           SELECT id, row_number() OVER (ORDER BY id) - 1 AS n FROM permissions_detail WHERE code LIKE 'seed-detail-%'
+       ) d ON d.n % 50 = r.n""",
+    """INSERT INTO menus (id, name, code, position)
+       SELECT gen_random_uuid(), 'Seed menu ' || g, 'seed-menu-' || g, g FROM generate_series(0, 199) g""",
+    """INSERT INTO submenus (id, menu_id, name, code)
+       SELECT gen_random_uuid(), m.id, 'Seed submenu ' || g, 'seed-submenu-' || g
+       FROM menus m CROSS JOIN generate_series(0, 4) g WHERE m.code LIKE 'seed-menu-%'""",
+    """INSERT INTO role_menus (role_id, menu_id)
+       SELECT r.id, m.id
+       FROM seed_roles r JOIN (
+           SELECT id, row_number() OVER (ORDER BY id) - 1 AS n FROM menus WHERE code LIKE 'seed-menu-%'
+       ) m ON m.n % 50 = r.n""",
+    """INSERT INTO user_meta (id, meta_code, meta_name, role_id)
+       SELECT gen_random_uuid(), 'seed-meta-' || g, 'Seed meta ' || g, r.id
+       FROM seed_roles r CROSS JOIN generate_series(0, 4) g""",
+    """INSERT INTO user_meta_detail (id, meta_id, user_id, meta_value)
+       SELECT gen_random_uuid(), (SELECT m.id FROM user_meta m WHERE m.role_id = u.role_id LIMIT 1), u.id, 'seed'
+       FROM users u WHERE u.email LIKE 'seed-%'""",
+]
+
+SEEDED_TABLES = [
+    'roles', 'users', 'permissions', 'permissions_detail', 'role_permission_details',
+    'menus', 'submenus', 'role_menus', 'user_meta', 'user_meta_detail',
+]
+
+# (expected index names, hot query, query picking a value for :value)
+HOT_QUERIES = [
+    ({'ix_users_role_id'}, 'SELECT id FROM users WHERE role_id = :value', 'SELECT id FROM seed_roles LIMIT 1'),
+    ({'ix_users_is_activate'}, 'SELECT id FROM users WHERE is_activate = :value', 'SELECT false'),
+    (
+        {'ix_users_created_at', 'ix_users_created_at_id'},
+        'SELECT id FROM users ORDER BY created_at DESC, id DESC LIMIT 20',
+        'SELECT 1',
+    ),
+    ({'ix_role_menus_menu_id'}, 'SELECT role_id FROM role_menus WHERE menu_id = :value', "SELECT id FROM menus WHERE code LIKE 'seed-menu-%' LIMIT 1"),
+    ({'ix_role_permission_details_role_id'}, 'SELECT id FROM role_permission_details WHERE role_id = :value', 'SELECT id FROM seed_roles LIMIT 1'),
+    (
+        {'ix_role_permission_details_permission_detail_id'},
+        'SELECT id FROM role_permission_details WHERE permission_detail_id = :value',
+        "SELECT id FROM permissions_detail WHERE code LIKE 'seed-detail-%' LIMIT 1",
+    ),
+    ({'ix_permissions_detail_permission_id'}, 'SELECT id FROM permissions_detail WHERE permission_id = :value', "SELECT id FROM permissions WHERE code LIKE 'seed-%' LIMIT 1"),
+    ({'ix_submenus_menu_id'}, 'SELECT id FROM submenus WHERE menu_id = :value', "SELECT id FROM menus WHERE code LIKE 'seed-menu-%' LIMIT 1"),
+    ({'ix_user_meta_role_id'}, 'SELECT id FROM user_meta WHERE role_id = :value', 'SELECT id FROM seed_roles LIMIT 1'),
+    ({'ix_user_meta_detail_user_id'}, 'SELECT id FROM user_meta_detail WHERE user_id = :value', "SELECT id FROM users WHERE email LIKE 'seed-%' LIMIT 1"),
+    ({'ix_user_meta_detail_meta_id'}, 'SELECT id FROM user_meta_detail WHERE meta_id = :value', 'SELECT id FROM user_meta LIMIT 1'),
+]
+
+
+@pytest.fixture
+def seeded(pg):
+    for statement in SEED:
+        pg.execute(text(statement))
+    for table in SEEDED_TABLES:
+        pg.execute(text(f'ANALYZE {table}'))
+    # Makes the plan depend on whether a usable index exists, not on how many rows the database already had
+    pg.execute(text('SET LOCAL enable_seqscan = off'))
+    return pg
+
+
+def used_indexes(plan) -> set:
+    found = set()
+    if 'Index Name' in plan:
+        found.add(plan['Index Name'])
+    for child in plan.get('Plans', []):
+        found |= used_indexes(child)
+    return found
+
+
+@pytest.mark.parametrize('indexes, query, value_query', HOT_QUERIES, ids=[sorted(case[0])[0] for case in HOT_QUERIES])
+def test_hot_query_uses_index(seeded, indexes, query, value_query):
+    value = seeded.execute(text(value_query)).scalar()
+    plan = seeded.execute(text(f'EXPLAIN (FORMAT JSON) {query}'), {'value': value}).scalar()
+    assert used_indexes(plan[0]['Plan']) & indexes, plan
@@ -0,0 +1,75 @@
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table, create_engine, select, text
+from sqlalchemy.dialects import postgresql
+
+from app import models
+from app.pagination import CREATED_AT_ID_PARSERS, decode_cursor, encode_cursor, keyset_statement, split_page
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 10, 18, 12, 30, 1, 123456, tzinfo=timezone.utc)
+    row_id = uuid.uuid4()
+
+    cursor = encode_cursor(created_at, row_id)
+
+    assert '=' not in cursor
+    assert decode_cursor(cursor, *CREATED_AT_ID_PARSERS) == (created_at, row_id)
+
+
+@pytest.mark.parametrize('cursor', ['not-base64!', encode_cursor('2026-10-18T00:00:00'), encode_cursor('yesterday', str(uuid.uuid4()))])
+def test_invalid_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, *CREATED_AT_ID_PARSERS)
+    assert error.value.status_code == 400
+
+
+def test_keyset_statement_compares_row_values():
+    keyset = [models.Category.created_at, models.Category.id]
+    cursor = encode_cursor(datetime(2026, 1, 1, tzinfo=timezone.utc), uuid.uuid4())
+
+    statement = keyset_statement(select(models.Category.id), keyset, CREATED_AT_ID_PARSERS, cursor, 20, descending=False)
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+
+    assert '(categories.created_at, categories.id) > (' in sql
+    assert 'ORDER BY categories.created_at ASC, categories.id ASC' in sql
+    assert statement._limit == 21
+
+
+def test_pages_cover_every_row_once_with_tied_timestamps():
+    metadata = MetaData()
+    items = Table('items', metadata, Column('id', Integer, primary_key=True), Column('created_at', DateTime, nullable=False))
+    engine = create_engine('sqlite://')
+    metadata.create_all(engine)
+    start = datetime(2026, 1, 1)
+    # Three rows share every timestamp, so a page boundary regularly falls inside a tie
+    rows = [{'id': index, 'created_at': start + timedelta(minutes=index // 3)} for index in range(25)]
+    keyset = [items.c.created_at, items.c.id]
+    parsers = (datetime.fromisoformat, int)
+
+    with engine.connect() as connection:
+        connection.execute(items.insert(), rows)
+        seen, cursor = [], None
+        while True:
+            page = connection.execute(keyset_statement(select(items), keyset, parsers, cursor, 7, descending=True)).all()
+            page, cursor = split_page(page, keyset, 7)
+            seen.extend(row.id for row in page)
+            if cursor is None:
+                break
+
+    expected = [row['id'] for row in sorted(rows, key=lambda row: (row['created_at'], row['id']), reverse=True)]
+    assert seen == expected
+
+
+@pytest.mark.parametrize('table', ['users', 'permissions', 'categories', 'statuses', 'subject_menu', 'menus'])
+def test_keyset_page_walks_the_created_at_id_index(pg, table):
+    pg.execute(text('SET LOCAL enable_seqscan = off'))
+    plan = pg.execute(text(
+        f'EXPLAIN (FORMAT JSON) SELECT id FROM {table} '
+        'WHERE (created_at, id) > (now(), gen_random_uuid()) ORDER BY created_at, id LIMIT 21'
+    )).scalar()
+    assert f'ix_{table}_created_at_id' in json.dumps(plan), plan
@@ -0,0 +1,39 @@
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy.dialects import postgresql
+
+from app.read_models import CATEGORY, USER
+from app.schemas.category import CategoryResponse
+from app.schemas.user import UserResponse
+
+NOW = datetime(2026, 10, 18, 12, 0, tzinfo=timezone.utc)
+
+
+def user_row(role_id):
+    # Same order as USER.select(): the user columns, then the role's
+    return ('Ada', 'ada@example.com', uuid.uuid4(), True, None, NOW, NOW,
+            'Admin', 'admin', 'star', '#fff', role_id)
+
+
+def test_select_is_a_flat_column_projection():
+    sql = str(USER.select().compile(dialect=postgresql.dialect()))
+    assert 'users.password' not in sql
+    assert 'roles.name AS role_name' in sql and 'roles.id AS role_id' in sql
+
+
+def test_serialize_nests_joined_columns_and_matches_the_schema():
+    role_id = uuid.uuid4()
+    [item] = USER.serialize([user_row(role_id)])
+
+    assert item['role'] == {'name': 'Admin', 'code': 'admin', 'icon': 'star', 'color': '#fff', 'id': role_id}
+    # The dict must survive response_model validation unchanged, since trusted_response may skip it
+    assert UserResponse.parse_obj(item).dict() == item
+
+
+def test_serialize_keys_follow_the_schema():
+    row = ('News', 'news', uuid.uuid4(), NOW, NOW)
+    [item] = CATEGORY.serialize([row])
+    assert set(item) == set(CategoryResponse.__fields__)
+    assert CategoryResponse.parse_obj(item).dict() == item
+
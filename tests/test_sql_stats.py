@@ -0,0 +1,67 @@
+import pytest
+from sqlalchemy import create_engine, text
+
+from app import sql_stats
+from app.config import settings
+from app.sql_stats import NPlusOneError, RequestSqlStats, statement_shape
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine('sqlite://')
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def request_stats():
+    token = sql_stats.start_request()
+    yield
+    sql_stats.finish_request(token)
+
+
+@pytest.mark.parametrize('statement', [
+    'SELECT a FROM t WHERE id IN (%(id_1_1)s, %(id_1_2)s, %(id_1_3)s) AND x = %(x_1)s',
+    'SELECT a FROM t WHERE id IN (%s, %s) AND x = %s',
+    'SELECT a FROM t WHERE id IN ($1, $2, $3, $4) AND x = $5',
+    'SELECT a\n  FROM t WHERE id IN ( $1 ,$2 ) AND x = $3',
+])
+def test_shapes_ignore_placeholder_style_and_list_length(statement):
+    assert statement_shape(statement) == 'SELECT a FROM t WHERE id IN (?) AND x = ?'
+
+
+def test_escaped_percent_is_not_a_placeholder():
+    assert statement_shape("SELECT '%%s', %(name)s") == "SELECT '%%s', ?"
+
+
+def test_repeated_shapes_are_grouped():
+    stats = RequestSqlStats()
+    for _ in range(12):
+        stats.record('SELECT * FROM users WHERE id = $1', 0.001)
+    stats.record('SELECT * FROM roles', 0.002)
+
+    assert stats.statements == 13
+    assert stats.repeated_shapes(10) == [('SELECT * FROM users WHERE id = ?', 12)]
+    assert sql_stats.server_timing(stats, 0.05).startswith('db;dur=14.0;desc="13 queries"')
+
+
+def test_statements_outside_a_request_are_not_recorded(engine):
+    with engine.connect() as connection:
+        for value in range(settings.SQL_REPEAT_THRESHOLD + 5):
+            connection.execute(text('SELECT :value'), {'value': value})
+
+
+def test_strict_mode_fails_on_repeated_statement(engine, request_stats, monkeypatch):
+    monkeypatch.setattr(settings, 'SQL_STRICT_MODE', True)
+    with engine.connect() as connection:
+        for value in range(settings.SQL_REPEAT_THRESHOLD):
+            connection.execute(text('SELECT :value'), {'value': value})
+        with pytest.raises(NPlusOneError):
+            connection.execute(text('SELECT :value'), {'value': -1})
+
+
+def test_distinct_statements_pass_strict_mode(engine, request_stats, monkeypatch):
+    monkeypatch.setattr(settings, 'SQL_STRICT_MODE', True)
+    with engine.connect() as connection:
+        for value in range(settings.SQL_REPEAT_THRESHOLD + 5):
+            connection.execute(text(f'SELECT {value}'))